@@ -0,0 +1,248 @@
+# analytics.py
+
+import math
+import threading
+
+import numpy as np
+
+# NEPSE's own rolling averages, published in the share price table.
+PUBLISHED_AVERAGES = {'120 Days': 120, '180 Days': 180}
+
+
+def _rolling_sums(panel, window):
+    """
+    Rolling sums and non-NaN counts over the first axis of a (days x symbols) panel,
+    via cumulative sums, so every window of every symbol costs O(1).
+    Returns two (days - window + 1, symbols) arrays.
+    """
+    present = ~np.isnan(panel)
+    zero = np.zeros((1, panel.shape[1]))
+    values = np.concatenate([zero, np.cumsum(np.where(present, panel, 0.0), axis=0)])
+    counts = np.concatenate([zero, np.cumsum(present, axis=0)])
+    return values[window:] - values[:-window], counts[window:] - counts[:-window]
+
+
+def rolling_mean(panel, window):
+    """Per-symbol moving average; NaN unless all `window` days are present."""
+    sums, counts = _rolling_sums(panel, window)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts == window, sums / counts, np.nan)
+
+
+def rolling_std(panel, window):
+    """Per-symbol rolling sample standard deviation; NaN unless all `window` days are present."""
+    sums, counts = _rolling_sums(panel, window)
+    squares, _ = _rolling_sums(panel * panel, window)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        variance = (squares - sums * sums / window) / (window - 1)
+    # Cancellation can leave tiny negatives for flat series.
+    return np.where(counts == window, np.sqrt(np.clip(variance, 0.0, None)), np.nan)
+
+
+def simple_returns(prices, days):
+    """`days`-row simple returns in % over the first axis of a price panel."""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (prices[days:] / prices[:-days] - 1) * 100
+
+
+def _json_number(value, digits=4):
+    value = float(value)
+    return None if math.isnan(value) else round(value, digits)
+
+
+class MarketPanel:
+    """
+    The last `lookback` stored trading days as (days x symbols) matrices, aligned
+    on the latest day's symbols. Symbols missing on a day are NaN.
+    """
+
+    def __init__(self, store, lookback, price_column='Close', columns=('VWAP', 'Vol')):
+        self.dates = store.dates()[-lookback:]
+        latest = store.partition(self.dates[-1])
+        self.symbols = list(latest.symbols)
+        self.index = dict(latest.index)
+        self.price_column = price_column
+        names = (price_column,) + tuple(columns) + tuple(PUBLISHED_AVERAGES)
+        self._panels = {name: np.full((len(self.dates), len(self.symbols)), np.nan) for name in names}
+        for d, day in enumerate(self.dates):
+            partition = store.partition(day)
+            if partition.symbols == self.symbols:
+                target, source = slice(None), slice(None)
+            else:
+                positions = np.array([partition.index.get(s, -1) for s in self.symbols], dtype=np.intp)
+                target = np.flatnonzero(positions >= 0)
+                source = positions[target]
+            for name, panel in self._panels.items():
+                if name in partition.column_pos:
+                    panel[d, target] = partition.column(name)[source]
+
+    def __len__(self):
+        return len(self.dates)
+
+    def column(self, name):
+        return self._panels[name]
+
+    @property
+    def prices(self):
+        return self._panels[self.price_column]
+
+
+class MarketAnalytics:
+    """
+    Returns, moving averages, volatility and VWAP deviation for every symbol at
+    once, computed from the local snapshot history.
+
+    The history only grows once a day, so the panel and every computed metric are
+    cached against the latest stored trading date and dropped when a new day lands.
+    """
+
+    def __init__(self, store, lookback=260, price_column='Close'):
+        self.store = store
+        self.lookback = lookback
+        self.price_column = price_column
+        self._lock = threading.Lock()
+        self._latest = None
+        self._panel = None
+        self._cache = {}
+
+    def panel(self):
+        """The cached MarketPanel for the latest stored date. Raises LookupError if there is no history."""
+        dates = self.store.dates()
+        if not dates:
+            raise LookupError("No snapshots stored yet.")
+        with self._lock:
+            if self._latest != dates[-1]:
+                self._panel = MarketPanel(self.store, self.lookback, self.price_column)
+                self._latest = dates[-1]
+                self._cache = {}
+            return self._panel
+
+    def _cached(self, key, compute):
+        panel = self.panel()
+        with self._lock:
+            if self._panel is panel and key in self._cache:
+                return self._cache[key]
+        value = compute(panel)
+        with self._lock:
+            if self._panel is panel:
+                self._cache[key] = value
+        return value
+
+    def _check_window(self, window, minimum=1):
+        if window < minimum or window >= self.lookback:
+            raise ValueError(f"Window must be between {minimum} and {self.lookback - 1} days.")
+
+    # --- Metrics (whole series, days x symbols) ---
+
+    def returns(self, days):
+        """`days`-trading-day simple returns in %, for every day where both ends are stored."""
+        self._check_window(days)
+        return self._cached(('returns', days), lambda panel: simple_returns(panel.prices, days))
+
+    def moving_average(self, window):
+        self._check_window(window)
+        return self._cached(('ma', window), lambda panel: rolling_mean(panel.prices, window))
+
+    def volatility(self, window):
+        """Rolling standard deviation of daily returns (in %) over `window` returns."""
+        self._check_window(window, minimum=2)
+        return self._cached(('vol', window), lambda panel: rolling_std(simple_returns(panel.prices, 1), window))
+
+    def vwap_deviation(self, window):
+        """
+        Price vs. the volume-weighted average price of the last `window` days, in %.
+        For window=1 this is the day's own VWAP (close vs. VWAP).
+        """
+        self._check_window(window)
+
+        def compute(panel):
+            vwap, volume = panel.column('VWAP'), panel.column('Vol')
+            traded, traded_count = _rolling_sums(vwap * volume, window)
+            volumes, volume_count = _rolling_sums(volume, window)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                average = np.where((traded_count == window) & (volume_count == window) & (volumes > 0),
+                                   traded / volumes, np.nan)
+                return (panel.prices[window - 1:] / average - 1) * 100
+        return self._cached(('vwap', window), compute)
+
+    # --- Views ---
+
+    def screen_metrics(self, returns=(1, 5, 20), moving_averages=(20, 50), volatility=(20,), vwap=(1, 20)):
+        """Names of the numeric columns screen() returns for these windows, the price column first."""
+        return ([self.price_column]
+                + [f"return_{days}d%" for days in returns]
+                + [f"ma_{window}" for window in moving_averages]
+                + [f"volatility_{window}d%" for window in volatility]
+                + [f"vwap_{window}d_deviation%" for window in vwap])
+
+    def screen(self, returns=(1, 5, 20), moving_averages=(20, 50), volatility=(20,), vwap=(1, 20)):
+        """One row per symbol with the latest value of every requested metric."""
+        panel = self.panel()
+        series = ([self.returns(days) for days in returns]
+                  + [self.moving_average(window) for window in moving_averages]
+                  + [self.volatility(window) for window in volatility]
+                  + [self.vwap_deviation(window) for window in vwap])
+        names = self.screen_metrics(returns, moving_averages, volatility, vwap)[1:]
+        metrics = dict(zip(names, series))
+        # Latest row of each metric, converted to Python floats once per column.
+        latest = {name: (series[-1] if len(series) else np.full(len(panel.symbols), np.nan)).tolist()
+                  for name, series in metrics.items()}
+        price = panel.prices[-1].tolist()
+        return {
+            "date": panel.dates[-1],
+            "days": len(panel),
+            "rows": [{"Symbol": symbol, panel.price_column: _json_number(price[i]),
+                      **{name: _json_number(values[i]) for name, values in latest.items()}}
+                     for i, symbol in enumerate(panel.symbols)],
+        }
+
+    def symbol_series(self, symbol, window=20):
+        """Daily price, moving average, volatility, return and VWAP deviation for one symbol."""
+        self._check_window(window, minimum=2)
+        panel = self.panel()
+        pos = panel.index.get(symbol)
+        if pos is None:
+            raise KeyError(symbol)
+        n = len(panel)
+
+        def aligned(series, column):
+            # Series start `n - len(series)` days after the first stored day.
+            return [None] * (n - len(series)) + [_json_number(v) for v in series[:, column].tolist()]
+
+        price = aligned(panel.prices, pos)
+        ma = aligned(self.moving_average(window), pos)
+        vol = aligned(self.volatility(window), pos)
+        ret = aligned(self.returns(1), pos)
+        vwap = aligned(self.vwap_deviation(1), pos)
+        return [{"Date": day, panel.price_column: price[d], f"ma_{window}": ma[d],
+                 f"volatility_{window}d%": vol[d], "return_1d%": ret[d], "vwap_deviation%": vwap[d]}
+                for d, day in enumerate(panel.dates)]
+
+    def check_published_averages(self, tolerance=1.0):
+        """
+        Compares the '120 Days' / '180 Days' columns of the latest snapshot with the
+        moving averages computed from stored history. Symbols without enough
+        history are skipped. `tolerance` is the allowed difference in %.
+        """
+        panel = self.panel()
+        report = {"date": panel.dates[-1], "days": len(panel), "tolerance%": tolerance, "columns": {}}
+        for column, window in PUBLISHED_AVERAGES.items():
+            if window > len(panel) or window >= self.lookback:
+                report["columns"][column] = {"window": window, "compared": 0,
+                                             "note": f"Needs {window} stored days, have {len(panel)}."}
+                continue
+            computed = self.moving_average(window)[-1]
+            published = panel.column(column)[-1]
+            both = ~np.isnan(computed) & ~np.isnan(published) & (published != 0)
+            diff = np.full(len(computed), np.nan)
+            diff[both] = (computed[both] / published[both] - 1) * 100
+            off = np.flatnonzero(both & (np.abs(np.nan_to_num(diff)) > tolerance))
+            report["columns"][column] = {
+                "window": window,
+                "compared": int(both.sum()),
+                "median_abs_diff%": _json_number(np.median(np.abs(diff[both]))) if both.any() else None,
+                "mismatches": [{"Symbol": panel.symbols[i], "published": _json_number(published[i]),
+                                "computed": _json_number(computed[i]), "diff%": _json_number(diff[i])}
+                               for i in off.tolist()],
+            }
+        return report
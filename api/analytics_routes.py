@@ -0,0 +1,92 @@
+# api/analytics_routes.py
+
+from flask import Blueprint, request, jsonify
+import logging
+import os
+
+from analytics import MarketAnalytics
+from api.portfolio_routes import history_store
+
+# Create a Blueprint
+analytics_bp = Blueprint('analytics_bp', __name__)
+
+# Metrics are computed over the last ANALYTICS_LOOKBACK stored trading days.
+market_analytics = MarketAnalytics(
+    history_store, lookback=int(os.getenv("ANALYTICS_LOOKBACK", 260))) if history_store is not None else None
+
+def _windows_arg(name, default):
+    value = request.args.get(name)
+    if value is None:
+        return default
+    return tuple(int(v) for v in value.split(',') if v.strip())
+
+def _disabled():
+    return jsonify({"error": "Local history store is disabled (HISTORY_DIR is empty)."}), 500
+
+@analytics_bp.route('/screen', methods=['GET'])
+def get_market_screen():
+    """
+    Latest returns, moving averages, volatility and VWAP deviation for every symbol.
+    Optional query params (comma separated day counts): returns, ma, volatility, vwap.
+    Also sort=<metric name> (descending, nulls last) and limit.
+    """
+    if market_analytics is None:
+        return _disabled()
+    try:
+        windows = dict(
+            returns=_windows_arg('returns', (1, 5, 20)),
+            moving_averages=_windows_arg('ma', (20, 50)),
+            volatility=_windows_arg('volatility', (20,)),
+            vwap=_windows_arg('vwap', (1, 20)),
+        )
+        # Only the numeric columns can be sorted on; 'Symbol' and unknown names are a 400.
+        sort = request.args.get('sort')
+        metrics = market_analytics.screen_metrics(**windows)
+        if sort and sort not in metrics:
+            return jsonify({"error": f"Unknown metric '{sort}'. Sort by one of: {', '.join(metrics)}."}), 400
+        screen = market_analytics.screen(**windows)
+        if sort:
+            screen["rows"].sort(key=lambda row: (row[sort] is None, -(row[sort] or 0)))
+        limit = request.args.get('limit', type=int)
+        if limit is not None:
+            screen["rows"] = screen["rows"][:limit]
+        return jsonify(screen), 200
+    except LookupError as e:
+        return jsonify({"error": str(e)}), 404
+    except ValueError as e:
+        return jsonify({"error": f"Invalid window: {e}"}), 400
+    except Exception as e:
+        logging.error(f"Error computing market screen: {e}")
+        return jsonify({"error": f"An unexpected error occurred while computing analytics: {e}"}), 500
+
+@analytics_bp.route('/symbol/<symbol>', methods=['GET'])
+def get_symbol_analytics(symbol):
+    """Daily price, moving average, volatility, return and VWAP deviation for one symbol. Optional query param: window."""
+    if market_analytics is None:
+        return _disabled()
+    try:
+        window = request.args.get('window', 20, type=int)
+        return jsonify(market_analytics.symbol_series(symbol.upper(), window)), 200
+    except KeyError:
+        return jsonify({"error": f"Symbol '{symbol}' not found in the latest snapshot."}), 404
+    except LookupError as e:
+        return jsonify({"error": str(e)}), 404
+    except ValueError as e:
+        return jsonify({"error": f"Invalid window: {e}"}), 400
+    except Exception as e:
+        logging.error(f"Error computing analytics for {symbol}: {e}")
+        return jsonify({"error": f"An unexpected error occurred while computing analytics: {e}"}), 500
+
+@analytics_bp.route('/check-averages', methods=['GET'])
+def check_published_averages():
+    """Compares the '120 Days' / '180 Days' columns with averages computed from history. Optional query param: tolerance (%)."""
+    if market_analytics is None:
+        return _disabled()
+    try:
+        tolerance = request.args.get('tolerance', 1.0, type=float)
+        return jsonify(market_analytics.check_published_averages(tolerance)), 200
+    except LookupError as e:
+        return jsonify({"error": str(e)}), 404
+    except Exception as e:
+        logging.error(f"Error checking published averages: {e}")
+        return jsonify({"error": f"An unexpected error occurred while computing analytics: {e}"}), 500
@@ -0,0 +1,141 @@
+# api/floorsheet_routes.py
+
+from flask import Blueprint, request, jsonify
+import logging
+import os
+from datetime import date, datetime, timezone
+
+from floorsheet import FloorsheetIngester, FloorsheetStore
+from price_cache import NEPAL_TZ
+from api.portfolio_routes import scrape_floorsheet_page
+
+# Create a Blueprint
+floorsheet_bp = Blueprint('floorsheet_bp', __name__)
+
+# --- Floorsheet store and ingester ---
+# Trades are kept under FLOORSHEET_DIR (set it empty to disable); pages are fetched
+# by FLOORSHEET_WORKERS threads sharing the scrape client's connection pool.
+floorsheet_dir = os.getenv("FLOORSHEET_DIR", "data/floorsheet")
+floorsheet_store = FloorsheetStore(floorsheet_dir) if floorsheet_dir else None
+floorsheet_ingester = FloorsheetIngester(
+    scrape_floorsheet_page, floorsheet_store,
+    workers=int(os.getenv("FLOORSHEET_WORKERS", 4))) if floorsheet_store is not None else None
+
+def _disabled():
+    return jsonify({"error": "Floorsheet store is disabled (FLOORSHEET_DIR is empty)."}), 500
+
+def _load_day(day):
+    """The stored day, or an error response tuple."""
+    if day != 'latest':
+        try:
+            date.fromisoformat(day)
+        except ValueError:
+            return None, (jsonify({"error": "Date must be in YYYY-MM-DD format or 'latest'."}), 400)
+    stored = floorsheet_store.day(day)
+    if stored is None:
+        return None, (jsonify({"error": f"No floorsheet stored for {day}."}), 404)
+    return stored, None
+
+# Scalar numeric fields the aggregate lists can be sorted on.
+SYMBOL_SORT_FIELDS = ("Trades", "Quantity", "Amount", "VWAP", "Open", "High", "Low", "Close")
+BROKER_SORT_FIELDS = ("Trades", "Buy quantity", "Buy amount", "Sell quantity", "Sell amount",
+                      "Net quantity", "Net amount")
+
+def _limit(rows, default_sort, fields):
+    """Applies ?sort= (descending, one of `fields`) and ?limit= to aggregate rows. Returns (rows, error response)."""
+    sort = request.args.get('sort', default_sort)
+    if sort not in fields:
+        return None, (jsonify({"error": f"Unknown sort field '{sort}'. Sort by one of: {', '.join(fields)}."}), 400)
+    rows = sorted(rows, key=lambda row: row[sort], reverse=True)
+    limit = request.args.get('limit', type=int)
+    return (rows[:limit] if limit is not None else rows), None
+
+@floorsheet_bp.route('/ingest', methods=['POST'])
+def ingest_floorsheet():
+    """
+    Fetches every page of today's floorsheet and stores it with its aggregates.
+    Optional query param: date (YYYY-MM-DD) to label the trading day; defaults to today in Nepal.
+    """
+    if floorsheet_ingester is None:
+        return _disabled()
+    try:
+        day = request.args.get('date') or datetime.now(timezone.utc).astimezone(NEPAL_TZ).date().isoformat()
+        date.fromisoformat(day)
+    except ValueError:
+        return jsonify({"error": "Date must be in YYYY-MM-DD format."}), 400
+    try:
+        return jsonify(floorsheet_ingester.ingest(day)), 201
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 409
+    except ConnectionError as e:
+        return jsonify({"error": str(e)}), 503
+    except Exception as e:
+        logging.error(f"Error ingesting floorsheet: {e}")
+        return jsonify({"error": f"An unexpected error occurred while ingesting the floorsheet: {e}"}), 500
+
+@floorsheet_bp.route('/status', methods=['GET'])
+def get_floorsheet_status():
+    """Stored days and the last ingest run."""
+    if floorsheet_ingester is None:
+        return _disabled()
+    return jsonify({"dates": floorsheet_store.dates(), **floorsheet_ingester.status()}), 200
+
+@floorsheet_bp.route('/<day>', methods=['GET'])
+def get_floorsheet_totals(day):
+    """Whole-market totals for a stored day ('latest' for the most recent)."""
+    if floorsheet_store is None:
+        return _disabled()
+    stored, error = _load_day(day)
+    if error:
+        return error
+    return jsonify({"date": stored.date, **stored.aggregates["totals"]}), 200
+
+@floorsheet_bp.route('/<day>/symbols', methods=['GET'])
+def get_floorsheet_symbols(day):
+    """Per-symbol aggregates (VWAP, high/low, top brokers). Optional query params: sort (default Amount), limit."""
+    if floorsheet_store is None:
+        return _disabled()
+    stored, error = _load_day(day)
+    if error:
+        return error
+    rows, error = _limit(stored.aggregates["symbols"], "Amount", SYMBOL_SORT_FIELDS)
+    if error:
+        return error
+    return jsonify(rows), 200
+
+@floorsheet_bp.route('/<day>/symbols/<symbol>', methods=['GET'])
+def get_floorsheet_symbol(day, symbol):
+    if floorsheet_store is None:
+        return _disabled()
+    stored, error = _load_day(day)
+    if error:
+        return error
+    row = stored.by_symbol.get(symbol.upper())
+    if row is None:
+        return jsonify({"error": f"Symbol '{symbol}' did not trade on {stored.date}."}), 404
+    return jsonify(row), 200
+
+@floorsheet_bp.route('/<day>/brokers', methods=['GET'])
+def get_floorsheet_brokers(day):
+    """Per-broker buy/sell/net totals. Optional query params: sort (default 'Net amount'), limit."""
+    if floorsheet_store is None:
+        return _disabled()
+    stored, error = _load_day(day)
+    if error:
+        return error
+    rows, error = _limit(stored.aggregates["brokers"], "Net amount", BROKER_SORT_FIELDS)
+    if error:
+        return error
+    return jsonify(rows), 200
+
+@floorsheet_bp.route('/<day>/brokers/<int:broker>', methods=['GET'])
+def get_floorsheet_broker(day, broker):
+    if floorsheet_store is None:
+        return _disabled()
+    stored, error = _load_day(day)
+    if error:
+        return error
+    row = stored.by_broker.get(broker)
+    if row is None:
+        return jsonify({"error": f"Broker {broker} did not trade on {stored.date}."}), 404
+    return jsonify(row), 200
@@ -0,0 +1,60 @@
+# api/history_routes.py
+
+from flask import Blueprint, request, jsonify
+import logging
+from datetime import date
+
+from api.portfolio_routes import history_store
+
+# Create a Blueprint
+history_bp = Blueprint('history_bp', __name__)
+
+def _parse_date_arg(name):
+    value = request.args.get(name)
+    return date.fromisoformat(value) if value else None
+
+def _columns_arg():
+    value = request.args.get('columns')
+    return [c.strip() for c in value.split(',') if c.strip()] if value else None
+
+@history_bp.route('/<symbol>', methods=['GET'])
+def get_symbol_history(symbol):
+    """
+    Daily snapshot rows for one symbol from the local history store.
+    Optional query params: from, to (YYYY-MM-DD), columns (comma separated, e.g. Close,Vol).
+    """
+    if history_store is None:
+        return jsonify({"error": "Local history store is disabled (HISTORY_DIR is empty)."}), 500
+    try:
+        start = _parse_date_arg('from')
+        end = _parse_date_arg('to')
+    except ValueError:
+        return jsonify({"error": "'from' and 'to' must be dates in YYYY-MM-DD format."}), 400
+    try:
+        rows = history_store.symbol_history(symbol.upper(), start, end, columns=_columns_arg())
+        return jsonify(rows), 200
+    except KeyError as e:
+        return jsonify({"error": f"Unknown column: {e}"}), 400
+    except Exception as e:
+        logging.error(f"Error reading history for {symbol}: {e}")
+        return jsonify({"error": f"An unexpected error occurred while reading history: {e}"}), 500
+
+@history_bp.route('/date/<day>', methods=['GET'])
+def get_market_on_date(day):
+    """All symbols' snapshot rows for one trading date. Optional query param: columns."""
+    if history_store is None:
+        return jsonify({"error": "Local history store is disabled (HISTORY_DIR is empty)."}), 500
+    try:
+        date.fromisoformat(day)
+    except ValueError:
+        return jsonify({"error": "Date must be in YYYY-MM-DD format."}), 400
+    try:
+        rows = history_store.cross_section(day, columns=_columns_arg())
+        if rows is None:
+            return jsonify({"error": f"No snapshot stored for {day}."}), 404
+        return jsonify(rows), 200
+    except KeyError as e:
+        return jsonify({"error": f"Unknown column: {e}"}), 400
+    except Exception as e:
+        logging.error(f"Error reading history for {day}: {e}")
+        return jsonify({"error": f"An unexpected error occurred while reading history: {e}"}), 500
@@ -1,46 +1,49 @@
 # api/portfolio_routes.py
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, g, request, jsonify
 import logging
+import math
 import os
+import queue
+import threading
+from functools import partial
 import requests
-from bs4 import BeautifulSoup
-from datetime import date 
 
-# --- CORRECTED IMPORT ---
-# Import the new, correct variable names from your client file
-from gspread_client import portfolio_sheet, turnover_sheet, daily_data_sheet , watchlist_sheet, realized_gains_sheet
+# Worksheet accessors: each opens its tab lazily and returns None while Sheets is unavailable.
+from gspread_client import turnover_sheet, daily_data_sheet, connection as sheets_connection, open_spreadsheet
+from price_cache import PriceCache, last_session_date
+from html_parsers import parse_market_summary, parse_share_price_table
+from price_table import PriceTable
+from portfolio_summary import Holdings, PortfolioValuation
+from portfolio_books import PortfolioBook, PortfolioBooks, UserAuth, load_user_map, load_user_tokens
+from sheet_mirror import MirrorStore, SheetColumnIndex, SheetMirror
+from write_behind import WriteBehindQueue
+from history_store import HistoryStore
+from pipeline import run_concurrently, run_in_background
+from scrape_client import ScrapeClient
+from price_stream import PriceStreamHub, format_sse
+from floorsheet import parse_floorsheet
+from instrumentation import span
+from response_cache import ResponseCache
 
 # Create a Blueprint
 portfolio_bp = Blueprint('portfolio_bp', __name__)
 
+# --- Shared scraping client ---
+# One pooled keep-alive session for both scrapers, with compressed transfers,
+# ETag/Last-Modified revalidation and content-hash checks that skip re-parsing
+# a page that has not changed (e.g. after market close). Parses are kept for the
+# SCRAPE_CACHE_SIZE most recently fetched pages.
+scrape_client = ScrapeClient(pool_maxsize=int(os.getenv("HTTP_POOL_SIZE", 10)),
+                             max_entries=int(os.getenv("SCRAPE_CACHE_SIZE", 256)))
+
 # --- Market Summary and other functions from before ---
 # (No changes needed in these helper functions).00.
 def scrape_market_summary():
     # ... (function is correct)
     url = os.getenv("SCRAPE_API")+'/market-summary'
-    print(url)
-    headers = { 'User-Agent': 'Mozilla/5.0 ...' }
     try:
-        req = requests.get(url, headers=headers, timeout=10)
-        req.raise_for_status()
-        soup = BeautifulSoup(req.text, 'html.parser')
-        summary_div = soup.find('div', id='market_symmary_data')
-        if not summary_div:
-            raise ValueError("Could not find market summary container.")
-        date_span = summary_div.find('span', class_='text-org')
-        if not date_span:
-            raise ValueError("Could not find market date.")
-        market_date = date_span.get_text(strip=True)
-        summary_data = {"Date": market_date}
-        rows = summary_div.find_all('tr')
-        for row in rows:
-            cells = row.find_all('td')
-            if len(cells) == 2:
-                key = cells[0].get_text(strip=True).replace('(Rs.)', '').strip()
-                value = cells[1].get_text(strip=True)
-                summary_data[key] = value
-        return summary_data
+        return scrape_client.get_parsed(url, parse_market_summary)
     except requests.exceptions.RequestException as e:
         raise ConnectionError(f"Failed to retrieve market summary: {e}")
     except ValueError as e:
@@ -49,56 +52,225 @@ def scrape_market_summary():
 def scrape_share_prices():
     # ... (function is correct)
     url = os.getenv("SCRAPE_API")+'/today-share-price'
-    headers = {'User-Agent': 'Mozilla/5.0 ...'}
     try:
-        req = requests.get(url, headers=headers, timeout=10)
-        req.raise_for_status()
-        soup = BeautifulSoup(req.text, 'html.parser')
-        data_table = soup.find('table', id='headFixed')
-        if not data_table:
-            raise ValueError("Could not find data table with id='headFixed'.")
-        thead = data_table.find('thead')
-        if not thead:
-            raise ValueError("Could not find table header.")
-        header = [th.get_text(strip=True) for th in thead.find_all('th')]
-        tbody = data_table.find('tbody')
-        if not tbody:
-            raise ValueError("Could not find table body.")
-        all_rows = []
-        for row in tbody.find_all('tr'):
-            cols = [ele.get_text(strip=True) for ele in row.find_all('td')]
-            row_dict = dict(zip(header, cols))
-            all_rows.append(row_dict)
-        return all_rows
+        return scrape_client.get_parsed(url, parse_share_price_table)
        
     except requests.exceptions.RequestException as e:
         raise ConnectionError(f"Failed to retrieve data from website: {e}")
     except ValueError as e:
         raise ValueError(f"Error processing HTML content: {e}")
 
+def scrape_floorsheet_page(page):
+    """One floorsheet page as (TradeChunk, last_page). Unchanged pages are not parsed again."""
+    url = os.getenv("SCRAPE_API")+f'/floorsheet?page={page}'
+    try:
+        return scrape_client.get_parsed(url, parse_floorsheet)
+    except requests.exceptions.RequestException as e:
+        raise ConnectionError(f"Failed to retrieve floorsheet page {page}: {e}")
+    except ValueError as e:
+        raise ValueError(f"Error processing floorsheet page {page}: {e}")
+
+_last_price_rows = None
+_last_price_table = None
+
+def load_price_table():
+    """Scrapes today's share prices and parses them once into a columnar PriceTable."""
+    global _last_price_rows, _last_price_table
+    rows = scrape_share_prices()
+    # The scrape client hands back the very same list when the page did not change;
+    # reuse the table built from it too.
+    if rows is not _last_price_rows:
+        with span('parse'):
+            _last_price_table = PriceTable.from_rows(rows)
+        _last_price_rows = rows
+    return _last_price_table
+
+# --- Shared price cache ---
+# Every route reads share prices through this cache instead of calling
+# scrape_share_prices() directly, so N requests inside the TTL cost one scrape.
+share_price_cache = PriceCache(
+    load_price_table,
+    ttl=float(os.getenv("PRICE_CACHE_TTL", 30)),
+    stale_ttl=float(os.getenv("PRICE_CACHE_STALE_TTL", 300)),
+    name="share_prices",
+)
+
+# --- Live price stream ---
+# One poller shared by every /prices/stream client; it only runs while someone is listening.
+price_stream_hub = PriceStreamHub(share_price_cache, interval=float(os.getenv("PRICE_STREAM_INTERVAL", 5)))
+PRICE_STREAM_HEARTBEAT = 15
+
+# --- Response cache ---
+# The big list routes serialize once per data version and answer If-None-Match with 304.
+response_cache = ResponseCache(gzip_min_size=int(os.getenv("RESPONSE_GZIP_MIN_SIZE", 1024)))
+
 # --- UPDATED ROUTES ---
 
-def save_full_daily_snapshot(all_share_data):
+# --- Worksheet mirrors ---
+# Reads are served from these in-memory copies; writes go to the sheet and the mirror.
+# Their sources are the lazy gspread_client accessors, so a sheet that connects later is picked up.
+sheet_mirror_ttl = float(os.getenv("SHEET_MIRROR_TTL", 60))
+sheet_mirror_store = MirrorStore(os.getenv("SHEET_MIRROR_DB")) if os.getenv("SHEET_MIRROR_DB") else None
+sheet_version_check = (lambda ws: ws.spreadsheet.get_lastUpdateTime()) if os.getenv("SHEET_MIRROR_VERSION_CHECK") == "1" else None
+
+# --- Optional write-behind ---
+# With SHEETS_WRITE_BEHIND=1, mutations are journaled and applied to the sheets by a
+# background worker, so requests no longer wait on the Sheets API. Each worker
+# process journals to its own file next to SHEETS_WRITE_JOURNAL (see WriteJournal).
+write_queue = None
+if os.getenv("SHEETS_WRITE_BEHIND") == "1":
+    write_queue = WriteBehindQueue(
+        os.getenv("SHEETS_WRITE_JOURNAL", "data/sheets_write_journal.jsonl"),
+        flush_interval=float(os.getenv("SHEETS_WRITE_FLUSH_INTERVAL", 1.0)),
+    )
+
+def _mirror(source, name, on_error=None):
+    return SheetMirror(source, name=name, ttl=sheet_mirror_ttl, store=sheet_mirror_store,
+                       version_check=sheet_version_check, writer=write_queue, on_error=on_error)
+
+turnover_mirror = _mirror(turnover_sheet, "Turnover", partial(sheets_connection.handle_error, worksheet="Turnover"))
+
+# --- Portfolio books ---
+# A book is one Portfolio / Watchlist / Realized Gains set with its mirrors and the
+# incremental valuation that /summary and /summary/delta move forward by price deltas.
+# The routes below serve the default book (the app's own spreadsheet) under
+# /api/v1/portfolio and a user's book under /api/v1/users/<user_id>/portfolio.
+valuation_log_size = int(os.getenv("VALUATION_LOG_SIZE", 256))
+
+def _user_book(user_id, connection, prefix):
+    return PortfolioBook(f"user/{user_id}", connection, _mirror, prefix=prefix,
+                         mirror_prefix=f"{user_id}/", log_size=valuation_log_size)
+
+def _book_busy(book):
+    return write_queue is not None and any(write_queue.pending(mirror.name) for mirror in book.mirrors)
+
+def _book_evicted(book):
+    response_cache.discard(f"{book.key}:")
+    if write_queue is not None:
+        # Let go of the mirrors' sources so the evicted book can be freed.
+        for mirror in book.mirrors:
+            write_queue.unregister(mirror.name)
+
+default_book = PortfolioBook("default", sheets_connection, _mirror, log_size=valuation_log_size)
+portfolio_mirror = default_book.portfolio
+watchlist_mirror = default_book.watchlist
+realized_gains_mirror = default_book.realized_gains
+
+# USER_SPREADSHEETS maps users to their own spreadsheet or to a prefixed worksheet
+# shard of this one (see portfolio_books.load_user_map). At most USER_CACHE_SIZE
+# users keep their sheet handles and mirrors in memory. Every /users/<user_id>
+# request is authenticated as that user first (see portfolio_books.UserAuth): with
+# a bearer token from the user's entry, or by a proxy-set USER_AUTH_HEADER.
+user_auth = UserAuth(load_user_tokens(os.getenv("USER_SPREADSHEETS")), os.getenv("USER_AUTH_HEADER"))
+portfolio_books = PortfolioBooks(
+    load_user_map(os.getenv("USER_SPREADSHEETS")), open_spreadsheet, _user_book, sheets_connection,
+    max_books=int(os.getenv("USER_CACHE_SIZE", 100)), wait=sheets_connection.wait,
+    busy=_book_busy, on_evict=_book_evicted,
+)
+if write_queue is not None:
+    # Writes journaled for a user's sheets before a restart need that user's book to be applied.
+    for name in write_queue.status()["pending"]:
+        if "/" in name:
+            portfolio_books.get(name.split("/", 1)[0])
+
+@portfolio_bp.url_value_preprocessor
+def _select_book(endpoint, values):
+    user_id = values.pop('user_id', None) if values else None
+    g.user_id = user_id
+    g.auth_error = None
+    if user_id is None:
+        g.book = default_book
+    elif user_id not in portfolio_books.users:
+        g.book = None
+    else:
+        # Authenticate before building the book, so anonymous requests cannot load or evict books.
+        g.auth_error = user_auth.check(user_id, request.headers)
+        g.book = portfolio_books.get(user_id) if g.auth_error is None else None
+
+@portfolio_bp.before_request
+def _require_book():
+    if g.get('auth_error') is not None:
+        status, message = g.auth_error
+        response = jsonify({"error": message})
+        if status == 401:
+            response.headers['WWW-Authenticate'] = 'Bearer'
+        return response, status
+    if g.get('book') is None:
+        return jsonify({"error": f"Unknown user '{g.get('user_id')}'."}), 404
+
+# The Market sheet is too big to mirror; only its Date column is indexed, so the
+# once-a-day duplicate check no longer scans the whole sheet with find().
+market_sheet_error = partial(sheets_connection.handle_error, worksheet="Market")
+market_date_index = SheetColumnIndex(daily_data_sheet, column=1, name="Market", on_error=market_sheet_error)
+snapshot_lock = threading.Lock()
+
+# --- Local snapshot history ---
+# Daily snapshots go to a local columnar store (HISTORY_DIR, set it empty to disable).
+# The Google "Market" sheet copy is kept by default and can be switched off with SNAPSHOT_TO_SHEETS=0.
+history_dir = os.getenv("HISTORY_DIR", "data/history")
+history_store = HistoryStore(history_dir) if history_dir else None
+snapshot_to_sheets = os.getenv("SNAPSHOT_TO_SHEETS", "1") != "0"
+if write_queue is not None:
+    write_queue.register("Market", daily_data_sheet, on_error=market_sheet_error)
+
+# The snapshot is checked once per scraped table, not once per request: the cache
+# hands out the same PriceTable object until it reloads.
+_snapshot_scheduled_for = None
+_snapshot_schedule_lock = threading.Lock()
+
+def schedule_daily_snapshot(price_table):
+    """Runs save_full_daily_snapshot in the background, unless it already ran for this very table."""
+    global _snapshot_scheduled_for
+    with _snapshot_schedule_lock:
+        if price_table is _snapshot_scheduled_for:
+            return
+        _snapshot_scheduled_for = price_table
+    run_in_background(save_full_daily_snapshot, price_table)
+
+def save_full_daily_snapshot(price_table):
     """
-    Appends a full snapshot of the day's share data to the DailyMarketData sheet.
+    Saves a full snapshot of the day's share data to the local history store and,
+    unless SNAPSHOT_TO_SHEETS=0, appends it to the DailyMarketData sheet.
     Checks for the date to avoid saving duplicate data for the same day.
+    The date is the trading session the prices belong to, not the server's
+    calendar day: nothing is saved while a session is still in progress.
     """
-    if daily_data_sheet is None:
-        logging.error("Google Sheets 'DailyMarketData' not connected. Cannot save full snapshot.")
-        return
-
-    if not all_share_data:
+    if not len(price_table):
         logging.warning("No share data provided to save_full_daily_snapshot.")
         return
-        
+
     try:
-        today_str = date.today().isoformat()
+        if history_store is not None:
+            today_str = history_store.session_date(price_table)
+        else:
+            session = last_session_date()
+            today_str = session.isoformat() if session is not None else None
+    except Exception as e:
+        logging.error(f"Could not work out the trading session of the daily snapshot: {e}")
+        return
+    if today_str is None:
+        return
+
+    if history_store is not None:
+        try:
+            if history_store.append(today_str, price_table):
+                logging.info(f"Stored market snapshot with {len(price_table)} records for {today_str} in {history_store.root}.")
+        except Exception as e:
+            logging.error(f"Failed to store daily snapshot in the local history store: {e}")
+
+    if not snapshot_to_sheets:
+        return
 
+    market_sheet = daily_data_sheet()
+    if market_sheet is None:
+        logging.error("Google Sheets 'DailyMarketData' not connected. Cannot save full snapshot.")
+        return
+
+    try:
         # --- NEW: Check if data for today already exists ---
         # This prevents adding duplicate data if the script is run multiple times a day.
-        # It checks the first column ('Date') for today's date.
-        cell = daily_data_sheet.find(today_str, in_column=1)
-        if cell:
+        # It checks the first column ('Date') for today's date, via the local date index.
+        if today_str in market_date_index:
             logging.info(f"Full market snapshot for {today_str} already exists. Skipping save.")
             return
 
@@ -112,29 +284,39 @@ def save_full_daily_snapshot(all_share_data):
         
         # Prepare all rows for a single batch update
         rows_to_add = []
-        for record in all_share_data:
+        for record in price_table.to_records():
             # Create a list of values for the current record, starting with the date
             # Note: We skip the first header ('Date') when mapping record values
             row_values = [today_str] + [record.get(h, "N/A") for h in headers[1:]]
             rows_to_add.append(row_values)
             
         if rows_to_add:
-            # --- MODIFIED: Use append_rows without clearing the sheet ---
-            daily_data_sheet.append_rows(rows_to_add, value_input_option='USER_ENTERED')
-            logging.info(f"Successfully APPENDED full market snapshot with {len(all_share_data)} records for {today_str}.")
+            with snapshot_lock:
+                # Re-check under the lock so concurrent requests append the day only once.
+                if today_str in market_date_index:
+                    return
+                # --- MODIFIED: Use append_rows without clearing the sheet ---
+                if write_queue is not None:
+                    write_queue.submit("Market", "append_rows", rows=rows_to_add, value_input_option='USER_ENTERED')
+                else:
+                    with span('sheet_write'):
+                        market_sheet.append_rows(rows_to_add, value_input_option='USER_ENTERED')
+                market_date_index.add(today_str, count=len(rows_to_add))
+            logging.info(f"Successfully APPENDED full market snapshot with {len(price_table)} records for {today_str}.")
 
     except Exception as e:
         logging.error(f"Failed to save and append full daily snapshot to Google Sheets: {e}")
+        market_sheet_error(e)
 
 @portfolio_bp.route('/market-summary', methods=['GET'])
 def get_market_summary():
-    if turnover_sheet is None:
+    if turnover_sheet() is None:
         return jsonify({"error": "Google Sheets 'Turnover' tab not connected."}), 500
     # ... (rest of this function is correct and uses turnover_sheet)
     try:
-        latest_data = scrape_market_summary()
+        # The scrape and the sheet read are independent, so they run in parallel.
+        latest_data, existing_records = run_concurrently(scrape_market_summary, turnover_mirror.get_all_records)
         latest_date = latest_data.get("Date")
-        existing_records = turnover_sheet.get_all_records()
         saved_dates = {str(record.get('Date')) for record in existing_records}
         if latest_date in saved_dates:
             logging.info(f"Market data for {latest_date} already exists.")
@@ -146,7 +328,7 @@ def get_market_summary():
             logging.info(f"New market data for {latest_date} found. Saving to sheet.")
             headers = ["Date", "Total Turnovers", "Total Traded Shares", "Total Transaction", "Total Scrips Traded", "Total Market Cap", "Floated Market Cap"]
             new_row = [latest_data.get(header, "N/A") for header in headers]
-            turnover_sheet.append_row(new_row, value_input_option='USER_ENTERED')
+            turnover_mirror.append_row(new_row, value_input_option='USER_ENTERED')
             return jsonify(latest_data)
     except (ConnectionError, ValueError) as e:
         return jsonify({"error": str(e)}), 500
@@ -157,32 +339,80 @@ def get_market_summary():
 def get_share_prices():
     """
     Fetches live prices AND triggers the save to Google Sheets.
+    ?format=columnar returns {"columns": [...], "rows": [[...], ...]} instead of one object per row.
     """
     try:
-        data = scrape_share_prices()
-        if not data:
+        price_table = share_price_cache.get()
+        if not len(price_table):
             return jsonify({"error": "No data found on the page."}), 404
 
         # --- FIX: Call the save function here ---
         # This line was missing. It tells the app to save the data it just scraped.
-        save_full_daily_snapshot(data)
+        # It runs in the background so the response never waits on the Sheets write.
+        schedule_daily_snapshot(price_table)
 
-        return jsonify(data)
+        headers = {'X-Price-Cache-Age': f"{share_price_cache.age or 0:.3f}"}
+        if request.args.get('format') == 'columnar':
+            return response_cache.respond('prices:columnar', price_table, price_table.to_columnar, headers)
+        return response_cache.respond('prices', price_table, price_table.to_records, headers)
     except (ConnectionError, ValueError) as e:
         return jsonify({"error": str(e)}), 500
     except Exception as e:
         return jsonify({"error": f"An unexpected error occurred: {e}"}), 500
 
+@portfolio_bp.route('/prices/stream', methods=['GET'])
+def stream_share_prices():
+    """
+    Server-Sent Events stream of price changes (LTP, Vol, Turnover).
+    The first event is a full 'snapshot'; each 'update' event carries only the symbols that changed.
+    Filter with ?symbols=NABIL,NICA and/or ?watchlist=1.
+    """
+    symbols = request.args.get('symbols', '').split(',')
+    try:
+        if request.args.get('watchlist') == '1':
+            symbols += [str(row[0]) for row in g.book.watchlist.get_all_values()[1:] if row]
+        # Query and watchlist symbols are matched against the table the same way.
+        symbols = [s.strip().upper() for s in symbols if s.strip()]
+        subscriber = price_stream_hub.subscribe(symbols or None)
+    except Exception as e:
+        logging.error(f"Error opening price stream: {e}")
+        return jsonify({"error": f"An unexpected error occurred: {e}"}), 500
+    try:
+        first = price_stream_hub.snapshot(subscriber)
+    except (ConnectionError, ValueError) as e:
+        price_stream_hub.unsubscribe(subscriber)
+        return jsonify({"error": str(e)}), 500
+
+    def generate():
+        try:
+            yield format_sse('snapshot', first)
+            while True:
+                try:
+                    event, data = subscriber.queue.get(timeout=PRICE_STREAM_HEARTBEAT)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                if event == 'resync':
+                    # The client fell behind and missed updates; send the full state again.
+                    yield format_sse('snapshot', price_stream_hub.snapshot(subscriber))
+                else:
+                    yield format_sse(event, data)
+        finally:
+            price_stream_hub.unsubscribe(subscriber)
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @portfolio_bp.route('/', methods=['GET'])
 def get_portfolio():
     """Gets all portfolio data from the sheet."""
     # **FIX**: Use portfolio_sheet instead of worksheet
-    if portfolio_sheet is None:
+    if g.book.worksheet("Portfolio") is None:
         return jsonify({"error": "Google Sheets 'Portfolio' not connected."}), 500
     try:
         # **FIX**: Use portfolio_sheet instead of worksheet
-        records = portfolio_sheet.get_all_records()
-        return jsonify(records)
+        records = g.book.portfolio.get_all_records()
+        return response_cache.respond(f'{g.book.key}:portfolio', records, lambda: records)
     except Exception as e:
         logging.error(f"Error fetching from Google Sheets: {e}")
         return jsonify({"error": "An error occurred while fetching the portfolio."}), 500
@@ -198,7 +428,7 @@ def add_to_wishlist():
     """
     try:
         # Check if the 'watchlist_sheet' is connected
-        if watchlist_sheet is None:
+        if g.book.worksheet("Watchlist") is None:
             return jsonify({"error": "Google Sheets 'Watchlist' not connected."}), 500
 
         data = request.get_json()
@@ -211,7 +441,7 @@ def add_to_wishlist():
 
         # --- NEW: Check if the scrip already exists ---
         # This assumes scrips are in the first column (A)
-        existing_cell = watchlist_sheet.find(scrip_to_add, in_column=1)
+        existing_cell = g.book.watchlist.find(scrip_to_add, in_column=1)
         if existing_cell:
             return jsonify({"error": f"Scrip '{scrip_to_add}' already exists in wishlist."}), 409 # 409 Conflict
 
@@ -219,7 +449,7 @@ def add_to_wishlist():
         new_row = [scrip_to_add]
         
         # Append the new row to the watchlist sheet
-        watchlist_sheet.append_row(new_row, value_input_option='USER_ENTERED')
+        g.book.watchlist.append_row(new_row, value_input_option='USER_ENTERED')
         
         return jsonify({"message": "Scrip added to wishlist successfully."}), 201
         
@@ -233,7 +463,7 @@ def remove_from_wishlist():
     """Removes a stock scrip from the wishlist sheet."""
     try:
         # Check if the 'watchlist_sheet' is connected
-        if watchlist_sheet is None:
+        if g.book.worksheet("Watchlist") is None:
             return jsonify({"error": "Google Sheets 'Watchlist' not connected."}), 500
 
         data = request.get_json()
@@ -246,11 +476,11 @@ def remove_from_wishlist():
 
         # Find the cell with the matching scrip
         # This assumes scrips are in the first column (A)
-        cell_to_delete = watchlist_sheet.find(scrip_to_delete, in_column=1)
+        cell_to_delete = g.book.watchlist.find(scrip_to_delete, in_column=1)
         
         if cell_to_delete:
             # If found, delete the entire row
-            watchlist_sheet.delete_rows(cell_to_delete.row)
+            g.book.watchlist.delete_rows(cell_to_delete.row)
             return jsonify({"message": f"Scrip '{scrip_to_delete}' removed from wishlist."}), 200
         else:
             # If not found, return a 404 error
@@ -266,13 +496,13 @@ def get_wishlist():
     """Fetches all scrips from the wishlist sheet."""
     try:
         # Check if the 'watchlist_sheet' is connected
-        if watchlist_sheet is None:
+        if g.book.worksheet("Watchlist") is None:
             return jsonify({"error": "Google Sheets 'Watchlist' not connected."}), 500
 
         # Fetch all records from the sheet
-        records = watchlist_sheet.get_all_records()
+        records = g.book.watchlist.get_all_records()
         
-        return jsonify(records), 200
+        return response_cache.respond(f'{g.book.key}:wishlist', records, lambda: records)
             
     except Exception as e:
         logging.error(f"Error fetching wishlist: {e}")
@@ -283,7 +513,7 @@ def add_stock():
     """Adds a stock to the default portfolio sheet."""
     try:
         # **FIX**: Use portfolio_sheet instead of worksheet
-        if portfolio_sheet is None:
+        if g.book.worksheet("Portfolio") is None:
             return jsonify({"error": "Google Sheets 'Portfolio' not connected."}), 500
 
         data = request.get_json()
@@ -294,7 +524,7 @@ def add_stock():
         new_row = [data['scrip'], data['sector'], data['quantity'], data['purchasePrice']]
         
         # **FIX**: Use portfolio_sheet instead of worksheet
-        portfolio_sheet.append_row(new_row, value_input_option='USER_ENTERED')
+        g.book.portfolio.append_row(new_row, value_input_option='USER_ENTERED')
         
         return jsonify({"message": "Stock added successfully."}), 201
         
@@ -306,65 +536,96 @@ def get_portfolio_summary():
     """Merges portfolio data with live market prices to provide a full summary."""
     try:
         # **FIX**: Use portfolio_sheet instead of worksheet
-        if portfolio_sheet is None:
+        if g.book.worksheet("Portfolio") is None:
              return jsonify({"error": "Google Sheets 'Portfolio' not connected."}), 500
         
         # **FIX**: Use portfolio_sheet instead of worksheet
-        portfolio_holdings = portfolio_sheet.get_all_records()
-        market_data_list = scrape_share_prices()
-        save_full_daily_snapshot(market_data_list)
-        market_prices = {item['Symbol']: item for item in market_data_list}
-        
-        # ... (rest of the summary logic is correct)
-        total_portfolio_purchase_value = sum(stock.get('quantity', 0) * stock.get('purchasePrice', 0) for stock in portfolio_holdings)
-        if total_portfolio_purchase_value == 0:
-            total_portfolio_purchase_value = 1 
-
-        summary_list = []
-        for stock in portfolio_holdings:
-            symbol = stock.get('scrip')
-            if not symbol or not stock.get('quantity'):
-                continue
-            purchase_price = stock.get('purchasePrice', 0)
-            quantity = stock.get('quantity', 0)
-            sector = stock.get('sector', 'N/A') 
-            stock_market_data = market_prices.get(symbol)
-            ltp = 0.0
-            week_high_low = "N/A"
-            if stock_market_data:
-                try:
-                    ltp = float(stock_market_data.get('LTP', '0').replace(',', ''))
-                except (ValueError, AttributeError):
-                    ltp = 0.0
-                high = stock_market_data.get('52 Weeks High', 'N/A')
-                low = stock_market_data.get('52 Weeks Low', 'N/A')
-                week_high_low = f"{high} / {low}"
-            purchase_value = purchase_price * quantity
-            current_value = ltp * quantity if ltp > 0 else 0
-            profit_amount = current_value - purchase_value
-            if purchase_price > 0 and ltp > 0:
-                profit_percentage = (profit_amount / purchase_value) * 100
-            else:
-                profit_percentage = 0
-            weight_percentage = (purchase_value / total_portfolio_purchase_value) * 100
-            summary_list.append({
-                "Script": symbol, "Sector": sector, "quantity": quantity,
-                "purchase price": purchase_price, "LTP": ltp,
-                "Current Value": round(current_value, 2),
-                "52 week high/low": week_high_low,
-                "Profit amount": round(profit_amount, 2),
-                "profit percentage": f"{round(profit_percentage, 2)}%",
-                "Purchase value": round(purchase_value, 2),
-                "Weight%": f"{round(weight_percentage, 2)}%"
-            })
-        return jsonify(summary_list)
+        # Sheet read and price fetch are independent waits; run them side by side.
+        portfolio_holdings, price_table = run_concurrently(g.book.portfolio.get_all_records, share_price_cache.get)
+        schedule_daily_snapshot(price_table)
+
+        with span('compute'):
+            g.book.valuation.update(portfolio_holdings, price_table)
+            rows = g.book.valuation.rows()
+        return jsonify(rows)
 
     except Exception as e:
         logging.error(f"Error creating portfolio summary: {e}")
         return jsonify({"error": f"An unexpected error occurred while generating summary: {e}"}), 500
 
+@portfolio_bp.route('/summary/delta', methods=['GET'])
+def get_portfolio_summary_delta():
+    """
+    Only the /summary rows that changed since the version token in ?since=, plus the
+    new token and running totals. An unknown or expired token gets every row ("full": true).
+    """
+    try:
+        if g.book.worksheet("Portfolio") is None:
+             return jsonify({"error": "Google Sheets 'Portfolio' not connected."}), 500
+
+        portfolio_holdings, price_table = run_concurrently(g.book.portfolio.get_all_records, share_price_cache.get)
+        with span('compute'):
+            g.book.valuation.update(portfolio_holdings, price_table)
+            version, full, rows = g.book.valuation.delta(request.args.get('since', ''))
+            totals = g.book.valuation.totals()
+        return jsonify({
+            "version": version,
+            "full": full,
+            "rows": rows,
+            "totals": totals,
+        })
+
+    except Exception as e:
+        logging.error(f"Error creating portfolio summary delta: {e}")
+        return jsonify({"error": f"An unexpected error occurred while generating summary: {e}"}), 500
+
+@portfolio_bp.route('/summary/aggregate', methods=['GET'])
+def get_portfolio_summary_aggregate():
+    """Portfolio valued per scrip (lots merged) and per sector, plus portfolio totals."""
+    try:
+        if g.book.worksheet("Portfolio") is None:
+             return jsonify({"error": "Google Sheets 'Portfolio' not connected."}), 500
+
+        portfolio_holdings, price_table = run_concurrently(g.book.portfolio.get_all_records, share_price_cache.get)
+
+        with span('compute'):
+            valuation = PortfolioValuation(Holdings(portfolio_holdings), price_table)
+            aggregate = {
+                "by_scrip": valuation.by_scrip(),
+                "by_sector": valuation.by_sector(),
+                "totals": valuation.totals(),
+            }
+        return jsonify(aggregate)
+
+    except Exception as e:
+        logging.error(f"Error creating aggregated portfolio summary: {e}")
+        return jsonify({"error": f"An unexpected error occurred while generating summary: {e}"}), 500
+
 # 
 
+def _realized_gain_row(data):
+    """Realized Gains sheet row for one sale (scrip, quantity, purchase_price, sell_price, sell_date)."""
+    quantity = float(data['quantity'])
+    purchase_price = float(data['purchase_price'])
+    sell_price = float(data['sell_price'])
+
+    purchase_value = purchase_price * quantity
+    sell_value = sell_price * quantity
+    gain_amount = sell_value - purchase_value
+    gain_percent = (gain_amount / purchase_value * 100) if purchase_value else 0
+
+    return [
+        data['sell_date'],        # Date
+        data['scrip'],            # Scrip
+        quantity,                 # Quantity Sold
+        purchase_price,           # Purchase Price
+        sell_price,               # Sell Price
+        round(purchase_value, 2), # Purchase Value
+        round(sell_value, 2),     # Sell Value
+        round(gain_amount, 2),    # Gain Amount
+        f"{round(gain_percent, 2)}%" # Gain %
+    ]
+
 @portfolio_bp.route('/realized-gain', methods=['PATCH'])
 def add_realized_gain():
     """
@@ -373,7 +634,7 @@ def add_realized_gain():
     Expects: scrip, quantity, purchase_price, sell_price, sell_date
     """
     try:
-        if realized_gains_sheet is None:
+        if g.book.worksheet("Realized Gains") is None:
             return jsonify({"error": "Google Sheets 'Realized Gains' not connected."}), 500
 
         data = request.get_json()
@@ -382,37 +643,17 @@ def add_realized_gain():
             return jsonify({"error": f"Missing required fields: {required_fields}"}), 400
 
         scrip = data['scrip']
-        quantity = float(data['quantity'])
-        purchase_price = float(data['purchase_price'])
-        sell_price = float(data['sell_price'])
-        sell_date = data['sell_date']
-
-        purchase_value = purchase_price * quantity
-        sell_value = sell_price * quantity
-        gain_amount = sell_value - purchase_value
-        gain_percent = (gain_amount / purchase_value * 100) if purchase_value else 0
-
-        new_row = [
-            sell_date,                # Date
-            scrip,                    # Scrip
-            quantity,                 # Quantity Sold
-            purchase_price,           # Purchase Price
-            sell_price,               # Sell Price
-            round(purchase_value, 2), # Purchase Value
-            round(sell_value, 2),     # Sell Value
-            round(gain_amount, 2),    # Gain Amount
-            f"{round(gain_percent, 2)}%" # Gain %
-        ]
+        new_row = _realized_gain_row(data)
 
         # Try to find the row with the matching scrip (assume Scrip is in column 2)
-        cell = realized_gains_sheet.find(scrip, in_column=2)
+        cell = g.book.realized_gains.find(scrip, in_column=2)
         if cell:
             # Update the entire row with new data
-            realized_gains_sheet.update(f"A{cell.row}:I{cell.row}", [new_row])
+            g.book.realized_gains.update_row(cell.row, new_row)
             return jsonify({"message": f"Realized gain for '{scrip}' updated successfully."}), 200
         else:
             # Append as new row if not found
-            realized_gains_sheet.append_row(new_row, value_input_option='USER_ENTERED')
+            g.book.realized_gains.append_row(new_row, value_input_option='USER_ENTERED')
             return jsonify({"message": "Realized gain recorded successfully."}), 201
 
     except Exception as e:
@@ -425,12 +666,227 @@ def get_realized_gains():
     Fetches all realized gain records from the Realized Gains sheet.
     """
     try:
-        if realized_gains_sheet is None:
+        if g.book.worksheet("Realized Gains") is None:
             return jsonify({"error": "Google Sheets 'Realized Gains' not connected."}), 500
 
-        records = realized_gains_sheet.get_all_records()
-        return jsonify(records), 200
+        records = g.book.realized_gains.get_all_records()
+        return response_cache.respond(f'{g.book.key}:realized-gain', records, lambda: records)
 
     except Exception as e:
         logging.error(f"Error fetching realized gains: {e}")
-        return jsonify({"error": f"An unexpected error occurred while fetching realized gains: {e}"}), 500
\ No newline at end of file
+        return jsonify({"error": f"An unexpected error occurred while fetching realized gains: {e}"}), 500
+
+
+# --- Batch endpoints ---
+# Array versions of /add, /wishlist/add, /wishlist/remove and /realized-gain. The
+# body is a JSON array of the single-item bodies (or {"items": [...]}). Items are
+# validated in one pass, checked against the mirror and earlier items of the same
+# batch, and everything accepted goes to the sheet in one API call. Each item gets
+# its own entry in "results" with the status the single-item route would return.
+# Accepted items get their status only once the write went through; if it failed,
+# they get a 500 entry each and the response is a 500 too, with every result.
+
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", 1000))
+
+def _batch_items():
+    """The request's items, or (None, error response) when the body is not a usable array."""
+    data = request.get_json(silent=True)
+    items = data.get('items') if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        return None, (jsonify({"error": "Expected a non-empty JSON array of items (or {\"items\": [...]})."}), 400)
+    if len(items) > BATCH_MAX_ITEMS:
+        return None, (jsonify({"error": f"At most {BATCH_MAX_ITEMS} items per batch."}), 400)
+    return items, None
+
+def _batch_result(index, status, message, item=None):
+    result = {"index": index, "status": status, "message": message}
+    if isinstance(item, dict) and 'scrip' in item:
+        result["scrip"] = item['scrip']
+    return result
+
+def _batch_write(results, write, accepted):
+    """
+    Runs `write()`, the sheet call for the `accepted` results, then adds those to
+    `results`: as they are when it succeeded, as 500s when it failed. Returns whether it succeeded.
+    """
+    if not accepted:
+        return True
+    try:
+        write()
+    except Exception as e:
+        logging.error(f"Batch write of {len(accepted)} items failed: {e}")
+        results.extend({**result, "status": 500, "message": f"Not saved: {e}"} for result in accepted)
+        return False
+    results.extend(accepted)
+    return True
+
+def _batch_response(results, saved=True):
+    results.sort(key=lambda result: result["index"])
+    counts = {}
+    for result in results:
+        counts[str(result["status"])] = counts.get(str(result["status"]), 0) + 1
+    return jsonify({"results": results, "counts": counts}), 200 if saved else 500
+
+def _missing_fields(item, required_fields):
+    if not isinstance(item, dict):
+        return required_fields
+    return [field for field in required_fields if field not in item]
+
+def _check_numbers(item, fields):
+    """Raises ValueError unless every field of `item` in `fields` is a finite number (or a numeric string)."""
+    for field in fields:
+        value = item[field]
+        if isinstance(value, bool) or not math.isfinite(float(value)):
+            raise ValueError(f"'{field}' must be a number, got {value!r}")
+
+@portfolio_bp.route('/add/batch', methods=['POST'])
+def add_stock_batch():
+    """Adds many lots to the Portfolio sheet with one append_rows call."""
+    try:
+        if g.book.worksheet("Portfolio") is None:
+            return jsonify({"error": "Google Sheets 'Portfolio' not connected."}), 500
+
+        items, error = _batch_items()
+        if error:
+            return error
+
+        required_fields = ['scrip', 'quantity', 'purchasePrice', 'sector']
+        results, accepted, new_rows = [], [], []
+        for i, item in enumerate(items):
+            missing = _missing_fields(item, required_fields)
+            if missing:
+                results.append(_batch_result(i, 400, f"Missing required fields: {missing}", item))
+                continue
+            try:
+                _check_numbers(item, ['quantity', 'purchasePrice'])
+            except (TypeError, ValueError) as e:
+                results.append(_batch_result(i, 400, f"Invalid number: {e}", item))
+                continue
+            new_rows.append([item['scrip'], item['sector'], item['quantity'], item['purchasePrice']])
+            accepted.append(_batch_result(i, 201, "Stock added successfully.", item))
+
+        saved = _batch_write(results, lambda: g.book.portfolio.append_rows(new_rows, value_input_option='USER_ENTERED'),
+                             accepted)
+        return _batch_response(results, saved)
+
+    except Exception as e:
+        logging.error(f"Error adding stocks in batch: {e}")
+        return jsonify({"error": f"An error occurred: {e}"}), 500
+
+@portfolio_bp.route('/wishlist/add/batch', methods=['PUT'])
+def add_to_wishlist_batch():
+    """Adds many scrips to the wishlist with one append_rows call; existing scrips get 409."""
+    try:
+        if g.book.worksheet("Watchlist") is None:
+            return jsonify({"error": "Google Sheets 'Watchlist' not connected."}), 500
+
+        items, error = _batch_items()
+        if error:
+            return error
+
+        results, accepted, new_rows, seen = [], [], [], set()
+        with g.book.watchlist.transaction():
+            for i, item in enumerate(items):
+                if _missing_fields(item, ['scrip']):
+                    results.append(_batch_result(i, 400, "Missing required field: 'scrip'", item))
+                    continue
+                scrip = item['scrip']
+                if str(scrip) in seen or g.book.watchlist.find(scrip, in_column=1):
+                    results.append(_batch_result(i, 409, f"Scrip '{scrip}' already exists in wishlist.", item))
+                    continue
+                seen.add(str(scrip))
+                new_rows.append([scrip])
+                accepted.append(_batch_result(i, 201, "Scrip added to wishlist successfully.", item))
+
+            saved = _batch_write(results, lambda: g.book.watchlist.append_rows(new_rows, value_input_option='USER_ENTERED'),
+                                 accepted)
+        return _batch_response(results, saved)
+
+    except Exception as e:
+        logging.error(f"Error adding to wishlist in batch: {e}")
+        return jsonify({"error": f"An unexpected error occurred: {e}"}), 500
+
+@portfolio_bp.route('/wishlist/remove/batch', methods=['DELETE'])
+def remove_from_wishlist_batch():
+    """Removes many scrips from the wishlist with one batched row deletion; unknown scrips get 404."""
+    try:
+        if g.book.worksheet("Watchlist") is None:
+            return jsonify({"error": "Google Sheets 'Watchlist' not connected."}), 500
+
+        items, error = _batch_items()
+        if error:
+            return error
+
+        results, accepted, rows_to_delete, seen = [], [], [], set()
+        with g.book.watchlist.transaction():
+            for i, item in enumerate(items):
+                if _missing_fields(item, ['scrip']):
+                    results.append(_batch_result(i, 400, "Missing required field: 'scrip'", item))
+                    continue
+                scrip = item['scrip']
+                cell = g.book.watchlist.find(scrip, in_column=1) if str(scrip) not in seen else None
+                if cell is None:
+                    results.append(_batch_result(i, 404, f"Scrip '{scrip}' not found in wishlist.", item))
+                    continue
+                seen.add(str(scrip))
+                rows_to_delete.append(cell.row)
+                accepted.append(_batch_result(i, 200, f"Scrip '{scrip}' removed from wishlist.", item))
+
+            saved = _batch_write(results, lambda: g.book.watchlist.delete_row_numbers(rows_to_delete), accepted)
+        return _batch_response(results, saved)
+
+    except Exception as e:
+        logging.error(f"Error removing from wishlist in batch: {e}")
+        return jsonify({"error": f"An unexpected error occurred: {e}"}), 500
+
+@portfolio_bp.route('/realized-gain/batch', methods=['PATCH'])
+def add_realized_gain_batch():
+    """
+    Records many sales: scrips already in the Realized Gains sheet are updated with
+    one batch_update, new ones appended with one append_rows. A scrip repeated
+    within the batch gets 409, since the sheet keeps one row per scrip.
+    """
+    try:
+        if g.book.worksheet("Realized Gains") is None:
+            return jsonify({"error": "Google Sheets 'Realized Gains' not connected."}), 500
+
+        items, error = _batch_items()
+        if error:
+            return error
+
+        required_fields = ['scrip', 'quantity', 'purchase_price', 'sell_price', 'sell_date']
+        results, updated, added, updates, new_rows, seen = [], [], [], [], [], set()
+        with g.book.realized_gains.transaction():
+            for i, item in enumerate(items):
+                missing = _missing_fields(item, required_fields)
+                if missing:
+                    results.append(_batch_result(i, 400, f"Missing required fields: {missing}", item))
+                    continue
+                scrip = item['scrip']
+                if str(scrip) in seen:
+                    results.append(_batch_result(i, 409, f"Scrip '{scrip}' appears more than once in the batch.", item))
+                    continue
+                try:
+                    _check_numbers(item, ['quantity', 'purchase_price', 'sell_price'])
+                    row = _realized_gain_row(item)
+                except (TypeError, ValueError) as e:
+                    results.append(_batch_result(i, 400, f"Invalid number: {e}", item))
+                    continue
+                seen.add(str(scrip))
+                cell = g.book.realized_gains.find(scrip, in_column=2)
+                if cell:
+                    updates.append((cell.row, row))
+                    updated.append(_batch_result(i, 200, f"Realized gain for '{scrip}' updated successfully.", item))
+                else:
+                    new_rows.append(row)
+                    added.append(_batch_result(i, 201, "Realized gain recorded successfully.", item))
+
+            # Two independent writes: each item's result says whether its own write went through.
+            saved = _batch_write(results, lambda: g.book.realized_gains.update_rows(updates), updated)
+            saved = _batch_write(results, lambda: g.book.realized_gains.append_rows(
+                new_rows, value_input_option='USER_ENTERED'), added) and saved
+        return _batch_response(results, saved)
+
+    except Exception as e:
+        logging.error(f"Error recording realized gains in batch: {e}")
+        return jsonify({"error": f"An unexpected error occurred: {e}"}), 500
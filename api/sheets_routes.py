@@ -0,0 +1,37 @@
+# api/sheets_routes.py
+
+from flask import Blueprint, request, jsonify
+import logging
+
+from api.portfolio_routes import write_queue
+
+# Create a Blueprint
+sheets_bp = Blueprint('sheets_bp', __name__)
+
+@sheets_bp.route('/queue', methods=['GET'])
+def get_write_queue_status():
+    """Reports pending, applied and failed write-behind mutations per worksheet."""
+    if write_queue is None:
+        return jsonify({"enabled": False}), 200
+    return jsonify(write_queue.status()), 200
+
+@sheets_bp.route('/queue/flush', methods=['POST'])
+def flush_write_queue():
+    """
+    Applies all queued sheet mutations now.
+    Waits up to ?timeout= seconds (default 30) for the queue to drain.
+    """
+    if write_queue is None:
+        return jsonify({"enabled": False, "message": "Write-behind is disabled; writes are already synchronous."}), 200
+    try:
+        timeout = float(request.args.get('timeout', 30))
+        drained = write_queue.flush(timeout=timeout)
+        status = write_queue.status()
+        if not drained:
+            return jsonify({"error": "Timed out before all queued writes were applied.", **status}), 504
+        return jsonify({"message": "All queued writes applied.", **status}), 200
+    except ValueError:
+        return jsonify({"error": "'timeout' must be a number."}), 400
+    except Exception as e:
+        logging.error(f"Error flushing sheet write queue: {e}")
+        return jsonify({"error": f"An unexpected error occurred: {e}"}), 500
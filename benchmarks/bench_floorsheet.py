@@ -0,0 +1,124 @@
+# benchmarks/bench_floorsheet.py
+#
+# Ingests the recorded floorsheet pages in benchmarks/fixtures into a temporary
+# FloorsheetStore, checks the stored aggregates against a plain per-trade loop,
+# then times page parsing and aggregation on a synthetic full trading day.
+# Usage: python benchmarks/bench_floorsheet.py [--trades 60000] [--repeat N]
+
+import argparse
+import glob
+import os
+import random
+import sys
+import tempfile
+import timeit
+from collections import defaultdict
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from floorsheet import TRADE_DTYPE, FloorsheetIngester, FloorsheetStore, aggregate, parse_floorsheet
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def load_pages():
+    pages = {}
+    for path in glob.glob(os.path.join(FIXTURES, 'floorsheet_page_*.html')):
+        number = int(os.path.basename(path)[len('floorsheet_page_'):-len('.html')])
+        with open(path, encoding='utf-8') as f:
+            pages[number] = f.read()
+    return pages
+
+
+def naive_aggregates(pages):
+    """Per-symbol and per-broker totals with one Python loop over the raw rows."""
+    seen = set()
+    symbols = defaultdict(lambda: {"Trades": 0, "Quantity": 0, "Amount": 0.0, "High": 0.0, "Low": float('inf')})
+    brokers = defaultdict(lambda: {"Buy quantity": 0, "Sell quantity": 0, "Buy amount": 0.0, "Sell amount": 0.0})
+    for html in pages.values():
+        chunk, _ = parse_floorsheet(html)
+        for contract, symbol, buyer, seller, quantity, rate in zip(
+                chunk.contract.tolist(), chunk.symbols, chunk.buyer.tolist(), chunk.seller.tolist(),
+                chunk.quantity.tolist(), chunk.rate.tolist()):
+            if contract in seen:
+                continue
+            seen.add(contract)
+            s = symbols[symbol]
+            s["Trades"] += 1
+            s["Quantity"] += quantity
+            s["Amount"] += quantity * rate
+            s["High"] = max(s["High"], rate)
+            s["Low"] = min(s["Low"], rate)
+            brokers[buyer]["Buy quantity"] += quantity
+            brokers[buyer]["Buy amount"] += quantity * rate
+            brokers[seller]["Sell quantity"] += quantity
+            brokers[seller]["Sell amount"] += quantity * rate
+    return symbols, brokers, len(seen)
+
+
+def check_fixture_ingest(pages):
+    with tempfile.TemporaryDirectory() as root:
+        store = FloorsheetStore(root)
+        ingester = FloorsheetIngester(lambda page: parse_floorsheet(pages[page]), store, workers=2)
+        run = ingester.ingest('2026-10-15')
+        day = store.day('latest')
+        symbols, brokers, trades = naive_aggregates(pages)
+        assert run["pages"] == len(pages), run
+        assert day.aggregates["totals"]["Trades"] == trades == len(day.trades), (run, trades)
+        for name, expected in symbols.items():
+            row = day.by_symbol[name]
+            for key in ("Trades", "Quantity", "High", "Low"):
+                assert row[key] == expected[key], (name, key, row[key], expected[key])
+            assert abs(row["Amount"] - expected["Amount"]) < 0.01, (name, row["Amount"], expected["Amount"])
+        for broker, expected in brokers.items():
+            row = day.by_broker[broker]
+            for key in ("Buy quantity", "Sell quantity"):
+                assert row[key] == expected[key], (broker, key)
+            assert abs(row["Net amount"] - (expected["Buy amount"] - expected["Sell amount"])) < 0.01, broker
+        print(f"Fixture ingest OK: {run['pages']} pages, {run['rows']} rows, {run['skipped_rows']} skipped, "
+              f"{trades} unique trades, {len(symbols)} symbols, {len(brokers)} brokers.")
+
+
+def synthetic_trades(n, symbols=300, brokers=90, seed=42):
+    rng = random.Random(seed)
+    trades = np.empty(n, dtype=TRADE_DTYPE)
+    trades['contract'] = range(2026101503000001, 2026101503000001 + n)
+    trades['symbol'] = [rng.randrange(symbols) for _ in range(n)]
+    trades['buyer'] = [rng.randint(1, brokers) for _ in range(n)]
+    trades['seller'] = [rng.randint(1, brokers) for _ in range(n)]
+    trades['quantity'] = [rng.randint(1, 3000) for _ in range(n)]
+    trades['rate'] = [round(rng.uniform(100, 3000), 1) for _ in range(n)]
+    return trades, [f"SYM{i}" for i in range(symbols)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--trades', type=int, default=60000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    pages = load_pages()
+    check_fixture_ingest(pages)
+
+    html = pages[1]
+    parse = min(timeit.repeat(lambda: parse_floorsheet(html), number=1, repeat=args.repeat)) * 1000
+    print(f"Parse one page (300 rows): {parse:.2f} ms")
+
+    trades, symbols = synthetic_trades(args.trades)
+    agg = min(timeit.repeat(lambda: aggregate(trades, symbols), number=1, repeat=args.repeat)) * 1000
+    print(f"Aggregate {args.trades} trades / {len(symbols)} symbols: {agg:.2f} ms")
+
+    with tempfile.TemporaryDirectory() as root:
+        store = FloorsheetStore(root)
+        store.save('2026-10-15', trades, symbols)
+        lookup = min(timeit.repeat(lambda: (store.day('2026-10-15').by_symbol['SYM7']),
+                                   number=1000, repeat=args.repeat)) * 1000
+        size = os.path.getsize(os.path.join(root, '2026-10-15', 'trades.npy'))
+        print(f"Stored trades: {size / 1024:.0f} KiB ({size / len(trades):.0f} bytes/trade); "
+              f"cached symbol lookup {lookup:.3f} us")
+
+
+if __name__ == '__main__':
+    main()
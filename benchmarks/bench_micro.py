@@ -0,0 +1,144 @@
+# benchmarks/bench_micro.py
+#
+# pytest-benchmark micro-benchmarks for the hot paths: HTML parsing, building the
+# PriceTable, JSON serialization, portfolio valuation, sheet mirror lookups and
+# floorsheet aggregation.
+# Not collected by a plain `pytest` run; pass the file explicitly:
+#
+#   python -m pytest benchmarks/bench_micro.py
+#   python -m pytest benchmarks/bench_micro.py --benchmark-compare   # against a saved run
+#
+# Requires pytest-benchmark (see benchmarks/requirements.txt).
+
+import copy
+import os
+import random
+import sys
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fakes
+from bench_floorsheet import synthetic_trades
+from bench_summary import synthetic_portfolio
+from floorsheet import aggregate, parse_floorsheet
+from html_parsers import BACKENDS, parse_market_summary, parse_share_price_table
+from portfolio_summary import Holdings, IncrementalValuation, PortfolioValuation
+from price_table import PriceTable
+from response_cache import dumps
+from sheet_mirror import SheetMirror
+
+
+@pytest.fixture(scope='module')
+def share_html():
+    return fakes.scaled_share_price_page()
+
+
+@pytest.fixture(scope='module')
+def summary_html():
+    return fakes._read('market_summary.html')
+
+
+@pytest.fixture(scope='module')
+def share_rows(share_html):
+    return parse_share_price_table(share_html, backend='stream')
+
+
+@pytest.fixture(scope='module')
+def price_table(share_rows):
+    return PriceTable.from_rows(share_rows)
+
+
+@pytest.fixture(scope='module', params=[1000, 10000])
+def holdings(request, share_rows):
+    return synthetic_portfolio([row['Symbol'] for row in share_rows], request.param)
+
+
+# --- Parsing ---
+
+@pytest.mark.parametrize('backend', sorted(BACKENDS))
+def test_parse_share_prices(benchmark, share_html, backend):
+    rows = benchmark(parse_share_price_table, share_html, backend=backend)
+    assert len(rows) == 310
+
+
+@pytest.mark.parametrize('backend', sorted(BACKENDS))
+def test_parse_market_summary(benchmark, summary_html, backend):
+    assert "Date" in benchmark(parse_market_summary, summary_html, backend=backend)
+
+
+def test_parse_floorsheet_page(benchmark):
+    chunk, last_page = benchmark(parse_floorsheet, fakes._read('floorsheet_page_1.html'))
+    assert len(chunk) and last_page >= 1
+
+
+def test_price_table_from_rows(benchmark, share_rows):
+    assert len(benchmark(PriceTable.from_rows, share_rows)) == len(share_rows)
+
+
+@pytest.mark.parametrize('shape', ['records', 'columnar'])
+def test_serialize_prices(benchmark, share_html, shape):
+    table = PriceTable.from_rows(parse_share_price_table(share_html, backend='stream'))
+    payload = table.to_records() if shape == 'records' else table.to_columnar()
+    assert benchmark(dumps, payload, sort_keys=True)
+
+
+# --- Portfolio summary ---
+
+def test_summary_lot_rows(benchmark, holdings, price_table):
+    benchmark(lambda: PortfolioValuation(Holdings(holdings), price_table).lot_rows())
+
+
+def test_summary_aggregates(benchmark, holdings, price_table):
+    def run():
+        valuation = PortfolioValuation(Holdings(holdings), price_table)
+        return valuation.by_scrip(), valuation.by_sector(), valuation.totals()
+    benchmark(run)
+
+
+def test_incremental_reprice(benchmark, holdings, share_rows):
+    """One price tick moving 5% of the symbols, applied to a warm IncrementalValuation."""
+    rng = random.Random(7)
+    tables = []
+    rows = share_rows
+    for _ in range(2):
+        rows = copy.deepcopy(rows)
+        for row in rng.sample(rows, len(rows) // 20):
+            row['LTP'] = f"{rng.uniform(100, 3000):,.2f}"
+        tables.append(PriceTable.from_rows(rows))
+    engine = IncrementalValuation()
+    engine.update(holdings, tables[0])
+    state = {'i': 0}
+
+    def tick():
+        state['i'] ^= 1
+        return engine.update(holdings, tables[state['i']])
+    benchmark(tick)
+
+
+# --- Sheets ---
+
+def test_mirror_find(benchmark, share_rows):
+    symbols = [row['Symbol'] for row in share_rows]
+    sheets = fakes.fake_sheets(symbols, lots=5000)
+    mirror = SheetMirror(sheets['portfolio_sheet'], name='Portfolio', ttl=3600)
+    mirror.find(symbols[0], in_column=1)
+    benchmark(lambda: mirror.find(random.choice(symbols), in_column=1))
+
+
+def test_mirror_get_all_records(benchmark, share_rows):
+    sheets = fakes.fake_sheets([row['Symbol'] for row in share_rows], lots=5000)
+    mirror = SheetMirror(sheets['portfolio_sheet'], name='Portfolio', ttl=3600)
+    assert len(benchmark(mirror.get_all_records)) == 5000
+
+
+# --- Floorsheet ---
+
+def test_floorsheet_aggregate(benchmark):
+    trades, symbols = synthetic_trades(60000)
+    result = benchmark(aggregate, trades, symbols)
+    assert result["totals"]["Trades"] == 60000
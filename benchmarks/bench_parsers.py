@@ -0,0 +1,59 @@
+# benchmarks/bench_parsers.py
+#
+# Compares the HTML parser backends on the recorded pages in benchmarks/fixtures.
+# Usage: python benchmarks/bench_parsers.py [--repeat N]
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from html_parsers import BACKENDS, parse_market_summary, parse_share_price_table
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES, name), encoding='utf-8') as f:
+        return f.read()
+
+
+def bench(label, fn, html, repeat):
+    timings = timeit.repeat(lambda: fn(html), number=1, repeat=repeat)
+    best = min(timings) * 1000
+    median = sorted(timings)[len(timings) // 2] * 1000
+    print(f"  {label:<8} best {best:8.2f} ms   median {median:8.2f} ms")
+    return median
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    share_html = load_fixture('today_share_price.html')
+    summary_html = load_fixture('market_summary.html')
+
+    # Every backend must agree with the original BeautifulSoup output before we time anything.
+    reference_rows = parse_share_price_table(share_html, 'bs4')
+    reference_summary = parse_market_summary(summary_html, 'bs4')
+    for name in BACKENDS:
+        assert parse_share_price_table(share_html, name) == reference_rows, f"{name}: share table mismatch"
+        assert parse_market_summary(summary_html, name) == reference_summary, f"{name}: summary mismatch"
+
+    print(f"today_share_price.html ({len(share_html) // 1024} KiB, {len(reference_rows)} rows)")
+    results = {name: bench(name, lambda h, n=name: parse_share_price_table(h, n), share_html, args.repeat)
+               for name in BACKENDS}
+    for name, median in results.items():
+        if name != 'bs4':
+            print(f"  {name} is {results['bs4'] / median:.1f}x faster than bs4")
+
+    print(f"market_summary.html ({len(summary_html)} bytes)")
+    for name in BACKENDS:
+        bench(name, lambda h, n=name: parse_market_summary(h, n), summary_html, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+# benchmarks/bench_pipeline.py
+#
+# Models the /summary request path with stubbed upstreams that just sleep, and
+# compares the old sequential flow with run_concurrently + run_in_background.
+# Usage: python benchmarks/bench_pipeline.py [--sheet-ms 300] [--fetch-ms 400] [--save-ms 500] [--requests 10]
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pipeline import background_pool, run_concurrently, run_in_background
+
+
+def stub(delay_ms, result=None):
+    def call(*args):
+        time.sleep(delay_ms / 1000)
+        return result
+    return call
+
+
+def sequential(read_sheet, fetch_prices, save_snapshot):
+    holdings = read_sheet()
+    prices = fetch_prices()
+    save_snapshot(prices)
+    return holdings, prices
+
+
+def pipelined(read_sheet, fetch_prices, save_snapshot):
+    holdings, prices = run_concurrently(read_sheet, fetch_prices)
+    run_in_background(save_snapshot, prices)
+    return holdings, prices
+
+
+def measure(flow, stubs, requests):
+    timings = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        flow(*stubs)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sheet-ms', type=float, default=300, help="Sheets get_all_records latency")
+    parser.add_argument('--fetch-ms', type=float, default=400, help="upstream fetch + parse latency")
+    parser.add_argument('--save-ms', type=float, default=500, help="snapshot save (index check + append_rows)")
+    parser.add_argument('--requests', type=int, default=10)
+    args = parser.parse_args()
+
+    stubs = (stub(args.sheet_ms, []), stub(args.fetch_ms, []), stub(args.save_ms))
+    print(f"stubbed latencies: sheet {args.sheet_ms:.0f} ms, fetch {args.fetch_ms:.0f} ms, save {args.save_ms:.0f} ms")
+    for name, flow in (('sequential', sequential), ('pipelined', pipelined)):
+        timings = measure(flow, stubs, args.requests)
+        print(f"  {name:<10} median {statistics.median(timings):7.1f} ms   max {max(timings):7.1f} ms")
+    print(f"  slowest single call: {max(args.sheet_ms, args.fetch_ms):.0f} ms")
+    background_pool.shutdown(wait=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+# benchmarks/bench_summary.py
+#
+# Compares the original per-holding /summary loop with the array-based
+# PortfolioValuation on synthetic portfolios.
+# Usage: python benchmarks/bench_summary.py [--lots 10000 50000 100000] [--repeat N]
+
+import argparse
+import json
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from html_parsers import parse_share_price_table
+from portfolio_summary import Holdings, PortfolioValuation
+from price_table import PriceTable
+from reference import legacy_summary
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+SECTORS = ['Commercial Banks', 'Development Banks', 'Hydro Power', 'Life Insurance',
+           'Microfinance', 'Manufacturing', 'Hotels', 'Investment', 'Others']
+
+
+def synthetic_portfolio(symbols, lots, seed=42):
+    rng = random.Random(seed)
+    sector_of = {s: rng.choice(SECTORS) for s in symbols}
+    holdings = []
+    for _ in range(lots):
+        symbol = rng.choice(symbols) if rng.random() > 0.02 else 'DELISTED'
+        holdings.append({
+            'scrip': symbol, 'sector': sector_of.get(symbol, 'Others'),
+            'quantity': rng.randint(10, 5000), 'purchasePrice': round(rng.uniform(100, 3000), 2),
+        })
+    return holdings
+
+
+def timed(fn, repeat):
+    return sorted(timeit.repeat(fn, number=1, repeat=repeat))[repeat // 2] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--lots', type=int, nargs='+', default=[1000, 10000, 50000, 100000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with open(os.path.join(FIXTURES, 'today_share_price.html'), encoding='utf-8') as f:
+        rows = parse_share_price_table(f.read())
+    table = PriceTable.from_rows(rows)
+
+    print(f"{'lots':>8} {'legacy loop':>14} {'engine rows':>14} {'engine aggregates':>18}")
+    for lots in args.lots:
+        holdings = synthetic_portfolio(table.symbols, lots)
+        # Both paths must produce the same lot rows, down to the JSON text.
+        assert json.dumps(legacy_summary(holdings[:200], rows)) == \
+            json.dumps(PortfolioValuation(Holdings(holdings[:200]), table).lot_rows())
+
+        legacy = timed(lambda: legacy_summary(holdings, rows), args.repeat)
+        engine_rows = timed(lambda: PortfolioValuation(Holdings(holdings), table).lot_rows(), args.repeat)
+
+        def aggregates():
+            valuation = PortfolioValuation(Holdings(holdings), table)
+            return valuation.by_scrip(), valuation.by_sector(), valuation.totals()
+        engine_aggregates = timed(aggregates, args.repeat)
+        print(f"{lots:>8} {legacy:>11.1f} ms {engine_rows:>11.1f} ms {engine_aggregates:>15.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,357 @@
+# benchmarks/fakes.py
+#
+# Stand-ins for the two external systems every route depends on, so routes can be
+# benchmarked and load-tested offline:
+#   - FakeScrapeServer: serves the recorded pages in benchmarks/fixtures over HTTP
+#     with a configurable delay and table size (the SCRAPE_API upstream).
+#   - FakeWorksheet: in-memory gspread Worksheet with simulated per-call latency
+#     and a per-minute request quota (the Google Sheets backend).
+#
+# install_fake_sheets() points gspread_client's lazy connection at the fakes; call
+# it before the app starts serving requests.
+
+import hashlib
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from gspread.cell import Cell
+from gspread.exceptions import WorksheetNotFound
+from gspread.utils import a1_to_rowcol, numericise_all
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+_ROW = re.compile(r'<tr>.*?</tr>', re.S)
+_SYMBOL = re.compile(r'(title="[^"]*">\s*)(\S+)(\s*</a>)')
+
+
+def _read(name):
+    with open(os.path.join(FIXTURES, name), encoding='utf-8') as f:
+        return f.read()
+
+
+def scaled_share_price_page(scale=1):
+    """The recorded share price page with its table repeated `scale` times (symbols suffixed 2, 3, ...)."""
+    html = _read('today_share_price.html')
+    if scale <= 1:
+        return html
+    start, end = html.index('<tbody>') + len('<tbody>'), html.index('</tbody>')
+    rows = _ROW.findall(html[start:end])
+    copies = [html[start:end]]
+    for k in range(2, scale + 1):
+        copies.append('\n'.join(_SYMBOL.sub(lambda m: f"{m.group(1)}{m.group(2)}{k}{m.group(3)}", row)
+                                for row in rows))
+    return html[:start] + '\n'.join(copies) + html[end:]
+
+
+# --- Fake upstream ---
+
+class FakeScrapeServer:
+    """
+    Local HTTP server for /today-share-price, /market-summary and /floorsheet?page=N.
+
+    delay_ms (+ up to jitter_ms) is slept before every response. With etag=True,
+    responses carry an ETag and a matching If-None-Match gets a 304, like a CDN would.
+    """
+
+    def __init__(self, delay_ms=0, jitter_ms=0, scale=1, etag=False, host='127.0.0.1', port=0):
+        self.delay_ms = delay_ms
+        self.jitter_ms = jitter_ms
+        self.etag = etag
+        self.pages = {
+            '/today-share-price': scaled_share_price_page(scale).encode('utf-8'),
+            '/market-summary': _read('market_summary.html').encode('utf-8'),
+        }
+        for name in sorted(os.listdir(FIXTURES)):
+            match = re.fullmatch(r'floorsheet_page_(\d+)\.html', name)
+            if match:
+                self.pages[f'/floorsheet?page={match.group(1)}'] = _read(name).encode('utf-8')
+        self.requests = Counter()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                key = parsed.path
+                if parsed.path == '/floorsheet':
+                    key = f"/floorsheet?page={parse_qs(parsed.query).get('page', ['1'])[0]}"
+                fake.requests[parsed.path] += 1
+                delay = fake.delay_ms + (random.uniform(0, fake.jitter_ms) if fake.jitter_ms else 0)
+                if delay:
+                    time.sleep(delay / 1000)
+                body = fake.pages.get(key)
+                if body is None:
+                    self.send_response(404)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                tag = f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+                if fake.etag and self.headers.get('If-None-Match') == tag:
+                    self.send_response(304)
+                    self.send_header('ETag', tag)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                if fake.etag:
+                    self.send_header('ETag', tag)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True, name="fake-scrape-api")
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+# --- Fake Google Sheets ---
+
+class QuotaExceeded(Exception):
+    """What the Sheets API answers with HTTP 429 once the per-minute quota is used up."""
+
+
+class FakeSpreadsheet:
+    def __init__(self):
+        self._updated = 0
+        self.worksheets = {}
+
+    def worksheet(self, title):
+        try:
+            return self.worksheets[title]
+        except KeyError:
+            raise WorksheetNotFound(title) from None
+
+    def batch_update(self, body):
+        """Supports the deleteDimension (ROWS) requests the app sends; one API call for the lot."""
+        by_id = {ws.id: ws for ws in self.worksheets.values()}
+        requests = body["requests"]
+        if requests:
+            by_id[requests[0]["deleteDimension"]["range"]["sheetId"]]._request('spreadsheet_batch_update')
+        for item in requests:
+            target = item["deleteDimension"]["range"]
+            worksheet = by_id[target["sheetId"]]
+            with worksheet._lock:
+                del worksheet._data[target["startIndex"]:target["endIndex"]]
+        self.touch()
+
+    def touch(self):
+        self._updated += 1
+
+    def get_lastUpdateTime(self):
+        return str(self._updated)
+
+
+class FakeWorksheet:
+    """
+    In-memory Worksheet covering the calls this app makes. Each call counts as one
+    API request: it sleeps `latency_ms` and, when `quota_per_minute` is set, raises
+    QuotaExceeded once more requests than that were made in the last 60 seconds.
+    Cells are stored as strings, as get_all_values() returns them.
+    """
+
+    def __init__(self, title, header, rows=(), latency_ms=0, quota_per_minute=None, spreadsheet=None):
+        self.title = title
+        self.latency_ms = latency_ms
+        self.quota_per_minute = quota_per_minute
+        self.spreadsheet = spreadsheet or FakeSpreadsheet()
+        self.id = len(self.spreadsheet.worksheets)
+        self.spreadsheet.worksheets[title] = self
+        self.calls = Counter()
+        self.rejected = 0
+        self._data = [list(header)] + [[_cell(v) for v in row] for row in rows]
+        self._lock = threading.Lock()
+        self._recent = deque()
+
+    def _request(self, method):
+        with self._lock:
+            now = time.monotonic()
+            while self._recent and now - self._recent[0] > 60:
+                self._recent.popleft()
+            if self.quota_per_minute is not None and len(self._recent) >= self.quota_per_minute:
+                self.rejected += 1
+                raise QuotaExceeded(f"APIError: [429]: Quota exceeded for '{self.title}' ({method}).")
+            self._recent.append(now)
+            self.calls[method] += 1
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+
+    # --- Reads ---
+
+    def get_all_values(self):
+        self._request('get_all_values')
+        with self._lock:
+            return [list(row) for row in self._data]
+
+    def get_all_records(self):
+        self._request('get_all_records')
+        with self._lock:
+            header, rows = self._data[0], self._data[1:]
+            return [dict(zip(header, numericise_all(row + [''] * (len(header) - len(row))))) for row in rows]
+
+    def row_values(self, row):
+        self._request('row_values')
+        with self._lock:
+            return list(self._data[row - 1]) if row <= len(self._data) else []
+
+    def col_values(self, col):
+        self._request('col_values')
+        with self._lock:
+            return [row[col - 1] for row in self._data if len(row) >= col]
+
+    def find(self, query, in_row=None, in_column=None, case_sensitive=True):
+        self._request('find')
+        query = str(query)
+        with self._lock:
+            for r, row in enumerate(self._data, 1):
+                if in_row is not None and r != in_row:
+                    continue
+                for c, value in enumerate(row, 1):
+                    if in_column is not None and c != in_column:
+                        continue
+                    if value == query or (not case_sensitive and value.lower() == query.lower()):
+                        return Cell(r, c, value)
+        return None
+
+    # --- Writes ---
+
+    def append_row(self, values, value_input_option='RAW', **kwargs):
+        self.append_rows([values], value_input_option=value_input_option)
+
+    def append_rows(self, values, value_input_option='RAW', **kwargs):
+        self._request('append_rows')
+        with self._lock:
+            self._data.extend([_cell(v) for v in row] for row in values)
+        self.spreadsheet.touch()
+
+    def update(self, values=None, range_name=None, **kwargs):
+        self._request('update')
+        self._write_range(range_name, values)
+        self.spreadsheet.touch()
+
+    def batch_update(self, data, **kwargs):
+        self._request('batch_update')
+        for item in data:
+            self._write_range(item['range'], item['values'])
+        self.spreadsheet.touch()
+
+    def delete_rows(self, start_index, end_index=None):
+        self._request('delete_rows')
+        with self._lock:
+            del self._data[start_index - 1:(end_index or start_index)]
+        self.spreadsheet.touch()
+
+    def _write_range(self, range_name, values):
+        row, col = a1_to_rowcol(range_name.split(':')[0])
+        with self._lock:
+            for r, new in enumerate(values, row):
+                while len(self._data) < r:
+                    self._data.append([])
+                current = self._data[r - 1]
+                current.extend([''] * (col - 1 + len(new) - len(current)))
+                current[col - 1:col - 1 + len(new)] = [_cell(v) for v in new]
+
+
+def _cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+PORTFOLIO_HEADER = ['scrip', 'sector', 'quantity', 'purchasePrice']
+TURNOVER_HEADER = ["Date", "Total Turnovers", "Total Traded Shares", "Total Transaction",
+                   "Total Scrips Traded", "Total Market Cap", "Floated Market Cap"]
+REALIZED_GAINS_HEADER = ['Date', 'Scrip', 'Quantity Sold', 'Purchase Price', 'Sell Price',
+                         'Purchase Value', 'Sell Value', 'Gain Amount', 'Gain %']
+SECTORS = ['Commercial Banks', 'Development Banks', 'Hydro Power', 'Life Insurance',
+           'Microfinance', 'Manufacturing', 'Hotels', 'Investment', 'Others']
+
+
+def fake_sheets(symbols, lots=200, watchlist=20, latency_ms=0, quota_per_minute=None, seed=42,
+                prefix='', spreadsheet=None):
+    """
+    The five worksheets the app uses, seeded with a synthetic portfolio over `symbols`.
+    `prefix` and `spreadsheet` build a user's worksheet shard inside an existing fake spreadsheet.
+    """
+    rng = random.Random(seed)
+    spreadsheet = spreadsheet or FakeSpreadsheet()
+
+    def sheet(title, header, rows=()):
+        return FakeWorksheet(prefix + title, header, rows, latency_ms=latency_ms,
+                             quota_per_minute=quota_per_minute, spreadsheet=spreadsheet)
+
+    sector_of = {s: rng.choice(SECTORS) for s in symbols}
+    portfolio = [[s, sector_of[s], rng.randint(10, 5000), round(rng.uniform(100, 3000), 2)]
+                 for s in (rng.choice(symbols) for _ in range(lots))]
+    return {
+        'portfolio_sheet': sheet('Portfolio', PORTFOLIO_HEADER, portfolio),
+        'turnover_sheet': sheet('Turnover', TURNOVER_HEADER),
+        'daily_data_sheet': sheet('Market', ['Date']),
+        'watchlist_sheet': sheet('Watchlist', ['scrip'], [[s] for s in rng.sample(symbols, min(watchlist, len(symbols)))]),
+        'realized_gains_sheet': sheet('Realized Gains', REALIZED_GAINS_HEADER),
+    }
+
+
+class FakeClient:
+    """Stands in for a gspread Client; opens fake spreadsheets by key."""
+
+    def __init__(self, spreadsheets, connect_delay_ms=0):
+        self.spreadsheets = spreadsheets
+        self.connect_delay_ms = connect_delay_ms
+
+    def open_by_key(self, key):
+        if self.connect_delay_ms:
+            time.sleep(self.connect_delay_ms / 1000)
+        return self.spreadsheets[key]
+
+
+def install_fake_sheets(sheets, connect_delay_ms=0, spreadsheets=None):
+    """
+    Makes gspread_client connect to the spreadsheet behind `sheets` (see fake_sheets)
+    instead of Google. connect_delay_ms simulates the authentication round trip.
+    `spreadsheets` ({spreadsheet_id: sheets}) are what user books open by key.
+    """
+    import gspread_client
+
+    by_key = {key: next(iter(user_sheets.values())).spreadsheet for key, user_sheets in (spreadsheets or {}).items()}
+    by_key[''] = next(iter(sheets.values())).spreadsheet
+    client = FakeClient(by_key, connect_delay_ms)
+
+    gspread_client.client_pool.create_client = lambda: client
+    gspread_client.connection.connect = lambda: client.open_by_key('')
+    gspread_client.connection.reconnect()
+    return gspread_client
+
+
+def sheet_stats(sheets):
+    return {ws.title: {"calls": sum(ws.calls.values()), "rejected": ws.rejected, **ws.calls}
+            for ws in sheets.values()}
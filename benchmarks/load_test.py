@@ -0,0 +1,159 @@
+# benchmarks/load_test.py
+#
+# Concurrent load generator reporting p50/p95/p99 latency per endpoint.
+#
+# By default it boots the app in-process against FakeScrapeServer and
+# FakeWorksheets (see fakes.py), so no SCRAPE_API or Google credentials are
+# needed and upstream latency / Sheets quota can be dialled in. With --target it
+# load-tests an already running server instead.
+#
+# Usage: python benchmarks/load_test.py [--concurrency 16] [--requests 200]
+#            [--endpoints /api/v1/portfolio/summary ...] [--upstream-delay-ms 300]
+#            [--sheet-latency-ms 150] [--sheet-quota 300] [--scale 1] [--lots 200]
+#            [--target http://127.0.0.1:5000]
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DEFAULT_ENDPOINTS = [
+    '/api/v1/portfolio/prices',
+    '/api/v1/portfolio/summary',
+    '/api/v1/portfolio/summary/aggregate',
+    '/api/v1/portfolio/market-summary',
+    '/api/v1/portfolio/',
+    '/api/v1/portfolio/wishlist',
+    '/api/v1/portfolio/realized-gain',
+]
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return float('nan')
+    rank = max(1, -(-len(sorted_values) * p // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def start_local_app(args):
+    """Boots the app against the fakes on a free port. Returns (base_url, scrape_server, sheets)."""
+    import fakes
+    from html_parsers import parse_share_price_table
+
+    upstream = fakes.FakeScrapeServer(delay_ms=args.upstream_delay_ms, jitter_ms=args.upstream_jitter_ms,
+                                      scale=args.scale, etag=args.etag).start()
+    symbols = [row['Symbol'] for row in parse_share_price_table(upstream.pages['/today-share-price'].decode())]
+    sheets = fakes.fake_sheets(symbols, lots=args.lots, latency_ms=args.sheet_latency_ms,
+                               quota_per_minute=args.sheet_quota)
+    fakes.install_fake_sheets(sheets)
+
+    state = tempfile.mkdtemp(prefix='nepse-load-')
+    os.environ['SCRAPE_API'] = upstream.url
+    os.environ.setdefault('HISTORY_DIR', os.path.join(state, 'history'))
+    os.environ.setdefault('FLOORSHEET_DIR', os.path.join(state, 'floorsheet'))
+    os.environ.setdefault('SHEETS_WRITE_JOURNAL', os.path.join(state, 'journal.jsonl'))
+
+    import logging
+    from werkzeug.serving import make_server
+    import scraper
+
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', 0, scraper.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True, name="app").start()
+    return f"http://127.0.0.1:{server.server_port}", upstream, sheets
+
+
+def run_load(base_url, endpoints, concurrency, per_endpoint, warmup):
+    local = threading.local()
+
+    def session():
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        return local.session
+
+    def hit(path):
+        start = time.perf_counter()
+        try:
+            response = session().get(base_url + path, timeout=60)
+            ok = response.status_code < 400
+        except requests.RequestException:
+            ok = False
+        return path, (time.perf_counter() - start) * 1000, ok
+
+    if warmup:
+        for path in endpoints:
+            hit(path)
+
+    # Endpoints are interleaved so every one of them sees the same concurrent mix.
+    work = [path for _ in range(per_endpoint) for path in endpoints]
+    timings, errors = defaultdict(list), defaultdict(int)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for path, ms, ok in pool.map(hit, work):
+            timings[path].append(ms)
+            if not ok:
+                errors[path] += 1
+    return timings, errors, time.perf_counter() - started
+
+
+def report(timings, errors, elapsed):
+    print(f"{'endpoint':<40} {'n':>6} {'err':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    total = 0
+    for path, values in timings.items():
+        values.sort()
+        total += len(values)
+        print(f"{path:<40} {len(values):>6} {errors[path]:>5} {percentile(values, 50):>9.1f} "
+              f"{percentile(values, 95):>9.1f} {percentile(values, 99):>9.1f} {values[-1]:>9.1f}")
+    print(f"{total} requests in {elapsed:.2f} s ({total / elapsed:.1f} req/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--target', help="base URL of a running server; default boots the app on fakes")
+    parser.add_argument('--endpoints', nargs='+', default=DEFAULT_ENDPOINTS)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=100, help="requests per endpoint")
+    parser.add_argument('--no-warmup', action='store_true', help="do not prime caches before measuring")
+    parser.add_argument('--upstream-delay-ms', type=float, default=300)
+    parser.add_argument('--upstream-jitter-ms', type=float, default=100)
+    parser.add_argument('--scale', type=int, default=1, help="share price table size multiplier")
+    parser.add_argument('--etag', action='store_true', help="fake upstream answers conditional requests with 304")
+    parser.add_argument('--sheet-latency-ms', type=float, default=150)
+    parser.add_argument('--sheet-quota', type=int, default=None, help="Sheets requests per minute before 429s")
+    parser.add_argument('--lots', type=int, default=200, help="portfolio rows in the fake sheet")
+    args = parser.parse_args()
+
+    upstream = sheets = None
+    if args.target:
+        base_url = args.target.rstrip('/')
+    else:
+        base_url, upstream, sheets = start_local_app(args)
+        print(f"App on {base_url}; fake upstream {upstream.url} (delay {args.upstream_delay_ms:.0f} ms, "
+              f"scale {args.scale}); fake sheets latency {args.sheet_latency_ms:.0f} ms, "
+              f"quota {args.sheet_quota or 'none'}/min, {args.lots} lots")
+
+    timings, errors, elapsed = run_load(base_url, args.endpoints, args.concurrency, args.requests,
+                                        warmup=not args.no_warmup)
+    print(f"concurrency {args.concurrency}, {args.requests} requests per endpoint")
+    report(timings, errors, elapsed)
+
+    if upstream is not None:
+        import fakes
+        print(f"Upstream requests: {dict(upstream.requests)}")
+        for title, stats in fakes.sheet_stats(sheets).items():
+            print(f"Sheet {title}: {stats}")
+        upstream.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+# benchmarks/reference.py
+#
+# Reference implementations of code paths that were replaced by faster engines.
+# The benchmarks time against them and tests/ checks the engines reproduce their output.
+
+
+def legacy_summary(portfolio_holdings, market_data_list):
+    """The /summary loop as it was before PortfolioValuation: the reference output for its lot rows."""
+    market_prices = {item['Symbol']: item for item in market_data_list}
+    total_portfolio_purchase_value = sum(stock.get('quantity', 0) * stock.get('purchasePrice', 0) for stock in portfolio_holdings)
+    if total_portfolio_purchase_value == 0:
+        total_portfolio_purchase_value = 1
+    summary_list = []
+    for stock in portfolio_holdings:
+        symbol = stock.get('scrip')
+        if not symbol or not stock.get('quantity'):
+            continue
+        purchase_price = stock.get('purchasePrice', 0)
+        quantity = stock.get('quantity', 0)
+        sector = stock.get('sector', 'N/A')
+        stock_market_data = market_prices.get(symbol)
+        ltp = 0.0
+        week_high_low = "N/A"
+        if stock_market_data:
+            try:
+                ltp = float(stock_market_data.get('LTP', '0').replace(',', ''))
+            except (ValueError, AttributeError):
+                ltp = 0.0
+            high = stock_market_data.get('52 Weeks High', 'N/A')
+            low = stock_market_data.get('52 Weeks Low', 'N/A')
+            week_high_low = f"{high} / {low}"
+        purchase_value = purchase_price * quantity
+        current_value = ltp * quantity if ltp > 0 else 0
+        profit_amount = current_value - purchase_value
+        if purchase_price > 0 and ltp > 0:
+            profit_percentage = (profit_amount / purchase_value) * 100
+        else:
+            profit_percentage = 0
+        weight_percentage = (purchase_value / total_portfolio_purchase_value) * 100
+        summary_list.append({
+            "Script": symbol, "Sector": sector, "quantity": quantity,
+            "purchase price": purchase_price, "LTP": ltp,
+            "Current Value": round(current_value, 2),
+            "52 week high/low": week_high_low,
+            "Profit amount": round(profit_amount, 2),
+            "profit percentage": f"{round(profit_percentage, 2)}%",
+            "Purchase value": round(purchase_value, 2),
+            "Weight%": f"{round(weight_percentage, 2)}%"
+        })
+    return summary_list
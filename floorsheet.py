@@ -0,0 +1,370 @@
+# floorsheet.py
+
+import json
+import logging
+import math
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from history_store import _as_date, _is_iso_date
+from html_parsers import parse_floorsheet_page
+from price_table import parse_number
+
+TRADES_FILE = 'trades.npy'
+SYMBOLS_FILE = 'symbols.json'
+AGGREGATES_FILE = 'aggregates.json'
+
+# One trade in 28 bytes.
+TRADE_DTYPE = np.dtype([
+    ('contract', 'i8'), ('symbol', 'i4'), ('buyer', 'i2'), ('seller', 'i2'),
+    ('quantity', 'i4'), ('rate', 'f8'),
+])
+
+# Header names seen for each field on floorsheet pages.
+COLUMN_ALIASES = {
+    'contract': ('Contract No', 'Contract No.', 'Transact. No.', 'Transaction No'),
+    'symbol': ('Stock Symbol', 'Symbol'),
+    'buyer': ('Buyer', 'Buyer Broker', 'Buyer Broker No'),
+    'seller': ('Seller', 'Seller Broker', 'Seller Broker No'),
+    'quantity': ('Quantity', 'Share Quantity', 'Qty'),
+    'rate': ('Rate', 'Rate (Rs)', 'Rate (Rs.)'),
+}
+
+
+def _column_positions(header):
+    positions = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in header:
+                positions[field] = header.index(alias)
+                break
+        else:
+            raise ValueError(f"Floorsheet table has no '{aliases[0]}' column.")
+    return positions
+
+
+class TradeChunk:
+    """Trades of one or more pages as parallel arrays, with symbols kept as (interned) strings."""
+
+    __slots__ = ('contract', 'symbols', 'buyer', 'seller', 'quantity', 'rate', 'skipped')
+
+    def __init__(self, contract, symbols, buyer, seller, quantity, rate, skipped=0):
+        self.contract = contract
+        self.symbols = symbols
+        self.buyer = buyer
+        self.seller = seller
+        self.quantity = quantity
+        self.rate = rate
+        self.skipped = skipped
+
+    def __len__(self):
+        return len(self.symbols)
+
+    @classmethod
+    def from_page(cls, header, rows):
+        """Converts parsed table rows; rows with a missing or non-numeric field are skipped."""
+        pos = _column_positions(header)
+        width = max(pos.values()) + 1
+        contract, symbols, buyer, seller, quantity, rate = [], [], [], [], [], []
+        skipped = 0
+        for cells in rows:
+            if len(cells) < width:
+                skipped += 1
+                continue
+            numbers = [parse_number(cells[pos[f]]) for f in ('buyer', 'seller', 'quantity', 'rate')]
+            symbol = cells[pos['symbol']]
+            try:
+                # Contract numbers run past float precision; parse them as integers.
+                number = int(cells[pos['contract']].replace(',', ''))
+            except ValueError:
+                number = None
+            if number is None or not symbol or any(math.isnan(n) for n in numbers):
+                skipped += 1
+                continue
+            contract.append(number)
+            symbols.append(sys.intern(symbol))
+            buyer.append(int(numbers[0]))
+            seller.append(int(numbers[1]))
+            quantity.append(int(numbers[2]))
+            rate.append(numbers[3])
+        return cls(np.array(contract, dtype=np.int64), symbols, np.array(buyer, dtype=np.int16),
+                   np.array(seller, dtype=np.int16), np.array(quantity, dtype=np.int32),
+                   np.array(rate, dtype=np.float64), skipped)
+
+
+def parse_floorsheet(html):
+    """Parses one floorsheet page into (TradeChunk, last_page). Used as the scrape client's parser."""
+    header, rows, last_page = parse_floorsheet_page(html)
+    return TradeChunk.from_page(header, rows), last_page
+
+
+def build_trades(chunks):
+    """
+    Merges page chunks into one TRADE_DTYPE array sorted by contract number, dropping
+    trades seen on two pages (pages shift while trading is live). Returns (trades, symbols).
+    """
+    ids = {}
+    parts = []
+    for chunk in chunks:
+        part = np.empty(len(chunk), dtype=TRADE_DTYPE)
+        part['contract'] = chunk.contract
+        part['symbol'] = np.fromiter((ids.setdefault(s, len(ids)) for s in chunk.symbols),
+                                     dtype=np.int32, count=len(chunk))
+        part['buyer'] = chunk.buyer
+        part['seller'] = chunk.seller
+        part['quantity'] = chunk.quantity
+        part['rate'] = chunk.rate
+        parts.append(part)
+    trades = np.concatenate(parts) if parts else np.empty(0, dtype=TRADE_DTYPE)
+    _, first = np.unique(trades['contract'], return_index=True)
+    return trades[first], list(ids)
+
+
+def _top(matrix, row, k, names, value_key, extra=None, largest=True):
+    """The k largest (or most negative) non-zero entries of one matrix row, as dicts."""
+    values = matrix[row]
+    order = np.argsort(-values if largest else values, kind='stable')[:k]
+    out = []
+    for j in order.tolist():
+        if values[j] == 0 or (largest and values[j] < 0) or (not largest and values[j] > 0):
+            break
+        entry = {names[0]: names[1](j), value_key: round(float(values[j]), 2)}
+        if extra is not None:
+            entry[extra[0]] = round(float(extra[1][row, j]), 2)
+        out.append(entry)
+    return out
+
+
+def aggregate(trades, symbols, top=5):
+    """
+    Symbol-wise and broker-wise aggregates of one day's trades, computed with
+    bincounts over (symbol x broker) matrices rather than a loop over trades.
+    """
+    n_symbols = len(symbols)
+    n_brokers = int(max(trades['buyer'].max(initial=0), trades['seller'].max(initial=0))) + 1
+    sid = trades['symbol'].astype(np.intp)
+    buyer = trades['buyer'].astype(np.intp)
+    seller = trades['seller'].astype(np.intp)
+    quantity = trades['quantity'].astype(np.float64)
+    rate = trades['rate']
+    amount = quantity * rate
+
+    # --- Per symbol ---
+    count = np.bincount(sid, minlength=n_symbols)
+    qty = np.bincount(sid, weights=quantity, minlength=n_symbols)
+    amt = np.bincount(sid, weights=amount, minlength=n_symbols)
+    vwap = np.divide(amt, qty, out=np.zeros_like(amt), where=qty != 0)
+    # Trades are in contract order, so a stable sort by symbol keeps time order inside each symbol.
+    order = np.argsort(sid, kind='stable')
+    starts = np.concatenate([[0], np.cumsum(count)[:-1]]) if n_symbols else np.empty(0, dtype=np.intp)
+    traded = count > 0
+    high = np.zeros(n_symbols)
+    low = np.zeros(n_symbols)
+    first = np.zeros(n_symbols)
+    last = np.zeros(n_symbols)
+    if len(trades):
+        sorted_rate = rate[order]
+        high[traded] = np.maximum.reduceat(sorted_rate, starts[traded])
+        low[traded] = np.minimum.reduceat(sorted_rate, starts[traded])
+        first[traded] = sorted_rate[starts[traded]]
+        last[traded] = sorted_rate[starts[traded] + count[traded] - 1]
+
+    # (symbol x broker) bought / sold quantity and amount.
+    cells = n_symbols * n_brokers
+    bought_qty = np.bincount(sid * n_brokers + buyer, weights=quantity, minlength=cells).reshape(n_symbols, n_brokers)
+    sold_qty = np.bincount(sid * n_brokers + seller, weights=quantity, minlength=cells).reshape(n_symbols, n_brokers)
+    bought_amt = np.bincount(sid * n_brokers + buyer, weights=amount, minlength=cells).reshape(n_symbols, n_brokers)
+    sold_amt = np.bincount(sid * n_brokers + seller, weights=amount, minlength=cells).reshape(n_symbols, n_brokers)
+    net_qty = bought_qty - sold_qty
+    net_amt = bought_amt - sold_amt
+
+    broker = ("Broker", int)
+    symbol_rows = []
+    for i, name in enumerate(symbols):
+        symbol_rows.append({
+            "Symbol": name, "Trades": int(count[i]), "Quantity": int(qty[i]), "Amount": round(float(amt[i]), 2),
+            "VWAP": round(float(vwap[i]), 2), "Open": float(first[i]), "High": float(high[i]),
+            "Low": float(low[i]), "Close": float(last[i]),
+            "Top buyers": _top(bought_qty, i, top, broker, "Quantity", ("Amount", bought_amt)),
+            "Top sellers": _top(sold_qty, i, top, broker, "Quantity", ("Amount", sold_amt)),
+            "Top net buyers": _top(net_qty, i, top, broker, "Net quantity", ("Net amount", net_amt)),
+            "Top net sellers": _top(net_qty, i, top, broker, "Net quantity", ("Net amount", net_amt), largest=False),
+        })
+
+    # --- Per broker ---
+    buy_qty, sell_qty = bought_qty.sum(axis=0), sold_qty.sum(axis=0)
+    buy_amt, sell_amt = bought_amt.sum(axis=0), sold_amt.sum(axis=0)
+    broker_trades = np.bincount(buyer, minlength=n_brokers) + np.bincount(seller, minlength=n_brokers)
+    by_symbol = ("Symbol", symbols.__getitem__)
+    bought_amt_t, sold_amt_t, net_amt_t = bought_amt.T.copy(), sold_amt.T.copy(), net_amt.T.copy()
+    broker_rows = []
+    for b in np.flatnonzero(broker_trades).tolist():
+        broker_rows.append({
+            "Broker": b, "Trades": int(broker_trades[b]),
+            "Buy quantity": int(buy_qty[b]), "Buy amount": round(float(buy_amt[b]), 2),
+            "Sell quantity": int(sell_qty[b]), "Sell amount": round(float(sell_amt[b]), 2),
+            "Net quantity": int(buy_qty[b] - sell_qty[b]), "Net amount": round(float(buy_amt[b] - sell_amt[b]), 2),
+            "Top bought": _top(bought_amt_t, b, top, by_symbol, "Amount"),
+            "Top sold": _top(sold_amt_t, b, top, by_symbol, "Amount"),
+            "Top net bought": _top(net_amt_t, b, top, by_symbol, "Net amount"),
+            "Top net sold": _top(net_amt_t, b, top, by_symbol, "Net amount", largest=False),
+        })
+
+    return {
+        "totals": {"Trades": int(len(trades)), "Quantity": int(quantity.sum()),
+                   "Amount": round(float(amount.sum()), 2), "Symbols": int(traded.sum()),
+                   "Brokers": len(broker_rows)},
+        "symbols": symbol_rows,
+        "brokers": broker_rows,
+    }
+
+
+class FloorsheetDay:
+    """One stored day: the memory-mapped trades plus its precomputed aggregates, indexed for lookups."""
+
+    def __init__(self, path, day):
+        self.date = day
+        self.trades = np.load(os.path.join(path, TRADES_FILE), mmap_mode='r')
+        with open(os.path.join(path, SYMBOLS_FILE), encoding='utf-8') as f:
+            self.symbols = json.load(f)
+        with open(os.path.join(path, AGGREGATES_FILE), encoding='utf-8') as f:
+            self.aggregates = json.load(f)
+        self.by_symbol = {row["Symbol"]: row for row in self.aggregates["symbols"]}
+        self.by_broker = {row["Broker"]: row for row in self.aggregates["brokers"]}
+
+
+class FloorsheetStore:
+    """
+    Local store of ingested floorsheets, one directory per trading day:
+
+        <root>/2026-10-15/trades.npy       TRADE_DTYPE records, sorted by contract number
+        <root>/2026-10-15/symbols.json     symbol names, indexed by trades['symbol']
+        <root>/2026-10-15/aggregates.json  symbol-wise and broker-wise aggregates
+
+    Aggregates are computed once when a day is saved, so serving them never
+    rescans the trades. Re-ingesting a day (e.g. during trading) replaces it.
+    """
+
+    def __init__(self, root, cache_size=8):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._days = OrderedDict()
+        self._cache_size = cache_size
+
+    def save(self, day, trades, symbols):
+        day = _as_date(day).isoformat()
+        aggregates = aggregate(trades, symbols)
+        aggregates["date"] = day
+        staging = tempfile.mkdtemp(prefix=f'.{day}-', dir=self.root)
+        try:
+            np.save(os.path.join(staging, TRADES_FILE), trades)
+            with open(os.path.join(staging, SYMBOLS_FILE), 'w', encoding='utf-8') as f:
+                json.dump(symbols, f)
+            with open(os.path.join(staging, AGGREGATES_FILE), 'w', encoding='utf-8') as f:
+                json.dump(aggregates, f)
+            target = os.path.join(self.root, day)
+            with self._lock:
+                if os.path.isdir(target):
+                    retired = tempfile.mkdtemp(prefix=f'.{day}-old-', dir=self.root)
+                    os.rename(target, os.path.join(retired, day))
+                    os.rename(staging, target)
+                    shutil.rmtree(retired, ignore_errors=True)
+                else:
+                    os.rename(staging, target)
+                self._days.pop(day, None)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        return aggregates["totals"]
+
+    def dates(self):
+        return sorted(name for name in os.listdir(self.root)
+                      if not name.startswith('.') and _is_iso_date(name))
+
+    def day(self, day):
+        """The FloorsheetDay for `day` ('latest' for the most recent), or None."""
+        if day == 'latest':
+            dates = self.dates()
+            if not dates:
+                return None
+            day = dates[-1]
+        day = _as_date(day).isoformat()
+        with self._lock:
+            cached = self._days.get(day)
+            if cached is not None:
+                self._days.move_to_end(day)
+                return cached
+        path = os.path.join(self.root, day)
+        if not os.path.isdir(path):
+            return None
+        loaded = FloorsheetDay(path, day)
+        with self._lock:
+            self._days[day] = loaded
+            while len(self._days) > self._cache_size:
+                self._days.popitem(last=False)
+        return loaded
+
+
+class FloorsheetIngester:
+    """
+    Pulls every page of the day's floorsheet and saves it to a FloorsheetStore.
+
+    `fetch_page(page)` returns (TradeChunk, last_page). Page 1 tells us how many
+    pages there are; the rest are fetched by a bounded worker pool and converted to
+    compact arrays as they arrive, so raw HTML and row dicts are never all held at once.
+    """
+
+    def __init__(self, fetch_page, store, workers=4, retries=2):
+        self.fetch_page = fetch_page
+        self.store = store
+        self.workers = workers
+        self.retries = retries
+        self._lock = threading.Lock()
+        self.last_run = None
+
+    def _fetch(self, page):
+        for attempt in range(self.retries + 1):
+            try:
+                return self.fetch_page(page)
+            except Exception as e:
+                if attempt == self.retries:
+                    raise
+                logging.warning(f"Floorsheet page {page} failed (attempt {attempt + 1}), retrying: {e}")
+
+    def ingest(self, day):
+        """Fetches, stores and aggregates the floorsheet as trading day `day`. One ingest runs at a time."""
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("A floorsheet ingest is already running.")
+        try:
+            started = time.perf_counter()
+            first, last_page = self._fetch(1)
+            chunks = [first]
+            if last_page > 1:
+                with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="floorsheet") as pool:
+                    for chunk, _ in pool.map(self._fetch, range(2, last_page + 1)):
+                        chunks.append(chunk)
+            trades, symbols = build_trades(chunks)
+            totals = self.store.save(day, trades, symbols)
+            self.last_run = {
+                "date": _as_date(day).isoformat(), "pages": last_page,
+                "rows": sum(len(c) for c in chunks), "skipped_rows": sum(c.skipped for c in chunks),
+                "seconds": round(time.perf_counter() - started, 3), **totals,
+            }
+            logging.info(f"Ingested floorsheet for {self.last_run['date']}: "
+                         f"{totals['Trades']} trades from {last_page} pages.")
+            return self.last_run
+        finally:
+            self._lock.release()
+
+    def status(self):
+        return {"running": self._lock.locked(), "last_run": self.last_run, "workers": self.workers}
+
@@ -2,46 +2,248 @@
 
 import os
 import json
+import threading
+import time
 import gspread
 import logging
 from dotenv import load_dotenv
+from google.auth.exceptions import RefreshError
 
 load_dotenv()
 
-# Initialize worksheet variables to None
-portfolio_sheet = None
-turnover_sheet = None
-daily_data_sheet = None
-watchlist_sheets=None
-realized_gains_sheet = None
+# Sheets API errors that mean the cached handles are stale rather than the request
+# being bad. 401 is an expired or revoked login: the whole connection is reopened.
+# 404 on a worksheet that had opened fine means it was deleted or recreated under us:
+# that one handle is reopened. 403 (no access) is left alone; reconnecting cannot fix it.
+RELOGIN_CODES = {401}
+STALE_WORKSHEET_CODES = {404}
 
-try:
+
+class ClientPool:
+    """
+    A few authenticated gspread clients shared by every spreadsheet connection.
+
+    Each client has its own HTTP session, so concurrent Sheets calls spread over
+    `size` keep-alive connection pools instead of queueing on one, and the
+    service-account login is done at most `size` times per process rather than
+    once per spreadsheet. Clients are created on first use and handed out round-robin.
+    """
+
+    def __init__(self, create_client, size=4):
+        self.create_client = create_client
+        self.size = max(1, size)
+        self._lock = threading.Lock()
+        self._clients = []
+        self._next = 0
+
+    def client(self):
+        with self._lock:
+            if len(self._clients) < self.size:
+                client = self.create_client()
+                self._clients.append(client)
+                return client
+            client = self._clients[self._next % self.size]
+            self._next += 1
+            return client
+
+    def stats(self):
+        with self._lock:
+            return {"clients": len(self._clients), "size": self.size}
+
+
+def service_account_client():
+    """A gspread client authenticated with the service account in GOOGLE_CREDENTIAL."""
     creds_json_str = os.getenv("GOOGLE_CREDENTIAL")
     if not creds_json_str:
         raise ValueError("GOOGLE_CREDENTIALS environment variable not set.")
-    
+
     creds_dict = json.loads(creds_json_str)
-    
-    gc = gspread.service_account_from_dict(creds_dict)
-    
-    spreadsheet = gc.open_by_key(os.getenv("SPREADSHEET_ID"))
-    
-    # --- UPDATED SECTION ---
-    # Assign the 'Portfolio' sheet (or your primary data sheet)
-    # Using spreadsheet.sheet1 assumes it's the first tab. 
-    # It's safer to open by name if possible.
-    portfolio_sheet = spreadsheet.worksheet("Portfolio") # <-- Best Practice: Use the sheet name
-
-    # Assign the 'Turnover' sheet
-    turnover_sheet = spreadsheet.worksheet("Turnover")
-    # --- END UPDATE ---
-    daily_data_sheet = spreadsheet.worksheet("Market")
-    watchlist_sheet = spreadsheet.worksheet("Watchlist")
-    realized_gains_sheet  = spreadsheet.worksheet("Realized Gains")
-
-    logging.info("Successfully connected to Google Sheets and loaded worksheets.")
-
-except gspread.exceptions.WorksheetNotFound as e:
-    logging.error(f"FATAL: A required worksheet was not found: {e}")
-except Exception as e:
-    logging.error(f"FATAL: Could not connect to Google Sheets. Details: {e}")
\ No newline at end of file
+
+    return gspread.service_account_from_dict(creds_dict)
+
+
+client_pool = ClientPool(service_account_client, size=int(os.getenv("GSPREAD_POOL_SIZE", 4)))
+
+
+def open_spreadsheet(spreadsheet_id):
+    """Opens a spreadsheet by key with a pooled client."""
+    return client_pool.client().open_by_key(spreadsheet_id)
+
+
+def connect_from_env():
+    """Opens the app's own spreadsheet, SPREADSHEET_ID."""
+    return open_spreadsheet(os.getenv("SPREADSHEET_ID"))
+
+
+class SheetsConnection:
+    """
+    Lazy, self-healing connection to the spreadsheet.
+
+    Nothing happens at import time. The first worksheet() call (or start()) kicks
+    off authentication on a background thread, which retries with exponential
+    backoff until it succeeds. Each worksheet is opened on first use and cached;
+    a worksheet that fails to open is retried after its own backoff. Callers get
+    None while something is unavailable, and the next call after the backoff tries
+    again, so route handlers recover without a process restart.
+    """
+
+    def __init__(self, connect=connect_from_env, wait=10.0, backoff_base=1.0, backoff_max=60.0):
+        self.connect = connect
+        self.wait = wait
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._lock = threading.Lock()
+        self._open_lock = threading.Lock()
+        self._attempted = threading.Event()   # set once the first auth attempt has finished
+        self._wake = threading.Event()        # cuts a backoff sleep short on reconnect()
+        self._thread = None
+        self._spreadsheet = None
+        self._worksheets = {}
+        self._failures = {}                   # worksheet name -> (attempts, retry_at, error)
+        self.auth_attempts = 0
+        self.last_error = None
+        self.connected_at = None
+
+    @property
+    def ready(self):
+        return self._spreadsheet is not None
+
+    def start(self):
+        """Starts background authentication if it is not connected or already connecting."""
+        with self._lock:
+            if self._spreadsheet is not None or (self._thread is not None and self._thread.is_alive()):
+                return
+            self._thread = threading.Thread(target=self._authenticate, daemon=True, name="sheets-connect")
+            self._thread.start()
+
+    def _authenticate(self):
+        while True:
+            try:
+                spreadsheet = self.connect()
+            except Exception as e:
+                with self._lock:
+                    self.auth_attempts += 1
+                    self.last_error = f"{type(e).__name__}: {e}"
+                    attempts = self.auth_attempts
+                self._attempted.set()
+                delay = min(self.backoff_base * (2 ** (attempts - 1)), self.backoff_max)
+                log = logging.error if attempts == 1 else logging.warning
+                log(f"Could not connect to Google Sheets (attempt {attempts}), retrying in {delay:.0f}s. Details: {e}")
+                self._wake.wait(delay)
+                self._wake.clear()
+                continue
+            with self._lock:
+                self._spreadsheet = spreadsheet
+                self.auth_attempts += 1
+                self.last_error = None
+                self.connected_at = time.time()
+            self._attempted.set()
+            logging.info("Successfully connected to Google Sheets.")
+            return
+
+    def worksheet(self, name):
+        """The named worksheet, opening it on first use, or None while it is unavailable."""
+        worksheet = self._worksheets.get(name)
+        if worksheet is not None:
+            return worksheet
+        if self._spreadsheet is None:
+            self.start()
+            # Only the very first callers wait for authentication; later ones fail fast.
+            self._attempted.wait(self.wait)
+            if self._spreadsheet is None:
+                return None
+        with self._open_lock:
+            worksheet = self._worksheets.get(name)
+            if worksheet is not None:
+                return worksheet
+            attempts, retry_at, _ = self._failures.get(name, (0, 0, None))
+            if time.monotonic() < retry_at:
+                return None
+            try:
+                worksheet = self._spreadsheet.worksheet(name)
+            except Exception as e:
+                attempts += 1
+                delay = min(self.backoff_base * (2 ** (attempts - 1)), self.backoff_max)
+                self._failures[name] = (attempts, time.monotonic() + delay, f"{type(e).__name__}: {e}")
+                if isinstance(e, gspread.exceptions.WorksheetNotFound):
+                    logging.error(f"A required worksheet was not found: {name}")
+                else:
+                    logging.error(f"Could not open worksheet '{name}' (attempt {attempts}), retrying in {delay:.0f}s: {e}")
+                return None
+            self._failures.pop(name, None)
+            self._worksheets[name] = worksheet
+            return worksheet
+
+    def reconnect(self):
+        """Drops the connection and every opened worksheet, then authenticates again."""
+        with self._open_lock, self._lock:
+            self._spreadsheet = None
+            self._worksheets = {}
+            self._failures = {}
+            self._attempted.clear()
+        self._wake.set()
+        self.start()
+
+    def forget(self, name):
+        """Drops one opened worksheet handle; the next worksheet(name) opens it again."""
+        with self._open_lock:
+            return self._worksheets.pop(name, None) is not None
+
+    def handle_error(self, error, worksheet=None):
+        """
+        Error hook for code using this connection's worksheets, so the next call gets
+        fresh handles instead of failing the same way until a restart. An auth failure
+        (RefreshError, or an API error in RELOGIN_CODES) reconnects. An API error in
+        STALE_WORKSHEET_CODES drops the handle of `worksheet` (the name the failing call
+        used), if that handle had opened successfully; other worksheets are untouched.
+        """
+        if not isinstance(error, (RefreshError, gspread.exceptions.APIError)) or self._spreadsheet is None:
+            # Not a handle problem, or a reconnect is already under way.
+            return
+        if isinstance(error, RefreshError) or error.code in RELOGIN_CODES:
+            logging.warning(f"Google Sheets login is no longer valid, reconnecting: {error}")
+            self.reconnect()
+        elif error.code in STALE_WORKSHEET_CODES and worksheet is not None and self.forget(worksheet):
+            logging.warning(f"Worksheet '{worksheet}' is gone from under its handle, reopening it: {error}")
+
+    def status(self):
+        """Readiness details for /health."""
+        with self._lock:
+            connecting = self._thread is not None and self._thread.is_alive()
+            state = "connected" if self._spreadsheet is not None else ("connecting" if connecting else "idle")
+            status = {
+                "ready": self._spreadsheet is not None,
+                "state": state,
+                "auth_attempts": self.auth_attempts,
+                "last_error": self.last_error,
+                "connected_at": self.connected_at,
+            }
+        now = time.monotonic()
+        with self._open_lock:
+            worksheets = {name: "open" for name in self._worksheets}
+            for name, (attempts, retry_at, error) in self._failures.items():
+                worksheets[name] = {"error": error, "attempts": attempts,
+                                    "retry_in": round(max(retry_at - now, 0), 1)}
+        status["worksheets"] = worksheets
+        return status
+
+
+connection = SheetsConnection(wait=float(os.getenv("SHEETS_CONNECT_WAIT", 10)))
+
+# --- Worksheet accessors ---
+# Each returns the worksheet, or None while Google Sheets is unavailable.
+
+def portfolio_sheet():
+    return connection.worksheet("Portfolio")
+
+def turnover_sheet():
+    return connection.worksheet("Turnover")
+
+def daily_data_sheet():
+    return connection.worksheet("Market")
+
+def watchlist_sheet():
+    return connection.worksheet("Watchlist")
+
+def realized_gains_sheet():
+    return connection.worksheet("Realized Gains")
@@ -0,0 +1,217 @@
+# history_store.py
+
+import json
+import math
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from datetime import date
+
+import numpy as np
+
+from price_cache import last_session_date
+
+# Columns compared to tell a new session from a repeat of the last stored one.
+SESSION_COLUMNS = ('LTP', 'Vol', 'Turnover')
+VALUES_FILE = 'values.npy'
+SYMBOLS_FILE = 'symbols.json'
+META_FILE = 'meta.json'
+
+
+class Partition:
+    """One trading day: symbol list, symbol index and a memory-mapped (columns x symbols) float64 matrix."""
+
+    __slots__ = ('date', 'columns', 'column_pos', 'symbols', 'index', 'values')
+
+    def __init__(self, path, day):
+        self.date = day
+        with open(os.path.join(path, META_FILE), encoding='utf-8') as f:
+            self.columns = json.load(f)['columns']
+        with open(os.path.join(path, SYMBOLS_FILE), encoding='utf-8') as f:
+            self.symbols = json.load(f)
+        self.column_pos = {name: i for i, name in enumerate(self.columns)}
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.values = np.load(os.path.join(path, VALUES_FILE), mmap_mode='r')
+
+    def column(self, name):
+        """All symbols' values for one column (a view into the memory map)."""
+        return self.values[self.column_pos[name]]
+
+    def row(self, symbol, columns):
+        pos = self.index.get(symbol)
+        if pos is None:
+            return None
+        return {name: _json_number(self.values[self.column_pos[name], pos]) for name in columns}
+
+
+class HistoryStore:
+    """
+    Append-only local store of daily share-price snapshots, one directory per date:
+
+        <root>/2026-10-15/meta.json     column names
+        <root>/2026-10-15/symbols.json  symbols, in row order
+        <root>/2026-10-15/values.npy    float64 matrix, one row per column (columnar)
+
+    Partitions are written once to a temp directory and renamed into place, so
+    readers never see a half-written day. Reads memory-map values.npy, so a
+    per-symbol range query touches one strided slice per day rather than loading
+    whole snapshots.
+    """
+
+    def __init__(self, root, cache_size=256):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._partitions = OrderedDict()
+        self._cache_size = cache_size
+        self._dates = None
+        self._dates_mtime = None
+
+    # --- Writes ---
+
+    def session_date(self, price_table, now=None):
+        """
+        The date to store `price_table` under: the latest closed trading session
+        (see price_cache.last_session_date). Returns None when it should not be stored,
+        either because a session is still in progress or because it repeats the latest
+        stored day unchanged (a market holiday, which the calendar alone cannot tell).
+        """
+        day = last_session_date(now)
+        if day is None:
+            return None
+        day = day.isoformat()
+        earlier = [d for d in self.dates(end=day) if d != day]
+        if earlier and self.same_snapshot(earlier[-1], price_table):
+            return None
+        return day
+
+    def same_snapshot(self, day, price_table, columns=SESSION_COLUMNS):
+        """True if the stored `day` has the same symbols and the same `columns` values as `price_table`."""
+        partition = self.partition(day)
+        if partition is None or partition.symbols != list(price_table.symbols):
+            return False
+        for name in columns:
+            if name not in partition.column_pos:
+                continue
+            try:
+                now = price_table.column(name)
+            except KeyError:
+                return False
+            if not np.array_equal(partition.column(name), now, equal_nan=True):
+                return False
+        return True
+
+    def append(self, day, price_table):
+        """Saves `price_table` as the snapshot for `day`. Returns False if that day is already stored."""
+        day = _as_date(day).isoformat()
+        target = os.path.join(self.root, day)
+        if os.path.isdir(target):
+            return False
+        columns = [name for name in price_table.header if _is_numeric(price_table, name)]
+        matrix = np.vstack([price_table.column(name) for name in columns]) if columns \
+            else np.empty((0, len(price_table)))
+        staging = tempfile.mkdtemp(prefix=f'.{day}-', dir=self.root)
+        try:
+            np.save(os.path.join(staging, VALUES_FILE), np.ascontiguousarray(matrix, dtype=np.float64))
+            with open(os.path.join(staging, SYMBOLS_FILE), 'w', encoding='utf-8') as f:
+                json.dump(price_table.symbols, f)
+            with open(os.path.join(staging, META_FILE), 'w', encoding='utf-8') as f:
+                json.dump({"date": day, "columns": columns}, f)
+            try:
+                os.rename(staging, target)
+            except OSError:
+                # Another process stored the same day first.
+                shutil.rmtree(staging, ignore_errors=True)
+                return False
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        with self._lock:
+            self._dates = None
+        return True
+
+    # --- Reads ---
+
+    def dates(self, start=None, end=None):
+        """Stored trading dates (ISO strings), ascending, optionally limited to [start, end]."""
+        # Other processes append too; a new partition (a rename into root) changes root's mtime.
+        mtime = os.stat(self.root).st_mtime_ns
+        with self._lock:
+            if self._dates is None or mtime != self._dates_mtime:
+                self._dates = sorted(name for name in os.listdir(self.root)
+                                     if not name.startswith('.') and _is_iso_date(name))
+                self._dates_mtime = mtime
+            dates = self._dates
+        start = _as_date(start).isoformat() if start else None
+        end = _as_date(end).isoformat() if end else None
+        return [d for d in dates if (start is None or d >= start) and (end is None or d <= end)]
+
+    def __contains__(self, day):
+        return _as_date(day).isoformat() in self.dates()
+
+    def partition(self, day):
+        """The Partition for `day`, or None. Partitions are immutable, so they are cached (LRU)."""
+        day = _as_date(day).isoformat()
+        with self._lock:
+            cached = self._partitions.get(day)
+            if cached is not None:
+                self._partitions.move_to_end(day)
+                return cached
+        path = os.path.join(self.root, day)
+        if not os.path.isdir(path):
+            return None
+        partition = Partition(path, day)
+        with self._lock:
+            self._partitions[day] = partition
+            while len(self._partitions) > self._cache_size:
+                self._partitions.popitem(last=False)
+        return partition
+
+    def symbol_history(self, symbol, start=None, end=None, columns=None):
+        """One row per stored day in [start, end] on which `symbol` traded."""
+        rows = []
+        for day in self.dates(start, end):
+            partition = self.partition(day)
+            row = partition.row(symbol, columns or partition.columns)
+            if row is not None:
+                rows.append({"Date": day, **row})
+        return rows
+
+    def cross_section(self, day, columns=None):
+        """Every symbol's row for one day, or None if the day is not stored."""
+        partition = self.partition(day)
+        if partition is None:
+            return None
+        columns = columns or partition.columns
+        data = {name: partition.column(name).tolist() for name in columns}
+        return [{"Symbol": symbol, **{name: _json_number(data[name][i]) for name in columns}}
+                for i, symbol in enumerate(partition.symbols)]
+
+
+def _is_numeric(price_table, name):
+    try:
+        price_table.column(name)
+        return True
+    except KeyError:
+        return False
+
+
+def _json_number(value):
+    value = float(value)
+    return None if math.isnan(value) else value
+
+
+def _as_date(value):
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value))
+
+
+def _is_iso_date(name):
+    try:
+        date.fromisoformat(name)
+        return True
+    except ValueError:
+        return False
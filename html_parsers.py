@@ -0,0 +1,384 @@
+# html_parsers.py
+
+"""
+Parser backends for the scraped NEPSE pages.
+
+Each backend turns raw HTML into exactly what the scrapers return:
+  - parse_share_price_table(html) -> list of row dicts keyed by the table header
+  - parse_market_summary(html)    -> dict with "Date" plus one entry per summary row
+
+parse_floorsheet_page(html) always uses the streaming backend: floorsheet pages
+come by the hundred and only the trade table and pager links are needed.
+
+Backends:
+  - "stream": event-based extractor on the stdlib HTMLParser. Only looks at the
+    target table/div and never builds a tree.
+  - "lxml":   lxml's C parser + XPath. Used by default when lxml is installed.
+  - "bs4":    the original BeautifulSoup + html.parser implementation, kept as a
+    reference for correctness checks and benchmarks.
+
+The default can be forced with the HTML_PARSER_BACKEND environment variable.
+"""
+
+import os
+import re
+from html.parser import HTMLParser
+
+from bs4 import BeautifulSoup
+
+try:
+    import lxml.html
+except ImportError:  # lxml is optional
+    lxml = None
+
+SHARE_TABLE_ID = 'headFixed'
+SUMMARY_DIV_ID = 'market_symmary_data'
+SUMMARY_DATE_CLASS = 'text-org'
+FLOORSHEET_TABLE_ID = 'myTable'
+_PAGE_LINK = re.compile(r'[?&]page=(\d+)')
+
+
+def _strip_join(pieces):
+    """Same text normalisation as BeautifulSoup's get_text(strip=True)."""
+    return "".join(p for p in (s.strip() for s in pieces) if p)
+
+
+def _summary_key(text):
+    return text.replace('(Rs.)', '').strip()
+
+
+# --- Streaming backend ---
+
+class _StopParsing(Exception):
+    """Raised from inside the event handlers once the target element is closed."""
+
+
+class _ShareTableExtractor(HTMLParser):
+    """Collects header and body cells of table#headFixed (or another table id) from parser events."""
+
+    def __init__(self, table_id=SHARE_TABLE_ID):
+        super().__init__(convert_charrefs=True)
+        self.table_id = table_id
+        self.found_table = False
+        self.found_thead = False
+        self.found_tbody = False
+        self.header = []
+        self.rows = []
+        self._depth = 0          # table nesting depth inside the target table
+        self._section = None     # 'thead' / 'tbody' / None
+        self._row = None
+        self._cell = None
+
+    def handle_starttag(self, tag, attrs):
+        if self._depth == 0:
+            if tag == 'table' and dict(attrs).get('id') == self.table_id:
+                self.found_table = True
+                self._depth = 1
+            return
+        if tag == 'table':
+            self._depth += 1
+        elif tag in ('thead', 'tbody'):
+            self._close_cell()
+            self._section = tag
+            if tag == 'thead':
+                self.found_thead = True
+            else:
+                self.found_tbody = True
+        elif tag == 'tr':
+            self._close_row()
+            if self._section == 'tbody':
+                self._row = []
+        elif tag == 'th' and self._section == 'thead':
+            self._close_cell()
+            self._cell = ('th', [])
+        elif tag == 'td' and self._row is not None:
+            self._close_cell()
+            self._cell = ('td', [])
+
+    def handle_endtag(self, tag):
+        if self._depth == 0:
+            return
+        if tag == 'table':
+            self._depth -= 1
+            if self._depth == 0:
+                self._close_row()
+                raise _StopParsing()
+        elif tag in ('th', 'td'):
+            self._close_cell()
+        elif tag == 'tr':
+            self._close_row()
+        elif tag in ('thead', 'tbody'):
+            self._close_row()
+            self._section = None
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell[1].append(data)
+
+    def _close_cell(self):
+        if self._cell is None:
+            return
+        kind, pieces = self._cell
+        self._cell = None
+        if kind == 'th':
+            self.header.append(_strip_join(pieces))
+        elif self._row is not None:
+            self._row.append(_strip_join(pieces))
+
+    def _close_row(self):
+        self._close_cell()
+        if self._row is not None:
+            self.rows.append(self._row)
+            self._row = None
+
+
+class _MarketSummaryExtractor(HTMLParser):
+    """Collects the date span and two-cell rows of div#market_symmary_data."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.found_div = False
+        self.date = None
+        self.rows = []
+        self._depth = 0          # div nesting depth inside the target div
+        self._date_depth = 0     # span nesting depth inside the date span
+        self._date_pieces = None
+        self._row = None
+        self._cell = None
+
+    def handle_starttag(self, tag, attrs):
+        if self._depth == 0:
+            if tag == 'div' and dict(attrs).get('id') == SUMMARY_DIV_ID:
+                self.found_div = True
+                self._depth = 1
+            return
+        if tag == 'div':
+            self._depth += 1
+        elif tag == 'span':
+            if self._date_depth:
+                self._date_depth += 1
+            elif self.date is None and self._date_pieces is None and \
+                    SUMMARY_DATE_CLASS in (dict(attrs).get('class') or '').split():
+                self._date_depth = 1
+                self._date_pieces = []
+        elif tag == 'tr':
+            self._close_row()
+            self._row = []
+        elif tag == 'td' and self._row is not None:
+            self._close_cell()
+            self._cell = []
+
+    def handle_endtag(self, tag):
+        if self._depth == 0:
+            return
+        if tag == 'div':
+            self._depth -= 1
+            if self._depth == 0:
+                self._close_row()
+                raise _StopParsing()
+        elif tag == 'span' and self._date_depth:
+            self._date_depth -= 1
+            if self._date_depth == 0:
+                self.date = _strip_join(self._date_pieces)
+        elif tag == 'td':
+            self._close_cell()
+        elif tag == 'tr':
+            self._close_row()
+
+    def handle_data(self, data):
+        if self._date_depth:
+            self._date_pieces.append(data)
+        if self._cell is not None:
+            self._cell.append(data)
+
+    def _close_cell(self):
+        if self._cell is not None and self._row is not None:
+            self._row.append(_strip_join(self._cell))
+        self._cell = None
+
+    def _close_row(self):
+        self._close_cell()
+        if self._row is not None:
+            self.rows.append(self._row)
+            self._row = None
+
+
+def _skip_to(html, tag, element_id):
+    """
+    Cheap string search for the start tag of the target element, so the
+    event parser does not have to tokenise the navigation, scripts, etc. before it.
+    Falls back to the whole document if the id is not found verbatim.
+    """
+    for quote in ('"', "'"):
+        pos = html.find(f'id={quote}{element_id}{quote}')
+        if pos != -1:
+            start = html.rfind(f'<{tag}', 0, pos)
+            if start != -1:
+                return html[start:]
+    return html
+
+
+def _feed(extractor, html):
+    try:
+        extractor.feed(html)
+        extractor.close()
+    except _StopParsing:
+        pass
+    return extractor
+
+
+def _stream_share_price_table(html):
+    ex = _feed(_ShareTableExtractor(), _skip_to(html, 'table', SHARE_TABLE_ID))
+    if not ex.found_table:
+        raise ValueError(f"Could not find data table with id='{SHARE_TABLE_ID}'.")
+    if not ex.found_thead:
+        raise ValueError("Could not find table header.")
+    if not ex.found_tbody:
+        raise ValueError("Could not find table body.")
+    header = ex.header
+    return [dict(zip(header, cols)) for cols in ex.rows]
+
+
+def _stream_market_summary(html):
+    ex = _feed(_MarketSummaryExtractor(), _skip_to(html, 'div', SUMMARY_DIV_ID))
+    if not ex.found_div:
+        raise ValueError("Could not find market summary container.")
+    if ex.date is None:
+        raise ValueError("Could not find market date.")
+    summary_data = {"Date": ex.date}
+    for cells in ex.rows:
+        if len(cells) == 2:
+            summary_data[_summary_key(cells[0])] = cells[1]
+    return summary_data
+
+
+# --- lxml backend ---
+
+def _lxml_text(element):
+    return _strip_join(element.itertext())
+
+
+def _lxml_share_price_table(html):
+    doc = lxml.html.fromstring(html)
+    tables = doc.xpath(f"//table[@id='{SHARE_TABLE_ID}']")
+    if not tables:
+        raise ValueError(f"Could not find data table with id='{SHARE_TABLE_ID}'.")
+    data_table = tables[0]
+    thead = data_table.find('.//thead')
+    if thead is None:
+        raise ValueError("Could not find table header.")
+    header = [_lxml_text(th) for th in thead.iter('th')]
+    tbody = data_table.find('.//tbody')
+    if tbody is None:
+        raise ValueError("Could not find table body.")
+    return [dict(zip(header, [_lxml_text(td) for td in row.iter('td')]))
+            for row in tbody.iter('tr')]
+
+
+def _lxml_market_summary(html):
+    doc = lxml.html.fromstring(html)
+    divs = doc.xpath(f"//div[@id='{SUMMARY_DIV_ID}']")
+    if not divs:
+        raise ValueError("Could not find market summary container.")
+    summary_div = divs[0]
+    spans = summary_div.xpath(
+        f".//span[contains(concat(' ', normalize-space(@class), ' '), ' {SUMMARY_DATE_CLASS} ')]")
+    if not spans:
+        raise ValueError("Could not find market date.")
+    summary_data = {"Date": _lxml_text(spans[0])}
+    for row in summary_div.iter('tr'):
+        cells = list(row.iter('td'))
+        if len(cells) == 2:
+            summary_data[_summary_key(_lxml_text(cells[0]))] = _lxml_text(cells[1])
+    return summary_data
+
+
+# --- BeautifulSoup backend (original implementation) ---
+
+def _bs4_share_price_table(html):
+    soup = BeautifulSoup(html, 'html.parser')
+    data_table = soup.find('table', id=SHARE_TABLE_ID)
+    if not data_table:
+        raise ValueError(f"Could not find data table with id='{SHARE_TABLE_ID}'.")
+    thead = data_table.find('thead')
+    if not thead:
+        raise ValueError("Could not find table header.")
+    header = [th.get_text(strip=True) for th in thead.find_all('th')]
+    tbody = data_table.find('tbody')
+    if not tbody:
+        raise ValueError("Could not find table body.")
+    all_rows = []
+    for row in tbody.find_all('tr'):
+        cols = [ele.get_text(strip=True) for ele in row.find_all('td')]
+        all_rows.append(dict(zip(header, cols)))
+    return all_rows
+
+
+def _bs4_market_summary(html):
+    soup = BeautifulSoup(html, 'html.parser')
+    summary_div = soup.find('div', id=SUMMARY_DIV_ID)
+    if not summary_div:
+        raise ValueError("Could not find market summary container.")
+    date_span = summary_div.find('span', class_=SUMMARY_DATE_CLASS)
+    if not date_span:
+        raise ValueError("Could not find market date.")
+    summary_data = {"Date": date_span.get_text(strip=True)}
+    for row in summary_div.find_all('tr'):
+        cells = row.find_all('td')
+        if len(cells) == 2:
+            summary_data[_summary_key(cells[0].get_text(strip=True))] = cells[1].get_text(strip=True)
+    return summary_data
+
+
+# --- Backend selection ---
+
+BACKENDS = {
+    'stream': (_stream_share_price_table, _stream_market_summary),
+    'bs4': (_bs4_share_price_table, _bs4_market_summary),
+}
+if lxml is not None:
+    BACKENDS['lxml'] = (_lxml_share_price_table, _lxml_market_summary)
+
+
+def default_backend():
+    """Backend name from HTML_PARSER_BACKEND, else lxml when installed, else the streaming parser."""
+    name = os.getenv("HTML_PARSER_BACKEND")
+    if name:
+        return name
+    return 'lxml' if 'lxml' in BACKENDS else 'stream'
+
+
+def _backend(name):
+    name = name or default_backend()
+    try:
+        return BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown or unavailable HTML parser backend '{name}'. "
+                         f"Available: {sorted(BACKENDS)}")
+
+
+def parse_share_price_table(html, backend=None):
+    """Parses the today-share-price page into a list of row dicts."""
+    return _backend(backend)[0](html)
+
+
+def parse_market_summary(html, backend=None):
+    """Parses the market-summary page into a dict."""
+    return _backend(backend)[1](html)
+
+
+def parse_floorsheet_page(html):
+    """
+    Parses one floorsheet page into (header, rows, last_page): the trade table's
+    header, its body rows as lists of cell text, and the highest page number
+    linked from the pager (1 when there is no pager).
+    """
+    start = html.find(f'id="{FLOORSHEET_TABLE_ID}"')
+    ex = _feed(_ShareTableExtractor(FLOORSHEET_TABLE_ID), _skip_to(html, 'table', FLOORSHEET_TABLE_ID))
+    if not ex.found_table:
+        raise ValueError(f"Could not find floorsheet table with id='{FLOORSHEET_TABLE_ID}'.")
+    if not ex.found_thead:
+        raise ValueError("Could not find table header.")
+    # The pager follows the table; links before it (navigation) are not page links.
+    pages = [int(n) for n in _PAGE_LINK.findall(html, max(start, 0))]
+    return ex.header, ex.rows, max(pages, default=1)
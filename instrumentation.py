@@ -0,0 +1,210 @@
+# instrumentation.py
+
+"""
+Request timing and profiling.
+
+  - span(phase): times one phase (sheet_read, fetch, parse, compute, serialize, sheet_write).
+    Every span feeds a histogram; spans inside a request are also summed per
+    phase into that request's Server-Timing header. The current request is found
+    through a context variable, so spans in io_pool workers count too
+    (pipeline.run_concurrently copies the context into them).
+  - render_metrics(): Prometheus text format for the phase and request histograms.
+  - init_app(app): installs the request hooks. With PROFILING_ENABLED=1, a request
+    carrying "X-Profile: 1" or "?profile=1" is profiled (pyinstrument when
+    installed, else cProfile) and the dump is written to PROFILE_DIR.
+"""
+
+import cProfile
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+
+from flask import g, request
+
+try:
+    from pyinstrument import Profiler as _Pyinstrument
+except ImportError:  # pyinstrument is optional
+    _Pyinstrument = None
+
+# Seconds; Prometheus client defaults plus a 30s bucket for slow Sheets calls.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0, 30.0)
+
+
+class Histogram:
+    """Cumulative-bucket histogram with one series per label tuple."""
+
+    def __init__(self, name, help_text, label_names, buckets=BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, labels, seconds):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            counts = series[0]
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    counts[i] += 1
+            series[1] += seconds
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((labels, (list(s[0]), s[1], s[2])) for labels, s in self._series.items())
+        for labels, (counts, total, count) in items:
+            base = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, labels))
+            sep = "," if base else ""
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{{{base}{sep}le="{bound}"}} {bucket_count}')
+            lines.append(f'{self.name}_bucket{{{base}{sep}le="+Inf"}} {count}')
+            lines.append(f"{self.name}_sum{{{base}}} {total}")
+            lines.append(f"{self.name}_count{{{base}}} {count}")
+        return "\n".join(lines)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+phase_seconds = Histogram("nepse_phase_duration_seconds",
+                          "Time spent per phase (sheet_read, fetch, parse, compute, serialize, sheet_write).", ("phase",))
+request_seconds = Histogram("nepse_http_request_duration_seconds",
+                            "HTTP request latency by route.", ("method", "endpoint", "status"))
+
+
+class RequestTimings:
+    """Per-request phase totals; shared by the request thread and its io_pool helpers."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+        self.phases = {}
+
+    def add(self, phase, seconds):
+        with self._lock:
+            total, count = self.phases.get(phase, (0.0, 0))
+            self.phases[phase] = (total + seconds, count + 1)
+
+    def server_timing(self):
+        with self._lock:
+            phases = dict(self.phases)
+        parts = [f"{phase};dur={total * 1000:.1f};desc=\"{count} call{'s' if count != 1 else ''}\""
+                 for phase, (total, count) in phases.items()]
+        parts.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.1f}")
+        return ", ".join(parts)
+
+
+_current = ContextVar('request_timings', default=None)
+
+
+@contextmanager
+def span(phase):
+    """Times the enclosed block as `phase`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        phase_seconds.observe((phase,), elapsed)
+        timings = _current.get()
+        if timings is not None:
+            timings.add(phase, elapsed)
+
+
+def render_metrics(extra_gauges=None):
+    """Prometheus text exposition of both histograms plus `extra_gauges` ({metric_name: number})."""
+    parts = [phase_seconds.render(), request_seconds.render()]
+    for name, value in (extra_gauges or {}).items():
+        parts.append(f"# TYPE {name} gauge\n{name} {value}")
+    return "\n".join(parts) + "\n"
+
+
+def stats_gauges(prefix, stats):
+    """Numeric entries of a stats() dict as gauges named <prefix>_<key>."""
+    gauges = {}
+    for key, value in stats.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        gauges[f"{prefix}_{re.sub(r'[^a-zA-Z0-9_]', '_', key)}"] = value
+    return gauges
+
+
+# --- Flask hooks ---
+
+profiling_enabled = os.getenv("PROFILING_ENABLED") == "1"
+profile_dir = os.getenv("PROFILE_DIR", "data/profiles")
+
+
+def _profile_requested():
+    return request.headers.get('X-Profile') == '1' or request.args.get('profile') == '1'
+
+
+def _start_profiler():
+    if _Pyinstrument is not None:
+        profiler = _Pyinstrument()
+        profiler.start()
+    else:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    return profiler
+
+
+def _dump_profile(profiler):
+    os.makedirs(profile_dir, exist_ok=True)
+    endpoint = re.sub(r'[^a-zA-Z0-9_.-]', '_', request.endpoint or 'unknown')
+    stem = f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-{endpoint}"
+    if _Pyinstrument is not None:
+        profiler.stop()
+        path = os.path.join(profile_dir, stem + '.html')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(profiler.output_html())
+    else:
+        profiler.disable()
+        path = os.path.join(profile_dir, stem + '.prof')
+        profiler.dump_stats(path)
+    return path
+
+
+def init_app(app):
+    """Adds Server-Timing headers, request histograms and opt-in profiling to `app`."""
+
+    @app.before_request
+    def _start_request_timing():
+        g.request_timings = RequestTimings()
+        g.request_timings_token = _current.set(g.request_timings)
+        if profiling_enabled and _profile_requested():
+            g.profiler = _start_profiler()
+
+    @app.after_request
+    def _finish_request_timing(response):
+        timings = g.pop('request_timings', None)
+        if timings is None:
+            return response
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            try:
+                response.headers['X-Profile-Dump'] = os.path.basename(_dump_profile(profiler))
+            except Exception as e:
+                logging.error(f"Failed to write request profile: {e}")
+        response.headers['Server-Timing'] = timings.server_timing()
+        response.headers.setdefault('Timing-Allow-Origin', '*')
+        request_seconds.observe((request.method, request.url_rule.rule if request.url_rule else 'unmatched',
+                                 str(response.status_code)), time.perf_counter() - timings.started)
+        return response
+
+    @app.teardown_request
+    def _reset_request_timing(error=None):
+        token = g.pop('request_timings_token', None)
+        if token is not None:
+            _current.reset(token)
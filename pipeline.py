@@ -0,0 +1,41 @@
+# pipeline.py
+
+import contextvars
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor, wait
+
+# Request-path I/O (sheet reads, upstream fetches) that a handler waits on.
+io_pool = ThreadPoolExecutor(max_workers=int(os.getenv("IO_POOL_SIZE", 8)), thread_name_prefix="io")
+
+# Fire-and-forget work that must not delay the response (e.g. saving snapshots).
+background_pool = ThreadPoolExecutor(max_workers=int(os.getenv("BACKGROUND_POOL_SIZE", 2)),
+                                     thread_name_prefix="background")
+
+
+def run_concurrently(*calls):
+    """
+    Runs zero-argument callables in parallel on the I/O pool and returns their
+    results in the same order. Waits for all of them; if any failed, the first
+    failure (in argument order) is re-raised. Each call runs in a copy of the
+    caller's context, so request-scoped context variables (timing spans) still apply.
+    """
+    if len(calls) == 1:
+        return [calls[0]()]
+    futures = [io_pool.submit(contextvars.copy_context().run, call) for call in calls]
+    wait(futures)
+    return [future.result() for future in futures]
+
+
+def run_in_background(fn, *args, **kwargs):
+    """
+    Schedules fn(*args, **kwargs) off the request path, in a copy of the caller's
+    context. Errors are logged, never raised.
+    """
+    def log_failure(future):
+        error = future.exception()
+        if error is not None:
+            logging.error(f"Background task {getattr(fn, '__name__', fn)} failed: {error}")
+    future = background_pool.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+    future.add_done_callback(log_failure)
+    return future
@@ -0,0 +1,213 @@
+# portfolio_books.py
+
+"""
+Per-user portfolios.
+
+A PortfolioBook is one user's Portfolio / Watchlist / Realized Gains worksheets
+together with their mirrors and incremental valuation. A user is mapped either
+to a spreadsheet of their own, which gives them their own Sheets quota, or to a
+worksheet shard of a shared spreadsheet (worksheet titles with a prefix, e.g.
+"alice Portfolio"). PortfolioBooks keeps the most recently used books in an LRU.
+Market data (prices, turnover) is not part of a book: every user's summary is
+priced from the same shared scrape.
+"""
+
+import hashlib
+import hmac
+import json
+import threading
+from collections import OrderedDict
+from functools import partial
+
+from gspread_client import SheetsConnection
+from portfolio_summary import IncrementalValuation
+
+
+def _read_user_spec(spec):
+    """The USER_SPREADSHEETS object: inline JSON, or the path of a file holding it."""
+    if not spec:
+        return {}
+    spec = spec.strip()
+    if not spec.startswith('{'):
+        with open(spec, encoding='utf-8') as f:
+            spec = f.read()
+    return json.loads(spec)
+
+
+def load_user_map(spec):
+    """
+    {user_id: (spreadsheet_id, worksheet_prefix)} from USER_SPREADSHEETS: a JSON
+    object, or the path of a file holding one. Each value is a spreadsheet id, or
+    {"spreadsheet_id": ..., "prefix": ..., "token_sha256": ...}. Without a
+    spreadsheet_id the user's worksheets live in the app's own spreadsheet, under
+    their prefix. token_sha256 is read by load_user_tokens.
+    """
+    users = {}
+    for user_id, entry in _read_user_spec(spec).items():
+        if isinstance(entry, str):
+            entry = {"spreadsheet_id": entry}
+        users[str(user_id)] = (entry.get("spreadsheet_id") or None, entry.get("prefix", ""))
+    return users
+
+
+def load_user_tokens(spec):
+    """{user_id: hex SHA-256 of the user's API token} for the USER_SPREADSHEETS entries that have one."""
+    return {str(user_id): entry["token_sha256"].lower() for user_id, entry in _read_user_spec(spec).items()
+            if isinstance(entry, dict) and entry.get("token_sha256")}
+
+
+class UserAuth:
+    """
+    Decides whether a request may act as a user, before that user's book is touched.
+
+    With `trusted_header` set (USER_AUTH_HEADER), an authenticating proxy in front of
+    the app names the user in that header, and it must equal the user in the URL.
+    Otherwise the request must carry "Authorization: Bearer <token>" where the token's
+    SHA-256 is the user's token_sha256 (see load_user_tokens). A user without a token
+    cannot be reached at all. check() returns None when allowed, else (status, message).
+    """
+
+    def __init__(self, tokens, trusted_header=None):
+        self.tokens = tokens
+        self.trusted_header = trusted_header or None
+        self.denied = 0
+
+    def check(self, user_id, headers):
+        if self.trusted_header is not None:
+            identity = headers.get(self.trusted_header)
+            if not identity:
+                return self._deny(401, "Authentication required.")
+            if identity != user_id:
+                return self._deny(403, f"Not allowed to access user '{user_id}'.")
+            return None
+        scheme, _, token = headers.get('Authorization', '').partition(' ')
+        if scheme.lower() != 'bearer' or not token.strip():
+            return self._deny(401, "Authentication required.")
+        expected = self.tokens.get(user_id)
+        digest = hashlib.sha256(token.strip().encode('utf-8')).hexdigest()
+        if expected is None or not hmac.compare_digest(digest, expected):
+            return self._deny(403, f"Not allowed to access user '{user_id}'.")
+        return None
+
+    def _deny(self, status, message):
+        self.denied += 1
+        return status, message
+
+
+class PortfolioBook:
+    """One user's worksheets, mirrors and valuation."""
+
+    def __init__(self, key, connection, make_mirror, prefix='', mirror_prefix='', log_size=256):
+        self.key = key
+        self.connection = connection
+        self.prefix = prefix
+        # Sheets errors go to the connection, which reopens stale handles.
+        self.portfolio = make_mirror(self.source("Portfolio"), mirror_prefix + "Portfolio", self.on_error("Portfolio"))
+        self.watchlist = make_mirror(self.source("Watchlist"), mirror_prefix + "Watchlist", self.on_error("Watchlist"))
+        self.realized_gains = make_mirror(self.source("Realized Gains"), mirror_prefix + "Realized Gains",
+                                          self.on_error("Realized Gains"))
+        self.valuation = IncrementalValuation(log_size=log_size)
+
+    @property
+    def mirrors(self):
+        return [self.portfolio, self.watchlist, self.realized_gains]
+
+    def worksheet(self, title):
+        """The user's worksheet called `title`, or None while it is unavailable."""
+        return self.connection.worksheet(self.prefix + title)
+
+    def source(self, title):
+        return lambda: self.worksheet(title)
+
+    def on_error(self, title):
+        return partial(self.connection.handle_error, worksheet=self.prefix + title)
+
+
+class PortfolioBooks:
+    """
+    LRU of PortfolioBooks for the users in `users` (see load_user_map).
+
+    Books are built on first use by make_book(user_id, connection, prefix). Users
+    on the same spreadsheet share one SheetsConnection, opened with a pooled
+    client through open_spreadsheet(spreadsheet_id); users without a spreadsheet
+    of their own use `default_connection`. Once more than `max_books` are cached,
+    the least recently used book is dropped, unless busy(book) says it still has
+    unsaved writes. on_evict(book) is called for every dropped book.
+    """
+
+    def __init__(self, users, open_spreadsheet, make_book, default_connection,
+                 max_books=100, wait=10.0, busy=None, on_evict=None):
+        self.users = users
+        self.open_spreadsheet = open_spreadsheet
+        self.make_book = make_book
+        self.default_connection = default_connection
+        self.max_books = max_books
+        self.wait = wait
+        self.busy = busy
+        self.on_evict = on_evict
+        self._lock = threading.Lock()
+        self._books = OrderedDict()
+        self._connections = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, user_id):
+        """The user's book, or None for an unknown user."""
+        with self._lock:
+            book = self._books.get(user_id)
+            if book is not None:
+                self._books.move_to_end(user_id)
+                self.hits += 1
+                return book
+            entry = self.users.get(user_id)
+            if entry is None:
+                return None
+            spreadsheet_id, prefix = entry
+            book = self.make_book(user_id, self._connection_locked(spreadsheet_id), prefix)
+            self._books[user_id] = book
+            self.misses += 1
+            evicted = self._evict_locked()
+        if self.on_evict is not None:
+            for old in evicted:
+                self.on_evict(old)
+        return book
+
+    def _connection_locked(self, spreadsheet_id):
+        if spreadsheet_id is None:
+            return self.default_connection
+        connection = self._connections.get(spreadsheet_id)
+        if connection is None:
+            connection = self._connections[spreadsheet_id] = SheetsConnection(
+                connect=lambda: self.open_spreadsheet(spreadsheet_id), wait=self.wait)
+        return connection
+
+    def _evict_locked(self):
+        evicted = []
+        for user_id in list(self._books):
+            if len(self._books) <= self.max_books:
+                break
+            book = self._books[user_id]
+            if self.busy is not None and self.busy(book):
+                continue
+            del self._books[user_id]
+            evicted.append(book)
+        if evicted:
+            self.evictions += len(evicted)
+            in_use = {id(book.connection) for book in self._books.values()}
+            for spreadsheet_id, connection in list(self._connections.items()):
+                if id(connection) not in in_use:
+                    del self._connections[spreadsheet_id]
+        return evicted
+
+    def stats(self):
+        with self._lock:
+            return {
+                "users": len(self.users),
+                "cached": len(self._books),
+                "max_books": self.max_books,
+                "connections": len(self._connections),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
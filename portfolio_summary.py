@@ -0,0 +1,413 @@
+# portfolio_summary.py
+
+import math
+import threading
+from collections import deque
+
+import numpy as np
+
+from price_stream import changed_symbols
+from price_table import parse_number
+
+# Price table columns that show up in a lot row; a change to any of them changes the row.
+ROW_PRICE_FIELDS = ('LTP', '52 Weeks High', '52 Weeks Low')
+
+
+class Holdings:
+    """
+    Portfolio sheet records turned into arrays, one entry per lot (sheet row).
+
+    Rows without a scrip or quantity stay in the arrays (they still count towards
+    the total purchase value, as before) but are excluded from lot output via `listed`.
+    """
+
+    def __init__(self, records):
+        self.records = records
+        self.symbols = [str(r.get('scrip') or '') for r in records]
+        self.sectors = [r.get('sector', 'N/A') for r in records]
+        # The sheet's own values, echoed back unchanged in the lot rows.
+        self.raw_quantity = [r.get('quantity', 0) for r in records]
+        self.raw_purchase_price = [r.get('purchasePrice', 0) for r in records]
+        self.quantity = np.array([_number(q) for q in self.raw_quantity], dtype=np.float64)
+        self.purchase_price = np.array([_number(p) for p in self.raw_purchase_price], dtype=np.float64)
+        self.listed = np.array([bool(r.get('scrip')) and bool(q) for r, q in zip(records, self.raw_quantity)],
+                               dtype=bool)
+        # Lots whose quantity and price are both ints: int * int stays an int in the JSON.
+        self.whole = np.array([type(q) is int and type(p) is int
+                               for q, p in zip(self.raw_quantity, self.raw_purchase_price)], dtype=bool)
+
+    def __len__(self):
+        return len(self.records)
+
+
+def _number(value):
+    if type(value) in (int, float):
+        return float(value)
+    number = parse_number(value)
+    return 0.0 if math.isnan(number) else number
+
+
+def _lot_tuples(records):
+    """Sheet records as a tuple of tuples, for comparing two loads of the sheet by content."""
+    return tuple(tuple(r.items()) for r in records)
+
+
+def _factorize(keys):
+    """Maps each key to a dense group id. Returns (unique keys in first-seen order, id array)."""
+    ids = {}
+    codes = np.fromiter((ids.setdefault(k, len(ids)) for k in keys), dtype=np.intp, count=len(keys))
+    return list(ids), codes
+
+
+def _round2(values):
+    """round(v, 2) for a whole float array, matching Python's correctly rounded round() bit for bit."""
+    rounded = np.round(values, 2)
+    # np.round scales by 100 first; that product is off by at most an ulp, which only
+    # matters for values within an ulp or two of a half cent. Those are redone with Python's round().
+    scaled = values * 100
+    with np.errstate(invalid='ignore'):
+        suspect = np.abs(scaled - np.floor(scaled) - 0.5) <= 4 * np.spacing(np.abs(scaled))
+    for i in np.flatnonzero(suspect).tolist():
+        rounded[i] = round(float(values[i]), 2)
+    return rounded
+
+
+def _percent_strings(values):
+    return [f"{v}%" for v in _round2(values).tolist()]
+
+
+def _pct(numerator, denominator):
+    # (a / b) * 100 in that order, as the per-row code always did, so results match to the last bit.
+    return np.divide(numerator, denominator, out=np.zeros_like(numerator), where=denominator != 0) * 100
+
+
+class PortfolioValuation:
+    """
+    Values every lot against a PriceTable in a handful of array operations.
+
+    Lots are joined to prices through the table's symbol index, so the cost is
+    one dict lookup per lot plus vector maths, with no per-lot string parsing.
+    """
+
+    def __init__(self, holdings, price_table):
+        self.holdings = holdings
+        self.price_table = price_table
+        self.positions = price_table.positions(holdings.symbols)
+        self._lots_by_symbol = None
+
+        q, pp = holdings.quantity, holdings.purchase_price
+        self.purchase_value = pp * q
+        self.ltp = np.zeros(len(holdings), dtype=np.float64)
+        self.current_value = np.zeros(len(holdings), dtype=np.float64)
+        self.profit = np.zeros(len(holdings), dtype=np.float64)
+        self.priced = np.zeros(len(holdings), dtype=bool)
+        self.profit_pct = np.zeros(len(holdings), dtype=np.float64)
+        self._value(slice(None))
+
+        # A plain left-to-right sum, not NumPy's pairwise one, so weights round like they always did.
+        total = sum(self.purchase_value.tolist())
+        self.total_purchase_value = total if total != 0 else 1
+        self.weight = (self.purchase_value / self.total_purchase_value) * 100
+
+    def _value(self, lots):
+        """(Re)computes the price-dependent arrays for `lots` (a slice or index array)."""
+        positions = self.positions[lots]
+        quoted = positions >= 0
+        ltp = np.zeros(len(positions), dtype=np.float64)
+        ltp[quoted] = self.price_table.column('LTP')[positions[quoted]]
+        ltp[np.isnan(ltp)] = 0.0
+
+        q, pp = self.holdings.quantity[lots], self.holdings.purchase_price[lots]
+        purchase = self.purchase_value[lots]
+        current = np.where(ltp > 0, ltp * q, 0.0)
+        profit = current - purchase
+        priced = (pp > 0) & (ltp > 0)
+        self.ltp[lots] = ltp
+        self.current_value[lots] = current
+        self.profit[lots] = profit
+        self.priced[lots] = priced
+        self.profit_pct[lots] = np.where(priced, _pct(profit, purchase), 0.0)
+
+    def reprice(self, price_table, symbols):
+        """
+        Moves the valuation to `price_table`, re-valuing only the lots of `symbols`
+        (the symbols whose LTP changed). Returns the indices of the re-valued lots.
+        """
+        previous = self.price_table
+        self.price_table = price_table
+        if previous.symbols != price_table.symbols:
+            # Row positions moved; refresh them (cheap dict lookups) for every lot.
+            self.positions = price_table.positions(self.holdings.symbols)
+        lots = self.lots_of(symbols)
+        if lots:
+            self._value(np.array(lots, dtype=np.intp))
+        return lots
+
+    # --- Per lot ---
+
+    def lots_of(self, symbols):
+        """Ascending indices of the lots holding any of `symbols`."""
+        if self._lots_by_symbol is None:
+            self._lots_by_symbol = {}
+            for i, symbol in enumerate(self.holdings.symbols):
+                self._lots_by_symbol.setdefault(symbol, []).append(i)
+        return sorted(i for symbol in symbols for i in self._lots_by_symbol.get(symbol, ()))
+
+    def lot_rows(self, lots=None):
+        """One row per listed lot (or per listed lot in `lots`), in the /summary response shape."""
+        h = self.holdings
+        if lots is None:
+            lots = np.flatnonzero(h.listed)
+        else:
+            lots = np.asarray(lots, dtype=np.intp)
+            lots = lots[h.listed[lots]]
+        if not len(lots):
+            return []
+        ltp = self.ltp[lots]
+        quoted = ltp > 0
+        whole = h.whole[lots]
+
+        # Each output column is rounded and converted to Python numbers in one go.
+        current = _round2(self.current_value[lots]).tolist()
+        profit = _round2(self.profit[lots]).tolist()
+        purchase = _round2(self.purchase_value[lots]).tolist()
+        profit_pct = _percent_strings(self.profit_pct[lots])
+        weight = _percent_strings(self.weight[lots])
+        # Where the per-row code produced ints, so do we: an unpriced lot's current value
+        # (0) and "0%", and a whole lot's purchase value and, when unpriced, its profit.
+        for k in np.flatnonzero(~quoted).tolist():
+            current[k] = 0
+        for k in np.flatnonzero(~self.priced[lots]).tolist():
+            profit_pct[k] = "0%"
+        if whole.any():
+            purchase_int = self.purchase_value[lots]
+            profit_int = self.profit[lots]
+            for k in np.flatnonzero(whole).tolist():
+                purchase[k] = int(purchase_int[k])
+                if not quoted[k]:
+                    profit[k] = int(profit_int[k])
+
+        # Formatted once per quoted symbol rather than once per lot.
+        table = self.price_table
+        positions = self.positions[lots].tolist()
+        week_high_low_of = {pos: f"{table.raw(pos, '52 Weeks High')} / {table.raw(pos, '52 Weeks Low')}"
+                            for pos in set(positions) if pos >= 0}
+        week_high_low = [week_high_low_of.get(pos, "N/A") for pos in positions]
+
+        symbols, sectors = h.symbols, h.sectors
+        quantity, purchase_price = h.raw_quantity, h.raw_purchase_price
+        return [{
+            "Script": symbols[i], "Sector": sectors[i], "quantity": quantity[i],
+            "purchase price": purchase_price[i], "LTP": lot_ltp,
+            "Current Value": lot_current,
+            "52 week high/low": lot_range,
+            "Profit amount": lot_profit,
+            "profit percentage": lot_pct,
+            "Purchase value": lot_purchase,
+            "Weight%": lot_weight,
+        } for i, lot_ltp, lot_current, lot_range, lot_profit, lot_pct, lot_purchase, lot_weight
+            in zip(lots.tolist(), ltp.tolist(), current, week_high_low, profit, profit_pct, purchase, weight)]
+
+    # --- Aggregates ---
+
+    def _group(self, keys):
+        listed = self.holdings.listed
+        names, codes = _factorize([k for k, keep in zip(keys, listed.tolist()) if keep])
+        n = len(names)
+        sums = {
+            "quantity": np.bincount(codes, weights=self.holdings.quantity[listed], minlength=n),
+            "purchase": np.bincount(codes, weights=self.purchase_value[listed], minlength=n),
+            "current": np.bincount(codes, weights=self.current_value[listed], minlength=n),
+            "lots": np.bincount(codes, minlength=n),
+        }
+        sums["profit"] = sums["current"] - sums["purchase"]
+        return names, sums
+
+    def by_scrip(self):
+        """Lots of the same scrip merged: total quantity, average cost, value and P&L."""
+        names, s = self._group(self.holdings.symbols)
+        avg_cost = np.divide(s["purchase"], s["quantity"], out=np.zeros_like(s["purchase"]), where=s["quantity"] != 0)
+        pct = _pct(s["profit"], s["purchase"])
+        weight = (s["purchase"] / self.total_purchase_value) * 100
+        sector_of = {}
+        for symbol, sector, keep in zip(self.holdings.symbols, self.holdings.sectors, self.holdings.listed.tolist()):
+            if keep:
+                sector_of.setdefault(symbol, sector)
+        ltp = {symbol: self.price_table.value(symbol, 'LTP') for symbol in names}
+        return [{
+            "Script": name, "Sector": sector_of[name], "Lots": int(s["lots"][i]),
+            "quantity": float(s["quantity"][i]), "Average cost": round(float(avg_cost[i]), 2),
+            "LTP": 0.0 if math.isnan(ltp[name]) else ltp[name],
+            "Purchase value": round(float(s["purchase"][i]), 2),
+            "Current Value": round(float(s["current"][i]), 2),
+            "Profit amount": round(float(s["profit"][i]), 2),
+            "profit percentage": f"{round(float(pct[i]), 2)}%",
+            "Weight%": f"{round(float(weight[i]), 2)}%",
+        } for i, name in enumerate(names)]
+
+    def by_sector(self):
+        """Value and P&L per sector."""
+        names, s = self._group(self.holdings.sectors)
+        pct = _pct(s["profit"], s["purchase"])
+        weight = (s["purchase"] / self.total_purchase_value) * 100
+        return [{
+            "Sector": name, "Lots": int(s["lots"][i]),
+            "Purchase value": round(float(s["purchase"][i]), 2),
+            "Current Value": round(float(s["current"][i]), 2),
+            "Profit amount": round(float(s["profit"][i]), 2),
+            "profit percentage": f"{round(float(pct[i]), 2)}%",
+            "Weight%": f"{round(float(weight[i]), 2)}%",
+        } for i, name in enumerate(names)]
+
+    def totals(self):
+        """Whole-portfolio totals over listed lots."""
+        listed = self.holdings.listed
+        purchase = float(self.purchase_value[listed].sum())
+        current = float(self.current_value[listed].sum())
+        profit = current - purchase
+        return {
+            "Lots": int(listed.sum()),
+            "Scrips": len({s for s, keep in zip(self.holdings.symbols, listed.tolist()) if keep}),
+            "Purchase value": round(purchase, 2),
+            "Current Value": round(current, 2),
+            "Profit amount": round(profit, 2),
+            "profit percentage": f"{round(profit / purchase * 100 if purchase else 0, 2)}%",
+        }
+
+
+class IncrementalValuation:
+    """
+    Keeps a PortfolioValuation alive between requests and moves it forward.
+
+    When only prices change, just the lots whose LTP moved are re-valued, and the
+    portfolio and per-sector current-value totals are adjusted by those lots' deltas.
+    Each change bumps a version; a bounded log of which lots changed in which
+    version lets clients fetch only the rows that changed since the version they hold.
+    A change to the holdings themselves starts a new generation with a full rebuild;
+    holdings are compared by content, so a reload of an unchanged sheet keeps the
+    generation (and clients' tokens).
+    """
+
+    def __init__(self, log_size=256):
+        self._lock = threading.Lock()
+        self._records = None
+        self._lots = None
+        self.valuation = None
+        self.generation = 0
+        self.version = 0
+        self._log = deque(maxlen=log_size)
+        self._current_total = 0.0
+        self._sector_current = {}
+        self._sector_purchase = {}
+
+    @property
+    def token(self):
+        return f"{self.generation}.{self.version}"
+
+    def update(self, records, price_table):
+        """Brings the valuation up to date with these holdings and prices. Returns the version token."""
+        with self._lock:
+            if records is not self._records:
+                lots = _lot_tuples(records)
+                if self.valuation is None or lots != self._lots:
+                    self._rebuild(records, lots, price_table)
+                self._records = records
+            if price_table is not self.valuation.price_table:
+                self._reprice(price_table)
+            return self.token
+
+    def rows(self):
+        with self._lock:
+            return self.valuation.lot_rows()
+
+    def delta(self, since):
+        """
+        Rows changed since version token `since`. Returns (token, full, rows): `full` is
+        True when the change log cannot answer (unknown/old token or new generation),
+        in which case every row is returned.
+        """
+        with self._lock:
+            try:
+                generation, version = (int(part) for part in str(since).split('.'))
+            except ValueError:
+                generation, version = None, None
+            oldest = self._log[0][0] if self._log else self.version + 1
+            if generation != self.generation or version is None or version > self.version \
+                    or (version < self.version and version + 1 < oldest):
+                return self.token, True, self.valuation.lot_rows()
+            lots = sorted({lot for v, changed in self._log if v > version for lot in changed})
+            return self.token, False, self.valuation.lot_rows(lots)
+
+    def totals(self):
+        """
+        Portfolio totals and per-sector values, from the running sums. Sector weights
+        are shares of purchase value, the same basis as the lot rows' Weight% and
+        PortfolioValuation.by_sector, so they only move when the holdings do.
+        """
+        with self._lock:
+            valuation = self.valuation
+            listed = valuation.holdings.listed
+            purchase = float(valuation.purchase_value[listed].sum())
+            current = self._current_total
+            profit = current - purchase
+            sectors = [{
+                "Sector": sector, "Purchase value": round(self._sector_purchase[sector], 2),
+                "Current Value": round(value, 2),
+                "Weight%": f"{round(self._sector_purchase[sector] / valuation.total_purchase_value * 100, 2)}%",
+            } for sector, value in self._sector_current.items()]
+            return {
+                "Purchase value": round(purchase, 2),
+                "Current Value": round(current, 2),
+                "Profit amount": round(profit, 2),
+                "profit percentage": f"{round(profit / purchase * 100 if purchase else 0, 2)}%",
+                "sectors": sectors,
+            }
+
+    def _rebuild(self, records, lots, price_table):
+        self._lots = lots
+        self.valuation = PortfolioValuation(Holdings(records), price_table)
+        self.generation += 1
+        self.version = 0
+        self._log.clear()
+        listed = self.valuation.holdings.listed
+        self._current_total = float(self.valuation.current_value[listed].sum())
+        self._sector_current = {}
+        self._sector_purchase = {}
+        for sector, value, cost, keep in zip(self.valuation.holdings.sectors, self.valuation.current_value.tolist(),
+                                             self.valuation.purchase_value.tolist(), listed.tolist()):
+            if keep:
+                self._sector_current[sector] = self._sector_current.get(sector, 0.0) + value
+                self._sector_purchase[sector] = self._sector_purchase.get(sector, 0.0) + cost
+
+    def _reprice(self, price_table):
+        valuation = self.valuation
+        held = set(valuation.holdings.symbols)
+        previous = valuation.price_table
+        fields = [name for name in ROW_PRICE_FIELDS if name in price_table.header]
+        if fields != [name for name in ROW_PRICE_FIELDS if name in previous.header]:
+            # A row column appeared or went away; every held symbol's row changes.
+            symbols = [s for s in dict.fromkeys(valuation.holdings.symbols) if s]
+        else:
+            symbols = [s for s in changed_symbols(previous, price_table, fields=fields) if s in held]
+        if previous.symbols != price_table.symbols:
+            # changed_symbols() only sees the new table; a held symbol that dropped out
+            # of it (delisted, suspended) is now unpriced and must be re-valued too.
+            symbols += [s for s in dict.fromkeys(valuation.holdings.symbols)
+                        if s in previous.index and s not in price_table.index]
+        if not symbols:
+            # Same prices for everything we hold; just point at the new table.
+            valuation.reprice(price_table, ())
+            return
+        lots = valuation.lots_of(symbols)
+        before = valuation.current_value[lots].tolist()
+        valuation.reprice(price_table, symbols)
+        after = valuation.current_value[lots].tolist()
+        listed = valuation.holdings.listed[lots].tolist()
+        deltas = [new - old for new, old in zip(after, before)]
+        sectors = valuation.holdings.sectors
+        for i, delta, keep in zip(lots, deltas, listed):
+            if keep and delta:
+                self._current_total += delta
+                self._sector_current[sectors[i]] = self._sector_current.get(sectors[i], 0.0) + delta
+        self.version += 1
+        self._log.append((self.version, lots))
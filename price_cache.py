@@ -0,0 +1,210 @@
+# price_cache.py
+
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+# NEPSE trades Sunday to Thursday, 11:00-15:00 Nepal time (UTC+05:45).
+NEPAL_TZ = timezone(timedelta(hours=5, minutes=45))
+MARKET_OPEN_HOUR = 11
+MARKET_CLOSE_HOUR = 15
+TRADING_WEEKDAYS = {6, 0, 1, 2, 3}  # Sun, Mon, Tue, Wed, Thu
+
+
+def is_market_open(now=None):
+    """Returns True if `now` (default: current time) falls inside NEPSE trading hours."""
+    now = (now or datetime.now(timezone.utc)).astimezone(NEPAL_TZ)
+    if now.weekday() not in TRADING_WEEKDAYS:
+        return False
+    return MARKET_OPEN_HOUR <= now.hour < MARKET_CLOSE_HOUR
+
+
+def last_session_date(now=None):
+    """
+    Nepal date of the latest trading session that has closed by `now`, or None
+    while a session is in progress. Before the open, and on Fridays and Saturdays,
+    that is the previous trading day: what the share price page still shows.
+    """
+    now = (now or datetime.now(timezone.utc)).astimezone(NEPAL_TZ)
+    if is_market_open(now):
+        return None
+    day = now.date()
+    if now.weekday() not in TRADING_WEEKDAYS or now.hour < MARKET_OPEN_HOUR:
+        day -= timedelta(days=1)
+        while day.weekday() not in TRADING_WEEKDAYS:
+            day -= timedelta(days=1)
+    return day
+
+
+class _Flight:
+    """A single in-progress load that concurrent callers can wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.error = None
+
+
+class PriceCache:
+    """
+    Shared in-process cache around an expensive loader such as scrape_share_prices().
+
+    - A value younger than `ttl` seconds is served as-is (hit).
+    - A value older than `ttl` but younger than `stale_ttl` is served immediately
+      while one background refresh runs (stale-while-revalidate).
+    - Anything older, or no value at all, is a miss: the caller loads it, and any
+      concurrent callers wait on that same load instead of starting their own.
+    """
+
+    def __init__(self, loader, ttl=30, stale_ttl=300, name="prices"):
+        self._loader = loader
+        self.ttl = ttl
+        self.stale_ttl = max(stale_ttl, ttl)
+        self.name = name
+        self._lock = threading.Lock()
+        self._value = None
+        self._loaded_at = None      # time.monotonic() of the last successful load
+        self._loaded_wall = None    # wall-clock time of the same, for reporting
+        self._flight = None
+        self._refresher = None
+        self._refresher_stop = threading.Event()
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.loads = 0
+        self.errors = 0
+
+    # --- Reads ---
+
+    def get(self):
+        """Returns the cached value, loading or revalidating it as needed."""
+        with self._lock:
+            age = self._age_locked()
+            if age is not None and age < self.ttl:
+                self.hits += 1
+                return self._value
+            if age is not None and age < self.stale_ttl:
+                self.stale_hits += 1
+                if self._flight is None:
+                    flight = self._flight = _Flight()
+                    threading.Thread(target=self._load, args=(flight,), daemon=True,
+                                     name=f"{self.name}-revalidate").start()
+                return self._value
+            self.misses += 1
+            flight, leader = self._join_flight_locked()
+
+        if leader:
+            self._load(flight)
+        else:
+            flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        with self._lock:
+            return self._value
+
+    def refresh(self):
+        """Forces a load now (sharing any load already in flight) and returns the new value."""
+        with self._lock:
+            flight, leader = self._join_flight_locked()
+        if leader:
+            self._load(flight)
+        else:
+            flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        with self._lock:
+            return self._value
+
+    def invalidate(self):
+        """Drops the cached value so the next get() is a miss."""
+        with self._lock:
+            self._value = None
+            self._loaded_at = None
+            self._loaded_wall = None
+
+    @property
+    def age(self):
+        """Seconds since the last successful load, or None if nothing is cached."""
+        with self._lock:
+            return self._age_locked()
+
+    def stats(self):
+        """Counters and freshness info, suitable for /health."""
+        with self._lock:
+            age = self._age_locked()
+            return {
+                "name": self.name,
+                "version": self.version,
+                "age_seconds": round(age, 3) if age is not None else None,
+                "loaded_at": self._loaded_wall.isoformat() if self._loaded_wall else None,
+                "ttl": self.ttl,
+                "stale_ttl": self.stale_ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale_hits": self.stale_hits,
+                "loads": self.loads,
+                "errors": self.errors,
+                "loading": self._flight is not None,
+                "refresher_running": self._refresher is not None and self._refresher.is_alive(),
+            }
+
+    # --- Background refresher ---
+
+    def start_refresher(self, interval, market_hours_only=True):
+        """
+        Starts a daemon thread that reloads the cache every `interval` seconds,
+        by default only while the market is open. Calling it again is a no-op.
+        """
+        if self._refresher is not None and self._refresher.is_alive():
+            return
+        self._refresher_stop.clear()
+        self._refresher = threading.Thread(
+            target=self._refresh_loop, args=(interval, market_hours_only),
+            daemon=True, name=f"{self.name}-refresher")
+        self._refresher.start()
+        logging.info(f"Started {self.name} cache refresher (every {interval}s, market hours only: {market_hours_only}).")
+
+    def stop_refresher(self):
+        self._refresher_stop.set()
+
+    def _refresh_loop(self, interval, market_hours_only):
+        while not self._refresher_stop.is_set():
+            if not market_hours_only or is_market_open():
+                try:
+                    self.refresh()
+                except Exception as e:
+                    logging.warning(f"Background refresh of {self.name} cache failed: {e}")
+            self._refresher_stop.wait(interval)
+
+    # --- Internals ---
+
+    def _age_locked(self):
+        if self._loaded_at is None:
+            return None
+        return time.monotonic() - self._loaded_at
+
+    def _join_flight_locked(self):
+        if self._flight is not None:
+            return self._flight, False
+        self._flight = _Flight()
+        return self._flight, True
+
+    def _load(self, flight):
+        try:
+            value = self._loader()
+            with self._lock:
+                self._value = value
+                self._loaded_at = time.monotonic()
+                self._loaded_wall = datetime.now(timezone.utc)
+                self.version += 1
+                self.loads += 1
+        except Exception as e:
+            flight.error = e
+            with self._lock:
+                self.errors += 1
+            logging.error(f"Failed to load {self.name} cache: {e}")
+        finally:
+            with self._lock:
+                self._flight = None
+            flight.done.set()
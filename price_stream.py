@@ -0,0 +1,174 @@
+# price_stream.py
+
+import json
+import logging
+import math
+import queue
+import threading
+import time
+
+import numpy as np
+
+STREAM_FIELDS = ('LTP', 'Vol', 'Turnover')
+
+
+def changed_symbols(previous, current, fields=STREAM_FIELDS):
+    """
+    Symbols of `current` whose `fields` differ from `previous` (both PriceTables),
+    computed column-wise. Symbols missing from `previous` count as changed.
+    """
+    if previous is None:
+        return list(current.symbols)
+    if previous.symbols == current.symbols:
+        positions = np.arange(len(current), dtype=np.intp)
+    else:
+        positions = previous.positions(current.symbols)
+    listed = positions >= 0
+    changed = ~listed
+    for name in fields:
+        now = current.column(name)
+        before = np.full(len(current), np.nan)
+        before[listed] = previous.column(name)[positions[listed]]
+        # NaN -> NaN is not a change.
+        changed |= (now != before) & ~(np.isnan(now) & np.isnan(before))
+    return [current.symbols[i] for i in np.flatnonzero(changed).tolist()]
+
+
+def price_fields(table, symbols, fields=STREAM_FIELDS):
+    """{symbol: {field: value}} for the given symbols, with NaN as None."""
+    out = {}
+    for symbol in symbols:
+        out[symbol] = {name: _json_number(table.value(symbol, name)) for name in fields}
+    return out
+
+
+def _json_number(value):
+    return None if math.isnan(value) else value
+
+
+def format_sse(event, data):
+    """One Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+class Subscriber:
+    """One connected client: a bounded event queue plus an optional symbol filter."""
+
+    def __init__(self, symbols=None, max_queue=100):
+        self.symbols = set(symbols) if symbols else None
+        self.queue = queue.Queue(maxsize=max_queue)
+
+    def wants(self, symbol):
+        return self.symbols is None or symbol in self.symbols
+
+    def offer(self, event):
+        """Queues an event. A client that has fallen behind is told to resync instead."""
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            while True:
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    break
+            self.queue.put_nowait(('resync', None))
+
+
+class PriceStreamHub:
+    """
+    Fans price changes out to any number of stream subscribers.
+
+    A single poller thread reads the shared price cache every `interval` seconds,
+    diffs the new PriceTable against the previous one and pushes only the changed
+    symbols to subscribers. Upstream load is therefore the same for one client as
+    for a thousand. The poller runs only while someone is subscribed.
+    """
+
+    def __init__(self, price_cache, interval=5.0, fields=STREAM_FIELDS):
+        self.price_cache = price_cache
+        self.interval = interval
+        self.fields = fields
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._poller = None
+        self._stop = threading.Event()
+        self._poll_lock = threading.Lock()
+        self._table = None
+        self._polled_at = 0.0
+        self.version = 0
+        self.polls = 0
+        self.events = 0
+
+    def subscribe(self, symbols=None):
+        subscriber = Subscriber(symbols)
+        with self._lock:
+            self._subscribers.add(subscriber)
+            self._stop.clear()
+            # The poller clears _poller under this lock as it exits, so it is either
+            # still going to see this subscriber or already gone and restarted here.
+            if self._poller is None:
+                self._poller = threading.Thread(target=self._poll_loop, daemon=True, name="price-stream")
+                self._poller.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+            if not self._subscribers:
+                self._stop.set()
+
+    def snapshot(self, subscriber):
+        """
+        Current values for everything the subscriber follows. A table older than one
+        poll interval (the hub sat idle with no poller) is polled again first, so a
+        new client never starts from hours-old prices.
+        """
+        with self._poll_lock:
+            if self._table is None or time.monotonic() - self._polled_at > self.interval:
+                # Also becomes the poller's baseline, so changes after this snapshot are not missed.
+                self._poll()
+            table, version = self._table, self.version
+        symbols = [s for s in table.symbols if subscriber.wants(s)]
+        return {"version": version, "prices": price_fields(table, symbols, self.fields)}
+
+    def stats(self):
+        with self._lock:
+            return {"subscribers": len(self._subscribers), "version": self.version,
+                    "polls": self.polls, "events": self.events, "interval": self.interval}
+
+    def _poll_loop(self):
+        while True:
+            with self._lock:
+                if not self._subscribers:
+                    self._poller = None
+                    return
+            try:
+                with self._poll_lock:
+                    self._poll()
+            except Exception as e:
+                logging.warning(f"Price stream poll failed: {e}")
+            self._stop.wait(self.interval)
+
+    def _poll(self):
+        """Takes the latest table and pushes what changed since the last one. Caller holds _poll_lock."""
+        table = self.price_cache.get()
+        self._polled_at = time.monotonic()
+        self.polls += 1
+        if table is self._table:
+            return
+        previous, self._table = self._table, table
+        if previous is None:
+            return
+        symbols = changed_symbols(previous, table, self.fields)
+        if not symbols:
+            return
+        self.version += 1
+        changes = price_fields(table, symbols, self.fields)
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            mine = changes if subscriber.symbols is None else \
+                {s: v for s, v in changes.items() if s in subscriber.symbols}
+            if mine:
+                subscriber.offer(('update', {"version": self.version, "prices": mine}))
+                self.events += 1
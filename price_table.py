@@ -0,0 +1,119 @@
+# price_table.py
+
+import math
+import sys
+
+import numpy as np
+
+# Columns of the today-share-price table that hold numbers ("1,234.50", "-12.3", ...).
+NUMERIC_COLUMNS = (
+    'Conf.', 'Open', 'High', 'Low', 'Close', 'LTP', 'Close - LTP', 'Close - LTP %',
+    'VWAP', 'Vol', 'Prev. Close', 'Turnover', 'Trans.', 'Diff', 'Range', 'Diff %',
+    'Range %', 'VWAP %', '120 Days', '180 Days', '52 Weeks High', '52 Weeks Low',
+)
+
+
+def parse_number(text):
+    """Parses a scraped cell like '1,234.50' or '-3.2%' into a float. Blank/'-'/'N/A' become NaN."""
+    if text is None:
+        return math.nan
+    if isinstance(text, (int, float)):
+        return float(text)
+    try:
+        return float(text.replace(',', '').rstrip('%'))
+    except ValueError:
+        return math.nan
+
+
+class PriceTable:
+    """
+    Typed, columnar view of one scrape of the today-share-price table.
+
+    Numbers are parsed once into float64 NumPy columns (NaN where the cell is
+    blank or not numeric), symbols are interned and indexed for O(1) lookup, and
+    the raw strings are kept so the original JSON shape can be rebuilt lazily
+    with to_records().
+    """
+
+    __slots__ = ('header', 'symbols', 'index', '_raw', '_columns', '_column_pos', '_records')
+
+    def __init__(self, header, raw_rows):
+        self.header = tuple(header)
+        self._raw = [tuple(row) for row in raw_rows]
+        symbol_pos = self.header.index('Symbol') if 'Symbol' in self.header else None
+        self.symbols = [sys.intern(row[symbol_pos]) if symbol_pos is not None and symbol_pos < len(row) else ''
+                        for row in self._raw]
+        self.index = {}
+        for pos, symbol in enumerate(self.symbols):
+            self.index.setdefault(symbol, pos)
+
+        numeric = [name for name in NUMERIC_COLUMNS if name in self.header]
+        self._column_pos = {name: i for i, name in enumerate(numeric)}
+        self._columns = np.full((len(numeric), len(self._raw)), np.nan, dtype=np.float64)
+        for i, name in enumerate(numeric):
+            col = self.header.index(name)
+            self._columns[i] = [parse_number(row[col]) if col < len(row) else math.nan for row in self._raw]
+        self._columns.setflags(write=False)
+        self._records = None
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Builds a table from the scraper's list of row dicts."""
+        header = list(rows[0].keys()) if rows else []
+        # Short rows (fewer cells than header) only ever miss trailing keys, so
+        # keeping the present prefix lets to_records() reproduce them exactly.
+        return cls(header, ([row[h] for h in header if h in row] for row in rows))
+
+    # --- Lookup ---
+
+    def __len__(self):
+        return len(self._raw)
+
+    def __contains__(self, symbol):
+        return symbol in self.index
+
+    def column(self, name):
+        """Read-only float64 array for a numeric column."""
+        return self._columns[self._column_pos[name]]
+
+    def positions(self, symbols):
+        """Row positions for `symbols` as an int array, -1 where a symbol is not listed."""
+        get = self.index.get
+        return np.fromiter((get(s, -1) for s in symbols), dtype=np.intp, count=len(symbols))
+
+    def value(self, symbol, column):
+        """Parsed number for one cell, or NaN if the symbol is not listed."""
+        pos = self.index.get(symbol)
+        if pos is None:
+            return math.nan
+        return float(self._columns[self._column_pos[column], pos])
+
+    def raw(self, pos, column, default='N/A'):
+        """Original string for one cell by row position."""
+        row = self._raw[pos]
+        col = self.header.index(column) if column in self.header else len(row)
+        return row[col] if col < len(row) else default
+
+    def record(self, symbol):
+        """Row for `symbol` in the original dict shape, or None."""
+        pos = self.index.get(symbol)
+        if pos is None:
+            return None
+        return dict(zip(self.header, self._raw[pos]))
+
+    # --- Serialization ---
+
+    def to_records(self):
+        """Rows in the scraper's original list-of-dicts shape. Built once, then reused."""
+        if self._records is None:
+            header = self.header
+            self._records = [dict(zip(header, row)) for row in self._raw]
+        return self._records
+
+    def to_columnar(self):
+        """Compact shape: the header once plus one array per row (short rows padded with None)."""
+        width = len(self.header)
+        return {
+            "columns": list(self.header),
+            "rows": [list(row) + [None] * (width - len(row)) for row in self._raw],
+        }
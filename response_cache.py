@@ -0,0 +1,127 @@
+# response_cache.py
+
+"""
+Serialized JSON responses, cached per data version.
+
+Routes that return a large list straight from a cached object (the PriceTable,
+a sheet mirror's records) hand that object to ResponseCache.respond() together
+with a function that builds the payload. The payload is serialized once per
+object: as long as the route keeps getting the very same object back, the
+stored bytes are reused. The ETag is a hash of those bytes, so a matching
+If-None-Match gets a 304 even across rebuilds and restarts. Large bodies are
+gzipped once, on the first request that accepts gzip. The gzip and identity
+bodies share one weak ETag (W/"..."): they are the same representation, not the
+same bytes. Responses carry Vary: Accept-Encoding for caches in between.
+
+orjson is used for serialization when installed, json otherwise.
+"""
+
+import gzip
+import hashlib
+import json
+import threading
+
+from flask import Response, current_app, request
+
+from instrumentation import span
+
+try:
+    import orjson
+except ImportError:  # orjson is optional
+    orjson = None
+
+GZIP_MIN_SIZE = 1024
+
+
+def dumps(payload, sort_keys=False):
+    """Compact JSON bytes for `payload`."""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(payload, option=option)
+    return json.dumps(payload, sort_keys=sort_keys, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+class CachedBody:
+    """One serialized payload, the object it was built from, and its gzip copy once asked for."""
+
+    __slots__ = ('source', 'body', 'etag', '_gzipped')
+
+    def __init__(self, source, body):
+        self.source = source
+        self.body = body
+        self.etag = hashlib.blake2b(body, digest_size=12).hexdigest()
+        self._gzipped = None
+
+    def gzipped(self, level):
+        # Two threads may both compress the first time; either result is fine.
+        if self._gzipped is None:
+            self._gzipped = gzip.compress(self.body, compresslevel=level, mtime=0)
+        return self._gzipped
+
+
+class ResponseCache:
+    """Keeps the latest serialized body per route key; see the module docstring."""
+
+    def __init__(self, gzip_min_size=GZIP_MIN_SIZE, gzip_level=6):
+        self.gzip_min_size = gzip_min_size
+        self.gzip_level = gzip_level
+        self._lock = threading.Lock()
+        self._entries = {}
+        self.builds = 0
+        self.hits = 0
+        self.not_modified = 0
+
+    def get(self, key, source, build):
+        """The entry for `key`, serializing build() again only if `source` is not the object it was built from."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.source is source:
+                self.hits += 1
+                return entry
+        with span('serialize'):
+            entry = CachedBody(source, dumps(build(), sort_keys=current_app.json.sort_keys))
+        with self._lock:
+            self._entries[key] = entry
+            self.builds += 1
+        return entry
+
+    def respond(self, key, source, build, headers=None):
+        """200 with the cached (possibly gzipped) body, or 304 when the client already has it."""
+        entry = self.get(key, source, build)
+        response = Response(mimetype='application/json')
+        response.set_etag(entry.etag, weak=True)
+        response.headers['Cache-Control'] = 'no-cache'
+        response.vary.add('Accept-Encoding')
+        if headers:
+            response.headers.update(headers)
+
+        if request.if_none_match.contains_weak(entry.etag):
+            with self._lock:
+                self.not_modified += 1
+            response.status_code = 304
+            return response
+
+        if len(entry.body) >= self.gzip_min_size and request.accept_encodings['gzip']:
+            response.set_data(entry.gzipped(self.gzip_level))
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response.set_data(entry.body)
+        return response
+
+    def discard(self, key_prefix):
+        """Drops every entry whose key starts with `key_prefix`."""
+        with self._lock:
+            for key in [k for k in self._entries if k.startswith(key_prefix)]:
+                del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": sum(len(e.body) for e in self._entries.values()),
+                "builds": self.builds,
+                "hits": self.hits,
+                "not_modified": self.not_modified,
+            }
@@ -0,0 +1,135 @@
+# scrape_client.py
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from instrumentation import span
+
+try:
+    import brotli  # noqa: F401  (lets urllib3 decode Content-Encoding: br)
+    ACCEPT_ENCODING = 'gzip, deflate, br'
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        ACCEPT_ENCODING = 'gzip, deflate, br'
+    except ImportError:
+        ACCEPT_ENCODING = 'gzip, deflate'
+
+DEFAULT_USER_AGENT = 'Mozilla/5.0 ...'
+
+
+class _Entry:
+    __slots__ = ('etag', 'last_modified', 'digest', 'parsed')
+
+    def __init__(self, etag, last_modified, digest, parsed):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.digest = digest
+        self.parsed = parsed
+
+
+class ScrapeClient:
+    """
+    Shared HTTP client for the SCRAPE_API pages.
+
+    - One pooled keep-alive session for every scraper and thread.
+    - Compressed transfers (gzip/deflate, plus brotli when a brotli package is installed).
+    - Conditional requests: the last ETag / Last-Modified per URL is sent back, and a
+      304 returns the previously parsed result.
+    - Content hashing: if the server ignores conditional headers but sends the same
+      bytes again, the previous parse is reused instead of parsing the page again.
+
+    Parsed results are kept for the `max_entries` most recently fetched (url, parser)
+    pairs; every floorsheet page is its own url, so the cache must not grow with them.
+    """
+
+    def __init__(self, pool_maxsize=10, timeout=10, user_agent=DEFAULT_USER_AGENT, max_entries=256):
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize)
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
+        self.session.headers.update({'User-Agent': user_agent, 'Accept-Encoding': ACCEPT_ENCODING})
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.max_entries = max_entries
+        self.requests = 0
+        self.not_modified = 0
+        self.unchanged = 0
+        self.parses = 0
+        self.content_bytes = 0          # decoded body bytes
+
+    def get_parsed(self, url, parse):
+        """
+        GETs `url` and returns parse(html), reusing the last result for this url and
+        parser when the server answers 304 or returns byte-identical content.
+        Raises requests exceptions and whatever `parse` raises.
+        """
+        key = (url, parse)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                headers['If-Modified-Since'] = entry.last_modified
+
+        with span('fetch'):
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+            response.raise_for_status()
+            body = response.content
+        with self._lock:
+            self.requests += 1
+            if response.status_code == 304 and entry is not None:
+                self.not_modified += 1
+                return entry.parsed
+
+        digest = hashlib.blake2b(body, digest_size=16).digest()
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        with self._lock:
+            self.content_bytes += len(body)
+            if entry is not None and entry.digest == digest:
+                self.unchanged += 1
+                entry.etag, entry.last_modified = etag, last_modified
+                return entry.parsed
+
+        with span('parse'):
+            parsed = parse(response.text)
+        with self._lock:
+            self.parses += 1
+            self._entries[key] = _Entry(etag, last_modified, digest, parsed)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return parsed
+
+    def stats(self):
+        """Request, skip and connection-reuse counters, for /health and /metrics."""
+        connections = pooled_requests = 0
+        pools = self.adapter.poolmanager.pools
+        for pool_key in list(pools.keys()):
+            pool = pools.get(pool_key)
+            if pool is not None:
+                connections += pool.num_connections
+                pooled_requests += pool.num_requests
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "not_modified": self.not_modified,
+                "unchanged_content": self.unchanged,
+                "skipped_parses": self.not_modified + self.unchanged,
+                "parses": self.parses,
+                "content_bytes": self.content_bytes,
+                "cached_results": len(self._entries),
+                "connections_opened": connections,
+                "connections_reused": max(pooled_requests - connections, 0),
+                "accept_encoding": ACCEPT_ENCODING,
+            }
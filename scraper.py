@@ -2,11 +2,20 @@
 
 import os
 import logging
-from flask import Flask, jsonify
+from flask import Flask, Response, jsonify
 from flask_cors import CORS
 
 # Import the Blueprint from your new routes file
-from api.portfolio_routes import portfolio_bp
+from api.portfolio_routes import (
+    portfolio_bp, share_price_cache, scrape_client, price_stream_hub, response_cache, portfolio_books,
+    portfolio_mirror, turnover_mirror, watchlist_mirror, realized_gains_mirror,
+)
+from api.sheets_routes import sheets_bp
+from api.history_routes import history_bp
+from api.analytics_routes import analytics_bp
+from api.floorsheet_routes import floorsheet_bp
+from gspread_client import connection as sheets_connection
+import instrumentation
 
 # --- Configure logging ---
 logging.basicConfig(level=logging.INFO)
@@ -14,15 +23,63 @@ logging.basicConfig(level=logging.INFO)
 # --- Flask App Initialization ---
 app = Flask(__name__)
 CORS(app)
+# Server-Timing headers, request histograms for /metrics and opt-in profiling (PROFILING_ENABLED=1).
+instrumentation.init_app(app)
 
 # --- Register Blueprints ---
 # This prefix applies to all routes in portfolio_bp, including our new '/prices' route
 app.register_blueprint(portfolio_bp, url_prefix='/api/v1/portfolio')
+# The same routes per user, on that user's spreadsheet or worksheet shard (USER_SPREADSHEETS),
+# for requests authenticated as that user.
+app.register_blueprint(portfolio_bp, url_prefix='/api/v1/users/<user_id>/portfolio', name='user_portfolio_bp')
+app.register_blueprint(sheets_bp, url_prefix='/api/v1/sheets')
+app.register_blueprint(history_bp, url_prefix='/api/v1/history')
+app.register_blueprint(analytics_bp, url_prefix='/api/v1/analytics')
+app.register_blueprint(floorsheet_bp, url_prefix='/api/v1/floorsheet')
+
+# --- Google Sheets connection ---
+# Authenticates in the background so startup does not wait on Google; worksheets
+# open on first use and routes answer "not connected" until then.
+sheets_connection.start()
+
+# --- Background price refresher ---
+# Keeps the shared price cache warm during market hours so requests never wait on a scrape.
+# Disabled unless PRICE_REFRESH_INTERVAL (seconds) is set.
+refresh_interval = float(os.environ.get('PRICE_REFRESH_INTERVAL', 0))
+if refresh_interval > 0:
+    share_price_cache.start_refresher(
+        refresh_interval,
+        market_hours_only=os.environ.get('PRICE_REFRESH_MARKET_HOURS_ONLY', '1') != '0',
+    )
 
 # --- Health Check Endpoint ---
 @app.route('/health', methods=['GET'])
 def health():
-    return jsonify({"status": "ok"}), 200
+    mirrors = [portfolio_mirror, turnover_mirror, watchlist_mirror, realized_gains_mirror]
+    sheets = sheets_connection.status()
+    return jsonify({
+        "status": "ok",
+        "ready": sheets["ready"],
+        "sheets": sheets,
+        "price_cache": share_price_cache.stats(),
+        "scrape_client": scrape_client.stats(),
+        "price_stream": price_stream_hub.stats(),
+        "response_cache": response_cache.stats(),
+        "portfolio_books": portfolio_books.stats(),
+        "sheet_mirrors": [mirror.stats() for mirror in mirrors],
+    }), 200
+
+# --- Metrics Endpoint ---
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus text format: phase and request latency histograms plus cache/client counters."""
+    gauges = {}
+    gauges.update(instrumentation.stats_gauges("nepse_price_cache", share_price_cache.stats()))
+    gauges.update(instrumentation.stats_gauges("nepse_scrape_client", scrape_client.stats()))
+    gauges.update(instrumentation.stats_gauges("nepse_price_stream", price_stream_hub.stats()))
+    gauges.update(instrumentation.stats_gauges("nepse_response_cache", response_cache.stats()))
+    gauges.update(instrumentation.stats_gauges("nepse_portfolio_books", portfolio_books.stats()))
+    return Response(instrumentation.render_metrics(gauges), mimetype='text/plain; version=0.0.4')
 
 # --- Main execution block ---
 if __name__ == '__main__':
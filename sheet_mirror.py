@@ -0,0 +1,493 @@
+# sheet_mirror.py
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+from gspread.cell import Cell
+from gspread.utils import numericise_all
+
+from instrumentation import span
+from write_behind import apply_write
+
+
+class MirrorStore:
+    """
+    Optional SQLite persistence for SheetMirror, so a restarted process can serve
+    reads from the last known sheet contents instead of refetching every worksheet.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS sheet_mirror ("
+                " name TEXT PRIMARY KEY, loaded_at REAL NOT NULL, sheet_values TEXT NOT NULL)")
+
+    def load(self, name):
+        """Returns (values, loaded_at) for a worksheet, or (None, None) if nothing is stored."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sheet_values, loaded_at FROM sheet_mirror WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return None, None
+        return json.loads(row[0]), row[1]
+
+    def save(self, name, values, loaded_at):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sheet_mirror (name, loaded_at, sheet_values) VALUES (?, ?, ?)",
+                (name, loaded_at, json.dumps(values)))
+
+    def expire(self, name):
+        """Marks the stored copy as too old to serve, without rewriting its values."""
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE sheet_mirror SET loaded_at = 0 WHERE name = ?", (name,))
+
+
+class ColumnIndex:
+    """
+    value -> ascending 1-based sheet row numbers for one column.
+
+    Kept in step with appends, in-place updates and row deletions (rows below a
+    deleted range shift up), so lookups never need a Worksheet.find() round trip.
+    """
+
+    def __init__(self, column):
+        self.column = column
+        self._rows = {}
+
+    def build(self, rows, first_row=2):
+        """Indexes `rows` (lists of cell strings) where rows[0] sits on sheet row `first_row`."""
+        self._rows = {}
+        col = self.column - 1
+        for offset, row in enumerate(rows):
+            if col < len(row) and row[col] != '':
+                self._rows.setdefault(row[col], []).append(first_row + offset)
+        return self
+
+    def __contains__(self, value):
+        return str(value) in self._rows
+
+    def __len__(self):
+        return len(self._rows)
+
+    def first(self, value):
+        """Row number of the first occurrence of `value`, or None."""
+        rows = self._rows.get(str(value))
+        return rows[0] if rows else None
+
+    def add(self, value, row_number):
+        """Records `value` on a row appended below every indexed row."""
+        if value != '':
+            self._rows.setdefault(str(value), []).append(row_number)
+
+    def replace(self, row_number, old_value, new_value):
+        if old_value == new_value:
+            return
+        rows = self._rows.get(old_value)
+        if rows and row_number in rows:
+            rows.remove(row_number)
+            if not rows:
+                del self._rows[old_value]
+        if new_value != '':
+            rows = self._rows.setdefault(new_value, [])
+            rows.append(row_number)
+            rows.sort()
+
+    def remove_rows(self, start, end):
+        """Drops rows start..end (inclusive) and shifts everything below them up."""
+        removed = end - start + 1
+        for value in list(self._rows):
+            shifted = [r if r < start else r - removed for r in self._rows[value] if not start <= r <= end]
+            if shifted:
+                self._rows[value] = shifted
+            else:
+                del self._rows[value]
+
+
+class SheetColumnIndex:
+    """
+    ColumnIndex for a worksheet that is too large to mirror (e.g. Market, which grows
+    by a full snapshot every trading day). Built from one col_values() call on first
+    use, then updated locally as rows are appended through it. `on_error` is
+    called with any exception from the sheet read (see SheetMirror).
+    """
+
+    def __init__(self, source, column, name=None, on_error=None):
+        self._source = source if callable(source) else (lambda: source)
+        self.name = name or getattr(source, 'title', 'sheet')
+        self.column = column
+        self.on_error = on_error
+        self._index = None
+        self._next_row = None
+        self._lock = threading.Lock()
+
+    def __contains__(self, value):
+        with self._lock:
+            return value in self._ensure_built_locked()
+
+    def add(self, value, count=1):
+        """Records `count` newly appended rows whose indexed column holds `value`."""
+        with self._lock:
+            index = self._ensure_built_locked()
+            for _ in range(count):
+                index.add(value, self._next_row)
+                self._next_row += 1
+
+    def invalidate(self):
+        with self._lock:
+            self._index = None
+
+    def _ensure_built_locked(self):
+        if self._index is None:
+            worksheet = self._source()
+            if worksheet is None:
+                raise ConnectionError(f"Google Sheets '{self.name}' not connected.")
+            try:
+                with span('sheet_read'):
+                    values = worksheet.col_values(self.column)
+            except Exception as e:
+                if self.on_error is not None:
+                    self.on_error(e)
+                raise
+            self._index = ColumnIndex(1).build([[v] for v in values[1:]])
+            self._next_row = len(values) + 1
+        return self._index
+
+
+class SheetMirror:
+    """
+    In-memory copy of one worksheet (header row + data rows).
+
+    Reads (get_all_records, find) are served from memory and the sheet is only
+    refetched once the mirror is older than `ttl` seconds. Writes go to the sheet
+    first and are then applied to the mirror (write-through), so the mirror never
+    shows data the sheet rejected.
+
+    If `version_check` is given it is called with the worksheet when the TTL runs
+    out and must return a cheap change token (e.g. the spreadsheet's
+    lastUpdateTime). While the token is unchanged the mirror is kept as-is and
+    only its TTL is renewed.
+
+    With a `writer` (a WriteBehindQueue) writes are applied to the mirror at once
+    and handed to the queue instead of waiting on the Sheets API. The mirror then
+    does not refetch while the queue still holds writes for this worksheet.
+
+    `on_error` is called with any exception raised by a Sheets call made for this
+    mirror, here or in the write-behind queue, before it propagates; the app passes
+    SheetsConnection.handle_error so stale handles are reopened.
+
+    `source` is either a worksheet or a zero-argument callable returning one (or
+    None while the sheet is unavailable). Anything with gspread's get_all_values /
+    append_row(s) / update / batch_update / delete_rows methods works, which keeps it testable
+    against an in-memory fake worksheet.
+
+    With a `store`, the mirror is saved after every refetch. Writes are saved at most
+    once per `persist_delay` seconds; until then the stored copy is marked expired, so
+    a restart in between refetches rather than serving rows without those writes.
+    """
+
+    def __init__(self, source, name=None, ttl=60, store=None, version_check=None, writer=None, on_error=None,
+                 persist_delay=1.0):
+        self._source = source if callable(source) else (lambda: source)
+        self.name = name or getattr(source, 'title', 'sheet')
+        self.on_error = on_error
+        self.writer = writer
+        if writer is not None:
+            writer.register(self.name, self._source, on_error=on_error)
+        self.ttl = ttl
+        self.store = store
+        self.persist_delay = persist_delay
+        self._persist_timer = None
+        self.version_check = version_check
+        self._token = None
+        self._lock = threading.Lock()       # guards the fields below
+        self._io_lock = threading.RLock()   # serialises sheet loads and writes
+        self._header = None
+        self._rows = None
+        self._records = None
+        self._indexes = {}                  # column -> ColumnIndex, built on first find()
+        self._loaded_at = None              # wall clock, so it survives a restart via the store
+        self.version = 0
+        self.loads = 0
+        self.hits = 0
+
+    @property
+    def worksheet(self):
+        return self._source()
+
+    # --- Reads ---
+
+    def get_all_records(self):
+        """Same output as Worksheet.get_all_records(), from memory. Treat the result as read-only."""
+        self._ensure_fresh()
+        with self._lock:
+            if self._records is None:
+                header = self._header
+                self._records = [dict(zip(header, numericise_all(row))) for row in self._rows] if header else []
+            return self._records
+
+    def get_all_values(self):
+        """Header row plus data rows, as strings."""
+        self._ensure_fresh()
+        with self._lock:
+            return [list(self._header)] + [list(row) for row in self._rows] if self._header else []
+
+    def find(self, query, in_column):
+        """First data row whose cell in `in_column` equals `query`, as a gspread Cell, or None."""
+        self._ensure_fresh()
+        query = str(query)
+        with self._lock:
+            index = self._indexes.get(in_column)
+            if index is None:
+                index = self._indexes[in_column] = ColumnIndex(in_column).build(self._rows)
+            row_number = index.first(query)
+        return Cell(row_number, in_column, query) if row_number is not None else None
+
+    # --- Writes (sheet or write-behind queue first, then mirror) ---
+
+    def append_row(self, values, value_input_option='USER_ENTERED'):
+        self.append_rows([values], value_input_option=value_input_option)
+
+    def append_rows(self, rows, value_input_option='USER_ENTERED'):
+        rows = [list(r) for r in rows]
+        if not rows:
+            return
+        with self._io_lock:
+            self._ensure_fresh()
+            self._write('append_rows', rows=rows, value_input_option=value_input_option)
+            with self._lock:
+                if self._header:
+                    width = len(self._header)
+                    for r in rows:
+                        cells = _as_row(r, width)
+                        self._rows.append(cells)
+                        for column, index in self._indexes.items():
+                            if column <= len(cells):
+                                index.add(cells[column - 1], len(self._rows) + 1)
+                else:
+                    # The sheet was blank, so the first appended row became its header. Refetch.
+                    self._loaded_at = None
+                self._changed_locked()
+
+    def update_row(self, row_number, values):
+        """Overwrites sheet row `row_number` (1-based, header is row 1) starting at column A."""
+        values = list(values)
+        with self._io_lock:
+            self._ensure_fresh()
+            self._write('update_row', row=row_number, values=values)
+            with self._lock:
+                self._update_row_locked(row_number, values)
+                self._changed_locked()
+
+    def update_rows(self, updates):
+        """Overwrites several rows in one batch_update call. `updates` is a list of (row_number, values)."""
+        updates = [{"row": row_number, "values": list(values)} for row_number, values in updates]
+        if not updates:
+            return
+        with self._io_lock:
+            self._ensure_fresh()
+            self._write('update_rows', updates=updates)
+            with self._lock:
+                for update in updates:
+                    self._update_row_locked(update["row"], update["values"])
+                self._changed_locked()
+
+    def delete_rows(self, start_index, end_index=None):
+        """Deletes sheet rows start_index..end_index (1-based, inclusive)."""
+        end_index = end_index or start_index
+        with self._io_lock:
+            self._ensure_fresh()
+            self._write('delete_rows', start=start_index, end=end_index)
+            with self._lock:
+                self._delete_rows_locked(start_index, end_index)
+                self._changed_locked()
+
+    def delete_row_numbers(self, row_numbers):
+        """
+        Deletes the given sheet rows (1-based, any order) in one API call. Adjacent
+        rows are merged into runs, which are deleted bottom-up so row numbers stay valid.
+        """
+        runs = []
+        for row_number in sorted(set(row_numbers), reverse=True):
+            if runs and runs[-1][0] == row_number + 1:
+                runs[-1][0] = row_number
+            else:
+                runs.append([row_number, row_number])
+        if not runs:
+            return
+        with self._io_lock:
+            self._ensure_fresh()
+            self._write('delete_row_runs', runs=runs)
+            with self._lock:
+                for start, end in runs:
+                    self._delete_rows_locked(start, end)
+                self._changed_locked()
+
+    def transaction(self):
+        """
+        The mirror's write lock, for `with mirror.transaction():` around lookups
+        (find) and the writes based on their row numbers, so no other write
+        shifts the rows in between.
+        """
+        return self._io_lock
+
+    def _update_row_locked(self, row_number, values):
+        index = row_number - 2
+        if 0 <= index < len(self._rows):
+            row = self._rows[index]
+            cells = _as_cells(values)
+            for column, column_index in self._indexes.items():
+                if column <= len(cells):
+                    old = row[column - 1] if column <= len(row) else ''
+                    column_index.replace(row_number, old, cells[column - 1])
+            row[:len(values)] = cells
+
+    def _delete_rows_locked(self, start_index, end_index):
+        del self._rows[max(start_index - 2, 0):end_index - 1]
+        for index in self._indexes.values():
+            index.remove_rows(start_index, end_index)
+
+    # --- Freshness ---
+
+    def refresh(self):
+        """Refetches the worksheet now."""
+        with self._io_lock:
+            worksheet = self._require_worksheet()
+            with span('sheet_read'):
+                token = self._current_token(worksheet)
+                values = self._call(worksheet.get_all_values)
+            loaded_at = time.time()
+            self._token = token
+            self._set_values(values, loaded_at)
+            self.loads += 1
+            if self.store is not None:
+                self.store.save(self.name, values, loaded_at)
+
+    def invalidate(self):
+        """Forces the next read to refetch from the sheet."""
+        with self._lock:
+            self._loaded_at = None
+
+    def stats(self):
+        with self._lock:
+            age = time.time() - self._loaded_at if self._loaded_at else None
+            return {
+                "name": self.name,
+                "version": self.version,
+                "rows": len(self._rows) if self._rows is not None else None,
+                "age_seconds": round(age, 3) if age is not None else None,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "loads": self.loads,
+            }
+
+    def _is_fresh_locked(self):
+        return self._loaded_at is not None and time.time() - self._loaded_at < self.ttl
+
+    def _ensure_fresh(self):
+        with self._lock:
+            if self._is_fresh_locked():
+                self.hits += 1
+                return
+        with self._io_lock:
+            with self._lock:
+                if self._is_fresh_locked():
+                    return
+            if self._rows is None and self.store is not None:
+                values, loaded_at = self.store.load(self.name)
+                if values is not None and time.time() - loaded_at < self.ttl:
+                    self._set_values(values, loaded_at)
+                    return
+            if self._rows is not None and self.writer is not None and self.writer.pending(self.name):
+                # Queued writes are not on the sheet yet; a refetch would drop them from the mirror.
+                with self._lock:
+                    self._loaded_at = time.time()
+                return
+            if self._rows is not None and self._token is not None:
+                worksheet = self._require_worksheet()
+                with span('sheet_read'):
+                    token = self._current_token(worksheet)
+                if token == self._token:
+                    with self._lock:
+                        self._loaded_at = time.time()
+                    return
+            self.refresh()
+
+    def _write(self, op, **args):
+        if self.writer is not None:
+            self.writer.submit(self.name, op, **args)
+        else:
+            with span('sheet_write'):
+                self._call(apply_write, self._require_worksheet(), op, args)
+
+    def _current_token(self, worksheet):
+        if self.version_check is None:
+            return None
+        try:
+            return self._call(self.version_check, worksheet)
+        except Exception as e:
+            logging.warning(f"Version check for '{self.name}' failed, refetching instead: {e}")
+            return None
+
+    def _call(self, function, *args):
+        """function(*args), a Sheets call; its errors go through on_error before propagating."""
+        try:
+            return function(*args)
+        except Exception as e:
+            if self.on_error is not None:
+                self.on_error(e)
+            raise
+
+    def _set_values(self, values, loaded_at):
+        with self._lock:
+            self._header = list(values[0]) if values else []
+            width = len(self._header)
+            self._rows = [_as_row(row, width) for row in values[1:]]
+            self._indexes = {}
+            self._loaded_at = loaded_at
+            self._records = None
+            self.version += 1
+
+    def _changed_locked(self):
+        self._records = None
+        self.version += 1
+        if self.store is not None and self._persist_timer is None:
+            self.store.expire(self.name)
+            self._persist_timer = threading.Timer(self.persist_delay, self._persist)
+            self._persist_timer.daemon = True
+            self._persist_timer.start()
+
+    def _persist(self):
+        with self._lock:
+            self._persist_timer = None
+            values = [list(self._header)] + [list(row) for row in self._rows] if self._header else []
+            loaded_at = self._loaded_at or time.time()
+        try:
+            self.store.save(self.name, values, loaded_at)
+        except Exception as e:
+            logging.warning(f"Could not persist the '{self.name}' mirror: {e}")
+
+    def _require_worksheet(self):
+        worksheet = self._source()
+        if worksheet is None:
+            raise ConnectionError(f"Google Sheets '{self.name}' not connected.")
+        return worksheet
+
+
+def _as_cells(values):
+    """Values as the sheet would hand them back from get_all_values(): strings, blanks as ''."""
+    return ['' if v is None else str(v) for v in values]
+
+
+def _as_row(values, width):
+    """_as_cells(), padded with '' to `width` cells as get_all_values() pads short rows."""
+    cells = _as_cells(values)
+    if len(cells) < width:
+        cells += [''] * (width - len(cells))
+    return cells
@@ -0,0 +1,56 @@
+# tests/conftest.py
+#
+# The app is a set of top-level modules, and the fake worksheets live in
+# benchmarks/fakes.py; make both importable. Run with `python -m pytest tests`.
+
+import hashlib
+import json
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+import pytest
+
+
+@pytest.fixture(scope='session')
+def app_env(tmp_path_factory):
+    """
+    The Flask app wired to the fakes: a fake scrape server and fake spreadsheets,
+    with users (USER_SPREADSHEETS): alice on a spreadsheet of their own, bob on a
+    prefixed shard of the app's spreadsheet, both with bearer tokens ('alice-token',
+    'bob-token'), and carol, who has no token. At most one user book is cached. The app's modules are imported once per
+    session, so tests share its caches and should not assume a fresh process.
+    """
+    import fakes
+    from html_parsers import parse_share_price_table
+
+    upstream = fakes.FakeScrapeServer().start()
+    symbols = [row['Symbol'] for row in parse_share_price_table(upstream.pages['/today-share-price'].decode())]
+    sheets = fakes.fake_sheets(symbols, lots=20)
+    bob = fakes.fake_sheets(symbols, lots=5, seed=2, prefix='bob ', spreadsheet=sheets['portfolio_sheet'].spreadsheet)
+    alice = fakes.fake_sheets(symbols, lots=7, seed=1)
+    fakes.install_fake_sheets(sheets, spreadsheets={'alice-key': alice})
+
+    state = tmp_path_factory.mktemp('app')
+    os.environ.update({
+        'SCRAPE_API': upstream.url,
+        'HISTORY_DIR': str(state / 'history'),
+        'FLOORSHEET_DIR': str(state / 'floorsheet'),
+        'SHEETS_WRITE_JOURNAL': str(state / 'journal.jsonl'),
+        'USER_SPREADSHEETS': json.dumps({
+            "alice": {"spreadsheet_id": "alice-key", "token_sha256": hashlib.sha256(b'alice-token').hexdigest()},
+            "bob": {"prefix": "bob ", "token_sha256": hashlib.sha256(b'bob-token').hexdigest()},
+            "carol": {"prefix": "carol "},
+        }),
+        'USER_CACHE_SIZE': '1',
+    })
+    import scraper
+    from api import portfolio_routes
+
+    scraper.app.config['TESTING'] = True
+    yield {'app': scraper.app, 'client': scraper.app.test_client(), 'routes': portfolio_routes,
+           'sheets': sheets, 'users': {'alice': alice, 'bob': bob}, 'upstream': upstream}
+    upstream.stop()
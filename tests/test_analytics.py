@@ -0,0 +1,112 @@
+# tests/test_analytics.py
+
+from datetime import datetime
+
+import numpy as np
+
+from analytics import MarketAnalytics, _rolling_sums, rolling_mean, rolling_std, simple_returns
+from history_store import HistoryStore
+from price_cache import NEPAL_TZ
+from price_table import PriceTable
+
+HEADER = ['S.No', 'Symbol', 'Close', 'LTP', 'VWAP', 'Vol', 'Turnover']
+
+
+def price_table(closes):
+    """PriceTable over {symbol: close}; LTP and VWAP equal the close, volume is fixed."""
+    return PriceTable(HEADER, [[str(i), symbol, str(close), str(close), str(close), '100', str(close * 100)]
+                               for i, (symbol, close) in enumerate(closes.items(), 1)])
+
+
+def nepal(*args):
+    return datetime(*args, tzinfo=NEPAL_TZ)
+
+
+def screen(store):
+    return MarketAnalytics(store, lookback=10).screen(returns=(1,), moving_averages=(2,),
+                                                      volatility=(), vwap=(1,))
+
+
+def test_screen_ignores_weekend_and_pre_open_scrapes(tmp_path):
+    # 2026-10-14 is a Wednesday and 2026-10-15 a Thursday; 2026-10-18 is the next Sunday.
+    wednesday = price_table({'A': 100, 'B': 50})
+    thursday = price_table({'A': 110, 'B': 40})
+    sunday = price_table({'A': 121, 'B': 44})
+    scrapes = [
+        (nepal(2026, 10, 14, 15, 30), wednesday),
+        (nepal(2026, 10, 15, 9, 0), wednesday),     # Thursday before the open
+        (nepal(2026, 10, 15, 12, 0), thursday),     # session in progress
+        (nepal(2026, 10, 16, 10, 0), thursday),     # Friday
+        (nepal(2026, 10, 17, 18, 0), thursday),     # Saturday
+        (nepal(2026, 10, 18, 9, 0), thursday),      # Sunday before the open
+        (nepal(2026, 10, 18, 16, 0), sunday),
+    ]
+    store = HistoryStore(str(tmp_path / 'scraped'))
+    for now, table in scrapes:
+        day = store.session_date(table, now=now)
+        if day is not None:
+            store.append(day, table)
+    assert store.dates() == ['2026-10-14', '2026-10-15', '2026-10-18']
+
+    reference = HistoryStore(str(tmp_path / 'reference'))
+    for day, table in [('2026-10-14', wednesday), ('2026-10-15', thursday), ('2026-10-18', sunday)]:
+        reference.append(day, table)
+    result = screen(store)
+    assert result == screen(reference)
+    assert result["date"] == '2026-10-18' and result["days"] == 3
+    assert result["rows"][0] == {"Symbol": 'A', "Close": 121.0, "return_1d%": 10.0, "ma_2": 115.5,
+                                 "vwap_1d_deviation%": 0.0}
+
+
+def test_screen_metrics_name_the_numeric_columns(tmp_path):
+    store = HistoryStore(str(tmp_path))
+    store.append('2026-10-14', price_table({'A': 100}))
+    store.append('2026-10-15', price_table({'A': 110}))
+    analytics = MarketAnalytics(store, lookback=10)
+    windows = dict(returns=(1,), moving_averages=(2,), volatility=(2,), vwap=(1,))
+    metrics = analytics.screen_metrics(**windows)
+    assert metrics == ['Close', 'return_1d%', 'ma_2', 'volatility_2d%', 'vwap_1d_deviation%']
+    assert list(analytics.screen(**windows)["rows"][0]) == ['Symbol'] + metrics
+    assert 'Symbol' not in metrics
+
+
+def random_panel(days=30, symbols=6, seed=3):
+    rng = np.random.default_rng(seed)
+    panel = rng.uniform(50, 500, size=(days, symbols))
+    panel[rng.random(panel.shape) < 0.1] = np.nan
+    panel[:, 0] = 200.0     # a flat series
+    return panel
+
+
+def test_rolling_windows_match_a_plain_loop():
+    panel = random_panel()
+    for window in (1, 2, 5, 30):
+        sums, counts = _rolling_sums(panel, window)
+        means, stds = rolling_mean(panel, window), rolling_std(panel, window)
+        assert sums.shape == means.shape == stds.shape == (len(panel) - window + 1, panel.shape[1])
+        for end in range(window, len(panel) + 1):
+            block = panel[end - window:end]
+            row = end - window
+            assert np.allclose(sums[row], np.nansum(block, axis=0))
+            assert (counts[row] == (~np.isnan(block)).sum(axis=0)).all()
+            full = ~np.isnan(block).any(axis=0)
+            assert np.allclose(means[row][full], block[:, full].mean(axis=0))
+            assert np.isnan(means[row][~full]).all() and np.isnan(stds[row][~full]).all()
+            if window > 1:
+                assert np.allclose(stds[row][full], block[:, full].std(axis=0, ddof=1))
+    # Cancellation on a flat series never goes negative under the square root.
+    assert (rolling_std(panel, 5)[:, 0] == 0).all()
+
+
+def test_window_longer_than_the_history_is_empty():
+    panel = random_panel(days=3)
+    assert rolling_mean(panel, 4).shape == (0, panel.shape[1])
+    assert rolling_std(panel, 10).shape == (0, panel.shape[1])
+
+
+def test_simple_returns():
+    prices = np.array([[100.0, 10.0], [110.0, np.nan], [121.0, 12.0]])
+    one = simple_returns(prices, 1)
+    assert np.allclose(one[:, 0], [10.0, 10.0])
+    assert np.isnan(one[:, 1]).all()
+    assert np.allclose(simple_returns(prices, 2), [[21.0, 20.0]])
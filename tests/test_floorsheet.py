@@ -0,0 +1,96 @@
+# tests/test_floorsheet.py
+
+import os
+from collections import defaultdict
+
+import pytest
+
+from floorsheet import FloorsheetIngester, FloorsheetStore, aggregate, build_trades, parse_floorsheet
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks', 'fixtures')
+
+
+def page(number):
+    with open(os.path.join(FIXTURES, f'floorsheet_page_{number}.html'), encoding='utf-8') as f:
+        return parse_floorsheet(f.read())
+
+
+@pytest.fixture(scope='module')
+def pages():
+    return [page(n) for n in (1, 2, 3)]
+
+
+def test_pages_parse_with_pagination(pages):
+    assert [last for _, last in pages] == [3, 3, 3]
+    assert [len(chunk) for chunk, _ in pages] == [300, 301, 300]
+    # Page 2 carries one malformed row, and repeats page 1's last trade (the pages shifted while live).
+    assert [chunk.skipped for chunk, _ in pages] == [0, 1, 0]
+    assert pages[0][0].contract[-1] == pages[1][0].contract[0]
+
+
+def test_build_trades_drops_repeats_and_sorts_by_contract(pages):
+    trades, symbols = build_trades([chunk for chunk, _ in pages])
+    assert len(trades) == 900 and len(symbols) == 12
+    assert (trades['contract'][1:] > trades['contract'][:-1]).all()
+
+
+def test_aggregates_match_a_plain_loop(pages):
+    trades, symbols = build_trades([chunk for chunk, _ in pages])
+    result = aggregate(trades, symbols)
+
+    per_symbol = defaultdict(list)
+    bought, sold = defaultdict(float), defaultdict(float)
+    for trade in trades.tolist():
+        contract, sid, buyer, seller, quantity, rate = trade
+        per_symbol[symbols[sid]].append((quantity, rate))
+        bought[buyer] += quantity
+        sold[seller] += quantity
+
+    assert result["totals"]["Trades"] == 900
+    assert result["totals"]["Quantity"] == sum(q for t in per_symbol.values() for q, _ in t)
+    assert result["totals"]["Symbols"] == len(per_symbol)
+    for row in result["symbols"]:
+        lots = per_symbol[row["Symbol"]]
+        quantity, amount = sum(q for q, _ in lots), sum(q * r for q, r in lots)
+        assert row["Trades"] == len(lots) and row["Quantity"] == quantity
+        assert row["Amount"] == pytest.approx(amount, abs=0.01)
+        assert row["VWAP"] == pytest.approx(amount / quantity, abs=0.01)
+        assert (row["Open"], row["Close"]) == (lots[0][1], lots[-1][1])
+        assert (row["High"], row["Low"]) == (max(r for _, r in lots), min(r for _, r in lots))
+        assert row["Top buyers"][0]["Quantity"] >= row["Top buyers"][-1]["Quantity"]
+    assert {row["Broker"] for row in result["brokers"]} == set(bought) | set(sold)
+    for row in result["brokers"]:
+        assert (row["Buy quantity"], row["Sell quantity"]) == (bought[row["Broker"]], sold[row["Broker"]])
+        assert row["Net quantity"] == row["Buy quantity"] - row["Sell quantity"]
+
+
+def test_ingest_fetches_every_page_and_stores_the_day(tmp_path, pages):
+    fetched = []
+
+    def fetch_page(number):
+        fetched.append(number)
+        return pages[number - 1]
+
+    store = FloorsheetStore(str(tmp_path))
+    run = FloorsheetIngester(fetch_page, store, workers=2).ingest('2026-10-15')
+    assert sorted(fetched) == [1, 2, 3]
+    assert (run["pages"], run["rows"], run["skipped_rows"], run["Trades"]) == (3, 901, 1, 900)
+    assert store.dates() == ['2026-10-15']
+    stored = store.day('2026-10-15')
+    assert stored.aggregates == {"date": '2026-10-15', **aggregate(*build_trades([chunk for chunk, _ in pages]))}
+
+
+def test_routes_sort_only_on_numeric_fields(app_env):
+    client = app_env['client']
+    assert client.post('/api/v1/floorsheet/ingest?date=2026-10-15').status_code == 201
+
+    rows = client.get('/api/v1/floorsheet/2026-10-15/symbols?sort=Quantity&limit=5').get_json()
+    assert len(rows) == 5 and [r["Quantity"] for r in rows] == sorted((r["Quantity"] for r in rows), reverse=True)
+    brokers = client.get('/api/v1/floorsheet/2026-10-15/brokers').get_json()
+    assert [r["Net amount"] for r in brokers] == sorted((r["Net amount"] for r in brokers), reverse=True)
+    # Lists of top brokers are not sortable, and used to fail with a 500.
+    for url in ('/api/v1/floorsheet/2026-10-15/symbols?sort=Top%20buyers',
+                '/api/v1/floorsheet/2026-10-15/brokers?sort=Top%20bought',
+                '/api/v1/floorsheet/2026-10-15/symbols?sort=Symbol'):
+        response = client.get(url)
+        assert response.status_code == 400 and 'Sort by one of' in response.get_json()["error"]
@@ -0,0 +1,99 @@
+# tests/test_gspread_client.py
+
+import time
+
+import pytest
+from gspread.exceptions import APIError
+
+from fakes import FakeSpreadsheet, FakeWorksheet
+from gspread_client import SheetsConnection
+from sheet_mirror import SheetMirror
+from write_behind import WriteBehindQueue
+
+
+class FakeResponse:
+    def __init__(self, code):
+        self.code = code
+        self.text = ''
+
+    def json(self):
+        return {"error": {"code": self.code, "message": "fake", "status": "FAKE"}}
+
+
+class BrokenWorksheet(FakeWorksheet):
+    """A worksheet whose every read and write fails with `error`."""
+
+    def __init__(self, error):
+        super().__init__('Portfolio', ['scrip'], [['A']])
+        self.error = error
+
+    def _request(self, method):
+        raise self.error
+
+
+def connection():
+    opened = []
+
+    def connect():
+        spreadsheet = FakeSpreadsheet()
+        FakeWorksheet('Portfolio', ['scrip'], [['A']], spreadsheet=spreadsheet)
+        opened.append(spreadsheet)
+        return spreadsheet
+    return SheetsConnection(connect=connect, wait=5, backoff_base=0.01), opened
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.005)
+    return condition()
+
+
+def test_only_login_errors_reconnect():
+    conn, opened = connection()
+    first = conn.worksheet('Portfolio')
+    assert first is not None and len(opened) == 1
+
+    for error in (APIError(FakeResponse(429)), APIError(FakeResponse(500)), APIError(FakeResponse(403)),
+                  ValueError('bad row')):
+        conn.handle_error(error, worksheet='Portfolio')
+    assert len(opened) == 1 and conn.worksheet('Portfolio') is first
+
+    conn.handle_error(APIError(FakeResponse(401)))
+    second = conn.worksheet('Portfolio')
+    assert len(opened) == 2 and second is not None and second is not first
+
+
+def test_not_found_reopens_only_a_handle_that_had_opened():
+    conn, opened = connection()
+    first = conn.worksheet('Portfolio')
+    assert conn.worksheet('Missing') is None
+
+    # Never valid, or no worksheet named: nothing to reopen.
+    conn.handle_error(APIError(FakeResponse(404)), worksheet='Missing')
+    conn.handle_error(APIError(FakeResponse(404)))
+    assert conn.worksheet('Portfolio') is first
+
+    # The worksheet was recreated under an open handle: that handle alone is reopened.
+    FakeWorksheet('Portfolio', ['scrip'], [['B']], spreadsheet=opened[0])
+    conn.handle_error(APIError(FakeResponse(404)), worksheet='Portfolio')
+    second = conn.worksheet('Portfolio')
+    assert second is not first and second.get_all_values() == [['scrip'], ['B']]
+    assert len(opened) == 1
+
+
+def test_mirror_and_write_behind_report_sheet_errors(tmp_path):
+    error = APIError(FakeResponse(500))
+    seen = []
+    mirror = SheetMirror(BrokenWorksheet(error), ttl=60, on_error=seen.append)
+    with pytest.raises(APIError):
+        mirror.get_all_records()
+    assert seen == [error]
+
+    q = WriteBehindQueue(str(tmp_path / 'journal.jsonl'), flush_interval=0.01, backoff_base=60)
+    mirror = SheetMirror(BrokenWorksheet(error), name='Watchlist', writer=q, on_error=seen.append)
+    q.submit('Watchlist', 'append_rows', rows=[['B']])
+    assert wait_for(lambda: len(seen) == 2)
+    assert seen == [error, error] and q.status()["failures"] == 1
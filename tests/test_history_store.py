@@ -0,0 +1,57 @@
+# tests/test_history_store.py
+
+from datetime import date, datetime
+
+from history_store import HistoryStore
+from price_cache import NEPAL_TZ, last_session_date
+from price_table import PriceTable
+
+HEADER = ['S.No', 'Symbol', 'LTP', 'Vol', 'Turnover']
+
+
+def price_table(prices):
+    """PriceTable over {symbol: LTP}, with volume and turnover derived from the price."""
+    return PriceTable(HEADER, [[str(i), symbol, str(ltp), str(ltp * 10), str(ltp * 100)]
+                               for i, (symbol, ltp) in enumerate(prices.items(), 1)])
+
+
+def nepal(*args):
+    return datetime(*args, tzinfo=NEPAL_TZ)
+
+
+def test_last_session_date():
+    # 2026-10-15 is a Thursday, 2026-10-18 a Sunday.
+    assert last_session_date(nepal(2026, 10, 15, 16, 0)) == date(2026, 10, 15)
+    assert last_session_date(nepal(2026, 10, 15, 12, 0)) is None
+    assert last_session_date(nepal(2026, 10, 15, 9, 0)) == date(2026, 10, 14)
+    assert last_session_date(nepal(2026, 10, 16, 12, 0)) == date(2026, 10, 15)
+    assert last_session_date(nepal(2026, 10, 17, 18, 0)) == date(2026, 10, 15)
+    assert last_session_date(nepal(2026, 10, 18, 10, 59)) == date(2026, 10, 15)
+
+
+def test_session_date_skips_repeats_of_the_latest_day(tmp_path):
+    store = HistoryStore(str(tmp_path))
+    thursday = price_table({'A': 100, 'B': 200})
+    day = store.session_date(thursday, now=nepal(2026, 10, 15, 16, 0))
+    assert day == '2026-10-15'
+    assert store.append(day, thursday)
+
+    # The same page on the weekend and before Sunday's open still belongs to Thursday.
+    assert store.session_date(thursday, now=nepal(2026, 10, 17, 12, 0)) == '2026-10-15'
+    assert store.session_date(thursday, now=nepal(2026, 10, 18, 9, 0)) == '2026-10-15'
+    # Unchanged prices after a weekday close: a holiday, not a new session.
+    assert store.session_date(thursday, now=nepal(2026, 10, 18, 16, 0)) is None
+
+    sunday = price_table({'A': 101, 'B': 200})
+    assert store.session_date(sunday, now=nepal(2026, 10, 18, 16, 0)) == '2026-10-18'
+
+
+def test_dates_sees_days_appended_by_another_process(tmp_path):
+    reader = HistoryStore(str(tmp_path))
+    writer = HistoryStore(str(tmp_path))
+    assert reader.dates() == []
+    writer.append('2026-10-14', price_table({'A': 100}))
+    assert reader.dates() == ['2026-10-14']
+    writer.append('2026-10-15', price_table({'A': 101}))
+    assert reader.dates() == ['2026-10-14', '2026-10-15']
+    assert '2026-10-15' in reader
@@ -0,0 +1,70 @@
+# tests/test_html_parsers.py
+
+import os
+
+import pytest
+
+from html_parsers import BACKENDS, parse_market_summary, parse_share_price_table
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks', 'fixtures')
+
+SMALL_TABLE = """
+<html><body><table id="other"><tr><td>ignored</td></tr></table>
+<table id='headFixed'>
+  <thead><tr><th>S.No</th><th> Symbol </th><th>LTP</th></tr></thead>
+  <tbody>
+    <tr><td>1</td><td><a href="/company/A&amp;B">A&amp;B</a></td><td>1,234.50</td></tr>
+    <tr><td>2</td><td> <b>NABIL</b> </td><td></td></tr>
+    <tr><td>3</td><td>SHORT</td></tr>
+  </tbody>
+</table></body></html>
+"""
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES, name), encoding='utf-8') as f:
+        return f.read()
+
+
+@pytest.fixture(scope='module')
+def share_html():
+    return load_fixture('today_share_price.html')
+
+
+@pytest.fixture(scope='module')
+def summary_html():
+    return load_fixture('market_summary.html')
+
+
+@pytest.mark.parametrize('backend', sorted(BACKENDS))
+def test_share_price_table_matches_bs4(backend, share_html):
+    rows = parse_share_price_table(share_html, backend)
+    assert rows and rows == parse_share_price_table(share_html, 'bs4')
+
+
+@pytest.mark.parametrize('backend', sorted(BACKENDS))
+def test_market_summary_matches_bs4(backend, summary_html):
+    summary = parse_market_summary(summary_html, backend)
+    assert "Date" in summary and summary == parse_market_summary(summary_html, 'bs4')
+
+
+@pytest.mark.parametrize('backend', sorted(BACKENDS))
+def test_markup_edge_cases(backend):
+    assert parse_share_price_table(SMALL_TABLE, backend) == [
+        {'S.No': '1', 'Symbol': 'A&B', 'LTP': '1,234.50'},
+        {'S.No': '2', 'Symbol': 'NABIL', 'LTP': ''},
+        {'S.No': '3', 'Symbol': 'SHORT'},
+    ]
+
+
+@pytest.mark.parametrize('backend', sorted(BACKENDS))
+def test_missing_elements_raise(backend):
+    with pytest.raises(ValueError):
+        parse_share_price_table("<html><body><p>maintenance</p></body></html>", backend)
+    with pytest.raises(ValueError):
+        parse_market_summary("<html><body></body></html>", backend)
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        parse_share_price_table(SMALL_TABLE, 'nope')
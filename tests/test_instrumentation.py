@@ -0,0 +1,64 @@
+# tests/test_instrumentation.py
+
+import time
+
+from flask import Flask
+
+import instrumentation
+from instrumentation import Histogram, RequestTimings, _current, span, stats_gauges
+from pipeline import run_concurrently
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("demo_seconds", "Demo.", ("phase",), buckets=(0.1, 1.0))
+    for seconds in (0.05, 0.5, 5.0):
+        histogram.observe(('fetch',), seconds)
+    histogram.observe(('say "hi"',), 0.01)
+    lines = histogram.render().splitlines()
+    assert lines[:2] == ["# HELP demo_seconds Demo.", "# TYPE demo_seconds histogram"]
+    assert 'demo_seconds_bucket{phase="fetch",le="0.1"} 1' in lines
+    assert 'demo_seconds_bucket{phase="fetch",le="1.0"} 2' in lines
+    assert 'demo_seconds_bucket{phase="fetch",le="+Inf"} 3' in lines
+    assert 'demo_seconds_count{phase="fetch"} 3' in lines
+    assert 'demo_seconds_count{phase="say \\"hi\\""} 1' in lines
+
+
+def test_spans_in_pool_workers_count_towards_the_request():
+    timings = RequestTimings()
+    token = _current.set(timings)
+    try:
+        def fetch():
+            with span('fetch'):
+                time.sleep(0.01)
+        run_concurrently(fetch, fetch)
+        with span('compute'):
+            pass
+    finally:
+        _current.reset(token)
+    assert timings.phases['fetch'][1] == 2 and timings.phases['fetch'][0] >= 0.02
+    header = timings.server_timing()
+    assert header.startswith('fetch;dur=') and 'desc="2 calls"' in header
+    assert 'compute;dur=' in header and 'desc="1 call"' in header and ', total;dur=' in header
+
+
+def test_stats_gauges_keep_numbers_only():
+    gauges = stats_gauges("demo", {"hits": 3, "hit rate": 0.5, "running": True, "mode": "gzip", "last": None})
+    assert gauges == {"demo_hits": 3, "demo_hit_rate": 0.5}
+
+
+def test_requests_get_server_timing_and_a_histogram_entry():
+    app = Flask(__name__)
+    instrumentation.init_app(app)
+
+    @app.route('/demo/<int:n>')
+    def demo(n):
+        with span('compute'):
+            return str(n)
+
+    response = app.test_client().get('/demo/7')
+    assert response.status_code == 200 and 'compute;dur=' in response.headers['Server-Timing']
+    assert response.headers['Timing-Allow-Origin'] == '*'
+    assert _current.get() is None
+    metrics = instrumentation.render_metrics({"demo_gauge": 1})
+    assert 'nepse_http_request_duration_seconds_count{method="GET",endpoint="/demo/<int:n>",status="200"} 1' in metrics
+    assert "# TYPE demo_gauge gauge\ndemo_gauge 1" in metrics
@@ -0,0 +1,109 @@
+# tests/test_portfolio_books.py
+
+import gc
+import hashlib
+import weakref
+
+from gspread_client import SheetsConnection
+from portfolio_books import PortfolioBook, PortfolioBooks, UserAuth, load_user_map, load_user_tokens
+from sheet_mirror import SheetMirror
+from write_behind import WriteBehindQueue
+
+PREFIX = '/api/v1/users'
+SPEC = '{"a": "key-a", "b": {"prefix": "b ", "token_sha256": "%s"}}' % hashlib.sha256(b'secret').hexdigest()
+
+
+def test_user_map_and_tokens_come_from_one_spec():
+    assert load_user_map(SPEC) == {"a": ("key-a", ""), "b": (None, "b ")}
+    assert load_user_tokens(SPEC) == {"b": hashlib.sha256(b'secret').hexdigest()}
+
+
+def test_bearer_tokens_and_trusted_header():
+    auth = UserAuth(load_user_tokens(SPEC))
+    assert auth.check('b', {'Authorization': 'Bearer secret'}) is None
+    assert auth.check('b', {})[0] == 401
+    assert auth.check('b', {'Authorization': 'Basic secret'})[0] == 401
+    assert auth.check('b', {'Authorization': 'Bearer wrong'})[0] == 403
+    # A user without a token cannot be reached with any token.
+    assert auth.check('a', {'Authorization': 'Bearer secret'})[0] == 403
+
+    proxied = UserAuth({}, trusted_header='X-User')
+    assert proxied.check('a', {'X-User': 'a'}) is None
+    assert proxied.check('a', {'X-User': 'b'})[0] == 403
+    assert proxied.check('a', {'Authorization': 'Bearer secret'})[0] == 401
+
+
+def test_evicted_books_are_freed(tmp_path):
+    queue = WriteBehindQueue(str(tmp_path / 'journal.jsonl'), flush_interval=0.01)
+
+    def make_mirror(source, name, on_error):
+        return SheetMirror(source, name=name, writer=queue, on_error=on_error)
+
+    def make_book(user_id, connection, prefix):
+        return PortfolioBook(f"user/{user_id}", connection, make_mirror, prefix=prefix, mirror_prefix=f"{user_id}/")
+
+    def evicted(book):
+        for mirror in book.mirrors:
+            queue.unregister(mirror.name)
+
+    books = PortfolioBooks({"a": (None, "a "), "b": (None, "b ")}, None, make_book, SheetsConnection(),
+                           max_books=1, on_evict=evicted)
+    first = weakref.ref(books.get("a"))
+    books.get("b")
+    gc.collect()
+    assert first() is None
+    assert books.stats()["evictions"] == 1 and books.stats()["cached"] == 1
+    assert sorted(queue.status()["pending"]) == ["b/Portfolio", "b/Realized Gains", "b/Watchlist"]
+    queue.close()
+
+
+def get(client, path, token=None, **headers):
+    if token:
+        headers['Authorization'] = f'Bearer {token}'
+    return client.get(PREFIX + path, headers=headers)
+
+
+def test_user_routes_need_that_users_token(app_env):
+    client = app_env['client']
+    unauthenticated = get(client, '/alice/portfolio/')
+    assert unauthenticated.status_code == 401 and unauthenticated.headers['WWW-Authenticate'] == 'Bearer'
+    assert get(client, '/alice/portfolio/', 'bob-token').status_code == 403
+    assert get(client, '/carol/portfolio/', 'bob-token').status_code == 403
+    assert get(client, '/alice/portfolio/', 'alice-token').status_code == 200
+    assert get(client, '/nobody/portfolio/', 'alice-token').status_code == 404
+
+
+def test_users_see_only_their_own_sheets(app_env):
+    client, routes = app_env['client'], app_env['routes']
+    alice = get(client, '/alice/portfolio/', 'alice-token').get_json()
+    bob = get(client, '/bob/portfolio/', 'bob-token').get_json()
+    default = client.get('/api/v1/portfolio/').get_json()
+    assert len(alice) == 7 and len(bob) == 5 and len(default) >= 20
+
+    response = client.put(PREFIX + '/bob/portfolio/wishlist/add', json={"scrip": "BOBONLY"},
+                          headers={'Authorization': 'Bearer bob-token'})
+    assert response.status_code == 201
+    assert app_env['users']['bob']['watchlist_sheet'].find("BOBONLY", in_column=1) is not None
+    assert app_env['sheets']['watchlist_sheet'].find("BOBONLY", in_column=1) is None
+    assert app_env['users']['alice']['watchlist_sheet'].find("BOBONLY", in_column=1) is None
+    assert routes.watchlist_mirror.find("BOBONLY", in_column=1) is None
+
+
+def test_lru_keeps_one_book_and_a_shard_404_leaves_other_sheets_open(app_env):
+    from gspread.exceptions import APIError
+    from test_gspread_client import FakeResponse
+
+    client, routes = app_env['client'], app_env['routes']
+    before = routes.portfolio_books.stats()["evictions"]
+    assert get(client, '/alice/portfolio/', 'alice-token').status_code == 200
+    assert get(client, '/bob/portfolio/', 'bob-token').status_code == 200
+    stats = routes.portfolio_books.stats()
+    assert stats["cached"] == 1 and stats["evictions"] >= before + 1
+
+    # bob's shard lives on the app's own connection; its 404 must not drop the default worksheets.
+    connection = routes.sheets_connection
+    assert connection.worksheet("Portfolio") is not None
+    opened = dict(connection._worksheets)
+    routes.portfolio_books.get('bob').portfolio.on_error(APIError(FakeResponse(404)))
+    assert "bob Portfolio" not in connection._worksheets
+    assert all(connection._worksheets.get(name) is ws for name, ws in opened.items() if name != "bob Portfolio")
@@ -0,0 +1,151 @@
+# tests/test_portfolio_summary.py
+
+import json
+import random
+
+import pytest
+
+import numpy as np
+
+from portfolio_summary import Holdings, IncrementalValuation, PortfolioValuation, _round2
+from price_table import PriceTable
+from reference import legacy_summary
+
+HEADER = ['S.No', 'Symbol', 'LTP', '52 Weeks High', '52 Weeks Low']
+
+
+def price_table(prices):
+    """PriceTable over {symbol: LTP string}."""
+    return PriceTable(HEADER, [[str(i), symbol, ltp, '900.00', '100.00']
+                               for i, (symbol, ltp) in enumerate(prices.items(), 1)])
+
+
+def random_case(rng):
+    symbols = [f"S{i}" for i in range(40)]
+    prices = {s: rng.choice([f"{rng.uniform(1, 3000):,.2f}", f"{rng.randint(1, 3000)}", '-', '0'])
+              for s in symbols if rng.random() < 0.8}
+    records = []
+    for _ in range(rng.randint(1, 60)):
+        quantity = rng.choice([rng.randint(0, 5000), round(rng.uniform(1, 500), 3)])
+        price = rng.choice([rng.randint(0, 3000), round(rng.uniform(0.01, 3000), 2)])
+        records.append({'scrip': rng.choice(symbols + ['']), 'sector': rng.choice(['Hydro', 'Banks']),
+                        'quantity': quantity, 'purchasePrice': price})
+    return records, prices
+
+
+def test_lot_rows_match_baseline_exactly():
+    rng = random.Random(4)
+    for _ in range(300):
+        records, prices = random_case(rng)
+        table = price_table(prices)
+        expected = legacy_summary(records, table.to_records())
+        actual = PortfolioValuation(Holdings(records), table).lot_rows()
+        # Same JSON text: same values, last cent included, and the same int/float types.
+        assert json.dumps(actual) == json.dumps(expected)
+
+
+def test_round2_matches_python_round():
+    rng = random.Random(2)
+    values = [rng.randint(0, 10 ** 7) / 1000 for _ in range(20000)] + \
+             [rng.uniform(-1e6, 1e6) for _ in range(20000)] + \
+             [rng.uniform(1, 3000) * rng.randint(1, 5000) for _ in range(20000)] + [2.675, 1.005, -0.125, 0.0]
+    rounded = _round2(np.array(values)).tolist()
+    assert [repr(v) for v in rounded] == [repr(round(v, 2)) for v in values]
+
+
+def test_totals_are_plain_python_numbers():
+    records = [{'scrip': 'A', 'sector': 'Hydro', 'quantity': 10, 'purchasePrice': 100}]
+    totals = PortfolioValuation(Holdings(records), price_table({'A': '110'})).totals()
+    assert totals["Current Value"] == 1100.0 and type(totals["Current Value"]) is float
+    assert type(totals["Lots"]) is int
+
+
+def test_incremental_matches_full_valuation_across_ticks():
+    rng = random.Random(12)
+    records, prices = random_case(rng)
+    incremental = IncrementalValuation()
+    for _ in range(100):
+        # Move a few prices; now and then a symbol is delisted or (re)listed.
+        for symbol in rng.sample(sorted(prices), min(3, len(prices))):
+            prices[symbol] = f"{rng.uniform(1, 3000):.2f}"
+        if rng.random() < 0.3 and prices:
+            del prices[rng.choice(sorted(prices))]
+        if rng.random() < 0.3:
+            prices[f"S{rng.randrange(40)}"] = f"{rng.uniform(1, 3000):.2f}"
+        table = price_table(prices)
+        incremental.update(records, table)
+        full = PortfolioValuation(Holdings(records), table)
+        assert json.dumps(incremental.rows()) == json.dumps(full.lot_rows())
+        assert incremental.totals()["Current Value"] == pytest.approx(full.totals()["Current Value"], abs=0.01)
+
+
+def test_delisted_holding_is_revalued():
+    records = [{'scrip': 'A', 'sector': 'Hydro', 'quantity': 10, 'purchasePrice': 100},
+               {'scrip': 'B', 'sector': 'Banks', 'quantity': 5, 'purchasePrice': 200}]
+    incremental = IncrementalValuation()
+    token = incremental.update(records, price_table({'A': '110', 'B': '240'}))
+    incremental.update(records, price_table({'B': '240'}))
+
+    row = incremental.rows()[0]
+    assert (row["Script"], row["LTP"], row["Current Value"]) == ('A', 0.0, 0)
+    totals = incremental.totals()
+    assert totals["Current Value"] == 1200.0
+    # Weights are shares of purchase value, like the rows', so a delisting does not move them.
+    assert totals["sectors"] == [
+        {"Sector": "Hydro", "Purchase value": 1000.0, "Current Value": 0.0, "Weight%": "50.0%"},
+        {"Sector": "Banks", "Purchase value": 1000.0, "Current Value": 1200.0, "Weight%": "50.0%"}]
+    _, full, rows = incremental.delta(token)
+    assert not full and [r["Script"] for r in rows] == ['A']
+
+
+def test_delta_tokens():
+    records = [{'scrip': 'A', 'sector': 'Hydro', 'quantity': 10, 'purchasePrice': 100},
+               {'scrip': 'B', 'sector': 'Banks', 'quantity': 5, 'purchasePrice': 200}]
+    incremental = IncrementalValuation(log_size=2)
+    first = incremental.update(records, price_table({'A': '110', 'B': '240'}))
+    second = incremental.update(records, price_table({'A': '111', 'B': '240'}))
+    assert second != first
+
+    token, full, rows = incremental.delta(first)
+    assert (token, full, [r["Script"] for r in rows]) == (second, False, ['A'])
+    assert incremental.delta(second) == (second, False, [])
+    # Unchanged prices in a new table do not bump the version.
+    assert incremental.update(records, price_table({'A': '111', 'B': '240'})) == second
+
+    for token in ('garbage', '9.0', f"{second.split('.')[0]}.99"):
+        assert incremental.delta(token)[1] is True
+    # Versions older than the bounded log fall back to a full response.
+    incremental.update(records, price_table({'A': '112', 'B': '240'}))
+    incremental.update(records, price_table({'A': '112', 'B': '241'}))
+    incremental.update(records, price_table({'A': '113', 'B': '241'}))
+    assert incremental.delta(first)[1] is True
+
+    # New holdings start a new generation: old tokens get everything.
+    current = incremental.token
+    records = records + [{'scrip': 'C', 'sector': 'Hydro', 'quantity': 1, 'purchasePrice': 10}]
+    incremental.update(records, price_table({'A': '113', 'B': '241'}))
+    token, full, rows = incremental.delta(current)
+    assert full and len(rows) == 3 and token.split('.')[0] != current.split('.')[0]
+
+
+def test_reloaded_unchanged_holdings_keep_the_generation():
+    records = [{'scrip': 'A', 'sector': 'Hydro', 'quantity': 10, 'purchasePrice': 100}]
+    incremental = IncrementalValuation()
+    token = incremental.update(records, price_table({'A': '110'}))
+    # The mirror hands out a fresh list after every reload of the sheet.
+    reloaded = [dict(r) for r in records]
+    assert incremental.update(reloaded, price_table({'A': '111'})).split('.')[0] == token.split('.')[0]
+    _, full, rows = incremental.delta(token)
+    assert not full and rows[0]["LTP"] == 111.0
+
+
+def test_week_range_changes_are_logged():
+    records = [{'scrip': 'A', 'sector': 'Hydro', 'quantity': 10, 'purchasePrice': 100},
+               {'scrip': 'B', 'sector': 'Banks', 'quantity': 5, 'purchasePrice': 200}]
+    incremental = IncrementalValuation()
+    token = incremental.update(records, price_table({'A': '110', 'B': '240'}))
+    table = PriceTable(HEADER, [['1', 'A', '110', '900.00', '100.00'], ['2', 'B', '240', '950.00', '100.00']])
+    assert incremental.update(records, table) != token
+    _, full, rows = incremental.delta(token)
+    assert not full and [(r["Script"], r["52 week high/low"]) for r in rows] == [('B', '950.00 / 100.00')]
+    assert json.dumps(incremental.rows()) == json.dumps(PortfolioValuation(Holdings(records), table).lot_rows())
@@ -0,0 +1,85 @@
+# tests/test_price_cache.py
+
+import threading
+import time
+
+import pytest
+
+from price_cache import PriceCache
+
+
+class SlowLoader:
+    """Counts calls; each call blocks until `release` is set, then returns the call number."""
+
+    def __init__(self):
+        self.calls = 0
+        self.release = threading.Event()
+        self.fail = False
+
+    def __call__(self):
+        self.calls += 1
+        self.release.wait(5)
+        if self.fail:
+            raise ConnectionError("upstream down")
+        return self.calls
+
+
+def test_concurrent_misses_share_one_load():
+    loader = SlowLoader()
+    cache = PriceCache(loader, ttl=60)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get())) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    loader.release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert results == [1] * 10
+    assert loader.calls == 1
+    stats = cache.stats()
+    assert stats["misses"] == 10 and stats["loads"] == 1 and stats["version"] == 1
+
+
+def test_fresh_values_are_hits():
+    loader = SlowLoader()
+    loader.release.set()
+    cache = PriceCache(loader, ttl=60)
+    assert cache.get() == 1
+    assert cache.get() == 1
+    assert loader.calls == 1 and cache.stats()["hits"] == 1
+
+
+def test_stale_values_are_served_while_one_refresh_runs():
+    loader = SlowLoader()
+    loader.release.set()
+    cache = PriceCache(loader, ttl=0.01, stale_ttl=60)
+    assert cache.get() == 1
+    time.sleep(0.02)
+    loader.release.clear()
+    # Stale: answered at once with the old value; one revalidation starts in the background.
+    assert cache.get() == 1
+    assert cache.get() == 1
+    loader.release.set()
+    deadline = time.monotonic() + 2
+    while cache.stats()["version"] < 2 and time.monotonic() < deadline:
+        time.sleep(0.005)
+    assert loader.calls == 2
+    assert cache.get() == 2
+    assert cache.stats()["stale_hits"] == 2
+
+
+def test_expired_values_are_reloaded_and_errors_reach_every_waiter():
+    loader = SlowLoader()
+    loader.release.set()
+    cache = PriceCache(loader, ttl=0.01, stale_ttl=0.01)
+    assert cache.get() == 1
+    time.sleep(0.02)
+    assert cache.get() == 2
+
+    loader.fail = True
+    cache.invalidate()
+    with pytest.raises(ConnectionError):
+        cache.get()
+    assert cache.stats()["errors"] == 1
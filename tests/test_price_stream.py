@@ -0,0 +1,91 @@
+# tests/test_price_stream.py
+
+import time
+
+from price_stream import PriceStreamHub
+from price_table import PriceTable
+
+HEADER = ['S.No', 'Symbol', 'LTP', 'Vol', 'Turnover']
+
+
+class FakePriceCache:
+    def __init__(self, prices):
+        self.set(prices)
+
+    def set(self, prices):
+        self.table = PriceTable(HEADER, [[str(i), symbol, str(ltp), '10', '1000']
+                                         for i, (symbol, ltp) in enumerate(prices.items(), 1)])
+
+    def get(self):
+        return self.table
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.005)
+    return condition()
+
+
+def test_poller_stops_with_the_last_subscriber_and_restarts():
+    hub = PriceStreamHub(FakePriceCache({'A': 100}), interval=0.01)
+    subscriber = hub.subscribe()
+    assert hub._poller is not None
+    hub.unsubscribe(subscriber)
+    assert wait_for(lambda: hub._poller is None)
+
+    hub.subscribe()
+    assert hub._poller is not None and hub._poller.is_alive()
+
+
+def test_resubscribing_while_the_poller_exits_keeps_it_running():
+    cache = FakePriceCache({'A': 100})
+    hub = PriceStreamHub(cache, interval=0.001)
+    for _ in range(200):
+        hub.unsubscribe(hub.subscribe())
+    subscriber = hub.subscribe()
+    hub.snapshot(subscriber)
+
+    cache.set({'A': 101})
+    assert wait_for(lambda: not subscriber.queue.empty())
+    kind, event = subscriber.queue.get_nowait()
+    assert kind == 'update'
+    assert list(event['prices']) == ['A']
+
+
+def test_snapshot_after_an_idle_spell_is_not_stale():
+    cache = FakePriceCache({'A': 100, 'B': 5})
+    hub = PriceStreamHub(cache, interval=0.01)
+    first = hub.subscribe(['A'])
+    assert hub.snapshot(first)['prices'] == {'A': {'LTP': 100.0, 'Vol': 10.0, 'Turnover': 1000.0}}
+    hub.unsubscribe(first)
+    assert wait_for(lambda: hub._poller is None)
+
+    cache.set({'A': 120, 'B': 5})
+    time.sleep(0.02)
+    second = hub.subscribe(['A'])
+    snapshot = hub.snapshot(second)
+    assert snapshot['prices']['A']['LTP'] == 120.0
+    assert snapshot['version'] == hub.version
+
+
+def test_stream_normalizes_query_and_watchlist_symbols_alike(app_env, monkeypatch):
+    routes = app_env['routes']
+    watchlist = routes.watchlist_mirror
+    symbol = watchlist.get_all_values()[1][0]
+    subscribed = []
+    subscribe = routes.price_stream_hub.subscribe
+    monkeypatch.setattr(routes.price_stream_hub, 'subscribe', lambda symbols: subscribed.append(symbols) or subscribe(symbols))
+    watchlist.append_row([' %s ' % symbol.lower()])
+    try:
+        response = app_env['client'].get('/api/v1/portfolio/prices/stream?watchlist=1&symbols=%s,%%20' % symbol.lower(),
+                                         buffered=False)
+        first = next(response.response)
+        response.close()
+    finally:
+        watchlist.delete_rows(len(watchlist.get_all_values()))
+    assert first.startswith(b'event: snapshot') and symbol.encode() in first
+    assert subscribed[0].count(symbol) == 3
+    assert all(s == s.strip().upper() and s for s in subscribed[0])
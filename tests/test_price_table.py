@@ -0,0 +1,45 @@
+# tests/test_price_table.py
+
+import math
+import os
+
+import numpy as np
+
+from html_parsers import parse_share_price_table
+from price_table import PriceTable, parse_number
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks', 'fixtures')
+
+
+def test_parse_number():
+    assert parse_number('1,234.50') == 1234.5
+    assert parse_number('-3.2%') == -3.2
+    assert parse_number(7) == 7.0
+    for blank in ('', '-', 'N/A', None):
+        assert math.isnan(parse_number(blank))
+
+
+def test_round_trips_the_scraped_rows():
+    with open(os.path.join(FIXTURES, 'today_share_price.html'), encoding='utf-8') as f:
+        rows = parse_share_price_table(f.read())
+    table = PriceTable.from_rows(rows)
+    assert table.to_records() == rows
+    assert len(table) == len(rows)
+    first = rows[0]
+    assert table.record(first['Symbol']) == first
+    assert table.value(first['Symbol'], 'LTP') == parse_number(first['LTP'])
+
+
+def test_columns_lookups_and_short_rows():
+    table = PriceTable(['S.No', 'Symbol', 'LTP', 'Vol'], [['1', 'A', '1,000', '5'], ['2', 'B', '-'], ['3', 'C', '7', '9']])
+    assert table.column('LTP').tolist()[0] == 1000.0 and math.isnan(table.column('LTP')[1])
+    assert math.isnan(table.column('Vol')[1])
+    assert table.positions(['C', 'X', 'A']).tolist() == [2, -1, 0]
+    assert 'B' in table and 'X' not in table
+    assert math.isnan(table.value('X', 'LTP'))
+    assert table.raw(1, 'Vol') == 'N/A'
+    assert table.to_records()[1] == {'S.No': '2', 'Symbol': 'B', 'LTP': '-'}
+    assert table.to_columnar() == {"columns": ['S.No', 'Symbol', 'LTP', 'Vol'],
+                                   "rows": [['1', 'A', '1,000', '5'], ['2', 'B', '-', None], ['3', 'C', '7', '9']]}
+    assert not table.column('LTP').flags.writeable
+    assert isinstance(table.column('LTP'), np.ndarray)
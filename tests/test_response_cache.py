@@ -0,0 +1,71 @@
+# tests/test_response_cache.py
+
+import gzip
+import json
+
+import pytest
+from flask import Flask
+
+from response_cache import ResponseCache
+
+
+@pytest.fixture
+def cached_app():
+    app = Flask(__name__)
+    cache = ResponseCache(gzip_min_size=100)
+    data = {"rows": [{"n": i} for i in range(50)]}
+
+    @app.route('/rows')
+    def rows():
+        return cache.respond('rows', data["rows"], lambda: data["rows"])
+
+    return app.test_client(), cache, data
+
+
+def test_identity_and_gzip_share_a_weak_etag(cached_app):
+    client, cache, data = cached_app
+    plain = client.get('/rows', headers={'Accept-Encoding': 'identity'})
+    zipped = client.get('/rows', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in plain.headers and zipped.headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(zipped.data)) == json.loads(plain.data) == data["rows"]
+    assert plain.headers['ETag'].startswith('W/"') and plain.headers['ETag'] == zipped.headers['ETag']
+    assert plain.headers['Vary'] == zipped.headers['Vary'] == 'Accept-Encoding'
+    assert cache.stats()["builds"] == 1
+
+
+def test_if_none_match_gets_304_until_the_source_changes(cached_app):
+    client, cache, data = cached_app
+    etag = client.get('/rows').headers['ETag']
+    for sent in (etag, etag[2:], f'"other", {etag}'):
+        response = client.get('/rows', headers={'If-None-Match': sent, 'Accept-Encoding': 'gzip'})
+        assert response.status_code == 304 and response.data == b'' and response.headers['Vary'] == 'Accept-Encoding'
+    assert cache.stats()["not_modified"] == 3
+
+    data["rows"] = data["rows"] + [{"n": 50}]
+    response = client.get('/rows', headers={'If-None-Match': etag})
+    assert response.status_code == 200 and response.headers['ETag'] != etag
+
+
+def test_small_bodies_are_not_gzipped():
+    app = Flask(__name__)
+    cache = ResponseCache(gzip_min_size=1000)
+    app.add_url_rule('/one', 'one', lambda: cache.respond('one', cache, lambda: [1]))
+    response = app.test_client().get('/one', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers and response.data == b'[1]'
+
+
+def test_prices_route_negotiates_and_revalidates(app_env):
+    client = app_env['client']
+    records = client.get('/api/v1/portfolio/prices')
+    assert records.status_code == 200 and records.headers['ETag'].startswith('W/"')
+    zipped = client.get('/api/v1/portfolio/prices', headers={'Accept-Encoding': 'gzip'})
+    assert zipped.headers['Content-Encoding'] == 'gzip' and zipped.headers['ETag'] == records.headers['ETag']
+    assert json.loads(gzip.decompress(zipped.data)) == records.get_json()
+    again = client.get('/api/v1/portfolio/prices', headers={'If-None-Match': records.headers['ETag']})
+    assert again.status_code == 304
+
+    columnar = client.get('/api/v1/portfolio/prices?format=columnar')
+    body = columnar.get_json()
+    assert columnar.headers['ETag'] != records.headers['ETag']
+    assert [dict(zip(body["columns"], row)) for row in body["rows"]] == \
+        [{**dict.fromkeys(body["columns"]), **row} for row in records.get_json()]
@@ -0,0 +1,67 @@
+# tests/test_routes_batch.py
+
+from gspread.exceptions import APIError
+
+from test_gspread_client import FakeResponse
+
+PREFIX = '/api/v1/portfolio'
+
+
+def statuses(response):
+    return [result["status"] for result in response.get_json()["results"]]
+
+
+def test_wishlist_batches_report_each_item(app_env):
+    client = app_env['client']
+    existing = app_env['routes'].watchlist_mirror.get_all_values()[1][0]
+
+    added = client.put(PREFIX + '/wishlist/add/batch',
+                       json=[{"scrip": "BATCHA"}, {"scrip": existing}, {"nope": 1}, {"scrip": "BATCHA"}, "x"])
+    assert added.status_code == 200
+    assert statuses(added) == [201, 409, 400, 409, 400]
+    assert added.get_json()["counts"] == {"201": 1, "409": 2, "400": 2}
+
+    removed = client.delete(PREFIX + '/wishlist/remove/batch', json={"items": [{"scrip": "BATCHA"}, {"scrip": "BATCHZ"}]})
+    assert statuses(removed) == [200, 404]
+    assert app_env['routes'].watchlist_mirror.find("BATCHA", in_column=1) is None
+
+
+def test_add_batch_validates_numbers(app_env):
+    client = app_env['client']
+    lot = {"scrip": "NABIL", "sector": "Commercial Banks", "quantity": 10, "purchasePrice": 500}
+    response = client.post(PREFIX + '/add/batch', json=[
+        lot, {**lot, "quantity": "ten"}, {**lot, "purchasePrice": None}, {**lot, "quantity": "nan"},
+        {**lot, "quantity": True}, {**lot, "purchasePrice": "512.5"}, {"scrip": "NABIL"}])
+    assert response.status_code == 200
+    assert statuses(response) == [201, 400, 400, 400, 400, 201, 400]
+    assert "Invalid number" in response.get_json()["results"][1]["message"]
+    rows = app_env['sheets']['portfolio_sheet'].get_all_values()
+    assert rows[-2:] == [['NABIL', 'Commercial Banks', '10', '500'], ['NABIL', 'Commercial Banks', '10', '512.5']]
+
+
+def test_realized_gain_batch_mixes_updates_and_appends(app_env):
+    client = app_env['client']
+    sale = {"scrip": "GAINA", "quantity": 10, "purchase_price": 100, "sell_price": 120, "sell_date": "2026-10-15"}
+    assert statuses(client.patch(PREFIX + '/realized-gain/batch', json=[sale])) == [201]
+    response = client.patch(PREFIX + '/realized-gain/batch', json=[
+        {**sale, "sell_price": 130}, {**sale, "scrip": "GAINB"}, {**sale, "scrip": "GAINB"},
+        {**sale, "scrip": "GAINC", "quantity": "many"}, {"scrip": "GAIND"}])
+    assert statuses(response) == [200, 201, 409, 400, 400]
+    assert app_env['routes'].realized_gains_mirror.find("GAINA", in_column=2) is not None
+
+
+def test_failed_write_reports_accepted_items_as_not_saved(app_env, monkeypatch):
+    client = app_env['client']
+    sheet = app_env['sheets']['watchlist_sheet']
+
+    def fail(*args, **kwargs):
+        raise APIError(FakeResponse(500))
+    monkeypatch.setattr(sheet, 'append_rows', fail)
+
+    response = client.put(PREFIX + '/wishlist/add/batch', json=[{"scrip": "FAILA"}, {}, {"scrip": "FAILB"}])
+    assert response.status_code == 500
+    body = response.get_json()
+    assert statuses(response) == [500, 400, 500]
+    assert body["results"][0]["message"].startswith("Not saved")
+    assert body["counts"] == {"500": 2, "400": 1}
+    assert app_env['routes'].watchlist_mirror.find("FAILA", in_column=1) is None
@@ -0,0 +1,22 @@
+# tests/test_routes_prices.py
+
+
+def test_snapshot_is_scheduled_once_per_scraped_table(app_env, monkeypatch):
+    routes = app_env['routes']
+    scheduled = []
+    monkeypatch.setattr(routes, 'run_in_background', lambda fn, *args: scheduled.append(args[0]))
+    monkeypatch.setattr(routes, '_snapshot_scheduled_for', None)
+    client = app_env['client']
+
+    for _ in range(3):
+        assert client.get('/api/v1/portfolio/prices').status_code == 200
+    assert client.get('/api/v1/portfolio/summary').status_code == 200
+    assert len(scheduled) == 1 and scheduled[0] is routes.share_price_cache.get()
+
+    # A new scrape (different bytes, so parsed again) is a new table and gets its own check.
+    upstream = app_env['upstream']
+    monkeypatch.setitem(upstream.pages, '/today-share-price', upstream.pages['/today-share-price'] + b'\n')
+    routes.share_price_cache.invalidate()
+    assert client.get('/api/v1/portfolio/prices').status_code == 200
+    assert client.get('/api/v1/portfolio/prices').status_code == 200
+    assert len(scheduled) == 2 and scheduled[1] is routes.share_price_cache.get() and scheduled[1] is not scheduled[0]
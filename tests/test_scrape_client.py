@@ -0,0 +1,61 @@
+# tests/test_scrape_client.py
+
+import pytest
+import requests
+
+from fakes import FakeScrapeServer
+from html_parsers import parse_share_price_table
+from scrape_client import ScrapeClient
+
+
+@pytest.fixture
+def upstream(request):
+    server = FakeScrapeServer(etag=getattr(request, 'param', False)).start()
+    yield server
+    server.stop()
+
+
+@pytest.mark.parametrize('upstream', [True], indirect=True)
+def test_not_modified_reuses_the_parse(upstream):
+    client = ScrapeClient()
+    url = upstream.url + '/today-share-price'
+    first = client.get_parsed(url, parse_share_price_table)
+    assert client.get_parsed(url, parse_share_price_table) is first
+    stats = client.stats()
+    assert stats["requests"] == 2 and stats["parses"] == 1 and stats["not_modified"] == 1
+
+
+def test_identical_bytes_reuse_the_parse_and_changed_bytes_do_not(upstream):
+    client = ScrapeClient()
+    url = upstream.url + '/today-share-price'
+    first = client.get_parsed(url, parse_share_price_table)
+    assert client.get_parsed(url, parse_share_price_table) is first
+    assert client.stats()["unchanged_content"] == 1
+
+    upstream.pages['/today-share-price'] = upstream.pages['/today-share-price'].replace(b'<tbody>', b'<tbody>\n', 1)
+    second = client.get_parsed(url, parse_share_price_table)
+    assert second is not first and second == first
+    stats = client.stats()
+    assert stats["parses"] == 2 and stats["connections_opened"] == 1 and stats["connections_reused"] == 2
+
+
+def test_each_parser_keeps_its_own_result(upstream):
+    client = ScrapeClient()
+    url = upstream.url + '/today-share-price'
+    rows = client.get_parsed(url, parse_share_price_table)
+    assert client.get_parsed(url, len) == len(upstream.pages['/today-share-price'].decode())
+    assert client.get_parsed(url, parse_share_price_table) is rows
+
+
+def test_http_errors_raise(upstream):
+    with pytest.raises(requests.HTTPError):
+        ScrapeClient().get_parsed(upstream.url + '/missing', parse_share_price_table)
+
+
+def test_parsed_results_are_bounded(upstream):
+    client = ScrapeClient(max_entries=2)
+    for number in (1, 2, 3, 1):
+        client.get_parsed(upstream.url + f'/floorsheet?page={number}', len)
+    stats = client.stats()
+    # Page 1 was evicted by page 3, so fetching it again parsed it again.
+    assert stats["cached_results"] == 2 and stats["parses"] == 4
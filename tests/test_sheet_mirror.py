@@ -0,0 +1,146 @@
+# tests/test_sheet_mirror.py
+
+import time
+
+import pytest
+
+from fakes import FakeWorksheet
+from sheet_mirror import MirrorStore, SheetColumnIndex, SheetMirror
+
+HEADER = ['scrip', 'sector', 'quantity', 'purchasePrice']
+
+
+def worksheet(rows=(('NABIL', 'Banks', 10, 500), ('NICA', 'Banks', 20, 400), ('UPPER', 'Hydro', 30, 300))):
+    return FakeWorksheet('Portfolio', HEADER, rows)
+
+
+def test_reads_are_served_from_memory():
+    ws = worksheet()
+    mirror = SheetMirror(ws, ttl=60)
+    first = mirror.get_all_records()
+    for _ in range(5):
+        assert mirror.get_all_records() == first
+    assert mirror.find('NICA', in_column=1).row == 3
+    assert ws.calls == {'get_all_values': 1}
+    assert first == ws.get_all_records()
+
+
+def test_writes_go_to_sheet_and_mirror():
+    ws = worksheet()
+    mirror = SheetMirror(ws, ttl=60)
+    mirror.append_row(['HIDCL', 'Hydro', 5, 200])
+    mirror.update_row(2, ['NABIL', 'Banks', 15, 510])
+    assert mirror.get_all_values() == ws.get_all_values()
+    assert mirror.find('HIDCL', in_column=1).row == 5
+    assert ws.calls['get_all_values'] == 2  # the initial load plus the comparison above
+
+
+def test_ttl_expiry_refetches_and_version_check_skips_unchanged_sheets():
+    ws = worksheet()
+    mirror = SheetMirror(ws, ttl=0.01)
+    mirror.get_all_records()
+    ws.append_rows([['HIDCL', 'Hydro', 5, 200]])  # changed behind the mirror's back
+    time.sleep(0.02)
+    assert len(mirror.get_all_records()) == 4
+
+    checked = SheetMirror(ws, ttl=0.01, version_check=lambda w: w.spreadsheet.get_lastUpdateTime())
+    checked.get_all_records()
+    time.sleep(0.02)
+    checked.get_all_records()
+    assert checked.loads == 1
+
+
+def test_store_survives_a_restart(tmp_path):
+    ws = worksheet()
+    SheetMirror(ws, name='Portfolio', ttl=60, store=MirrorStore(str(tmp_path / 'mirror.db'))).get_all_records()
+    restarted = SheetMirror(ws, name='Portfolio', ttl=60, store=MirrorStore(str(tmp_path / 'mirror.db')))
+    assert len(restarted.get_all_records()) == 3
+    assert ws.calls['get_all_values'] == 1
+
+
+def test_writes_are_persisted_once_per_delay(tmp_path):
+    ws = worksheet()
+    store = MirrorStore(str(tmp_path / 'mirror.db'))
+    saves = []
+    save = store.save
+    store.save = lambda *args: saves.append(args[0]) or save(*args)
+    mirror = SheetMirror(ws, name='Portfolio', ttl=60, store=store, persist_delay=0.1)
+    mirror.get_all_records()
+    for symbol in ['A', 'B', 'C']:
+        mirror.append_row([symbol, 'Banks', 1, 100])
+    assert saves == ['Portfolio']
+
+    # Not flushed yet: a restart must refetch rather than serve rows without the appends.
+    restarted = SheetMirror(ws, name='Portfolio', ttl=60, store=MirrorStore(str(tmp_path / 'mirror.db')))
+    assert len(restarted.get_all_records()) == 6
+    assert ws.calls['get_all_values'] == 2
+
+    time.sleep(0.3)
+    assert saves == ['Portfolio', 'Portfolio']
+    restarted = SheetMirror(ws, name='Portfolio', ttl=60, store=MirrorStore(str(tmp_path / 'mirror.db')))
+    assert [r['scrip'] for r in restarted.get_all_records()][-3:] == ['A', 'B', 'C']
+    assert ws.calls['get_all_values'] == 2
+
+
+def test_short_appended_rows_are_padded_like_the_sheet():
+    ws = worksheet()
+    mirror = SheetMirror(ws, ttl=60)
+    mirror.get_all_records()
+    mirror.append_row(['NEW', 'Hydro'])
+    assert mirror.get_all_records()[-1] == {'scrip': 'NEW', 'sector': 'Hydro', 'quantity': '', 'purchasePrice': ''}
+    assert mirror.get_all_records() == ws.get_all_records()
+
+
+def test_unconnected_sheet_raises_connection_error():
+    mirror = SheetMirror(lambda: None, name='Portfolio')
+    with pytest.raises(ConnectionError):
+        mirror.get_all_records()
+
+
+# --- Key indexes ---
+
+def rows_by_key(mirror, keys, column=1):
+    return {key: (cell.row if cell else None) for key, cell in ((k, mirror.find(k, in_column=column)) for k in keys)}
+
+
+def test_index_shifts_rows_up_after_delete():
+    ws = FakeWorksheet('Watchlist', ['scrip'], [[s] for s in 'ABCDEF'])
+    mirror = SheetMirror(ws, ttl=60)
+    assert mirror.find('E', in_column=1).row == 6
+
+    mirror.delete_rows(3, 4)  # B and C
+    assert rows_by_key(mirror, 'ABCDEF') == {'A': 2, 'B': None, 'C': None, 'D': 3, 'E': 4, 'F': 5}
+    assert [row[0] for row in ws.get_all_values()[1:]] == list('ADEF')
+
+    mirror.delete_row_numbers([5, 2, 3])  # F, A, D: merged into runs and deleted bottom-up
+    assert rows_by_key(mirror, 'ADEF') == {'A': None, 'D': None, 'E': 2, 'F': None}
+    assert ws.get_all_values() == [['scrip'], ['E']]
+
+
+def test_index_follows_appends_updates_and_duplicates():
+    ws = FakeWorksheet('Realized Gains', ['Date', 'Scrip'], [['2024-01-01', 'A'], ['2024-01-02', 'B']])
+    mirror = SheetMirror(ws, ttl=60)
+    assert mirror.find('B', in_column=2).row == 3
+
+    mirror.append_rows([['2024-01-03', 'A'], ['2024-01-04', 'C']])
+    assert mirror.find('A', in_column=2).row == 2  # first match, like Worksheet.find
+    assert mirror.find('C', in_column=2).row == 5
+
+    mirror.update_rows([(2, ['2024-01-05', 'Z'])])
+    assert mirror.find('A', in_column=2).row == 4
+    assert mirror.find('Z', in_column=2).row == 2
+
+    mirror.delete_rows(2)
+    assert rows_by_key(mirror, 'ABCZ', column=2) == {'A': 3, 'B': 2, 'C': 4, 'Z': None}
+    # Every answer agrees with a fresh scan of the sheet.
+    fresh = SheetMirror(ws, ttl=60)
+    assert rows_by_key(fresh, 'ABCZ', column=2) == rows_by_key(mirror, 'ABCZ', column=2)
+
+
+def test_sheet_column_index_reads_the_column_once():
+    ws = FakeWorksheet('Market', ['Date', 'Symbol'], [['2024-01-01', 'A'], ['2024-01-01', 'B']])
+    index = SheetColumnIndex(ws, column=1, name='Market')
+    assert '2024-01-01' in index and '2024-01-02' not in index
+    index.add('2024-01-02', count=2)
+    assert '2024-01-02' in index
+    assert ws.calls == {'col_values': 1}
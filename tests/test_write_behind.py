@@ -0,0 +1,189 @@
+# tests/test_write_behind.py
+
+import json
+import time
+
+from fakes import FakeWorksheet
+from write_behind import WriteBehindQueue
+
+HEADER = ['scrip']
+
+
+def queue(path, **kwargs):
+    kwargs.setdefault('flush_interval', 0.01)
+    return WriteBehindQueue(str(path), **kwargs)
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.005)
+    return condition()
+
+
+def test_consecutive_writes_are_batched_in_order(tmp_path):
+    ws = FakeWorksheet('Watchlist', HEADER, [['A'], ['B'], ['C']])
+    # The sheet stays unavailable (with a long backoff) until everything is queued,
+    # so the worker sees the whole burst at once, as it would under load.
+    online = []
+    q = queue(tmp_path / 'journal.jsonl', backoff_base=60)
+    q.register('Watchlist', lambda: ws if online else None)
+    for symbol in ['D', 'E', 'F']:
+        q.submit('Watchlist', 'append_rows', rows=[[symbol]])
+    q.submit('Watchlist', 'update_row', row=2, values=['A2'])
+    q.submit('Watchlist', 'update_row', row=3, values=['B2'])
+    q.submit('Watchlist', 'delete_rows', start=4, end=4)
+    q.submit('Watchlist', 'append_rows', rows=[['G']])
+    online.append(True)
+    assert q.flush(timeout=5)
+
+    assert ws.get_all_values() == [['scrip'], ['A2'], ['B2'], ['D'], ['E'], ['F'], ['G']]
+    assert ws.calls['append_rows'] == 2
+    assert ws.calls['batch_update'] == 1
+    assert ws.calls['delete_rows'] == 1
+    assert q.status()["applied"] == 7
+
+
+def test_unacknowledged_entries_are_replayed_after_a_restart(tmp_path):
+    path = tmp_path / 'journal.jsonl'
+    first = queue(path)
+    first.register('Watchlist', lambda: None)  # sheet down: nothing gets acknowledged
+    first.submit('Watchlist', 'append_rows', rows=[['A']])
+    first.submit('Watchlist', 'append_rows', rows=[['B']])
+    entries = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [e["seq"] for e in entries if "seq" in e] == [1, 2]
+    assert not any("ack" in e for e in entries)
+    first.close()
+
+    ws = FakeWorksheet('Watchlist', HEADER)
+    restarted = queue(path)
+    restarted.register('Watchlist', lambda: ws)
+    assert restarted.pending('Watchlist') == 2
+    assert restarted.flush(timeout=5)
+    assert ws.get_all_values() == [['scrip'], ['A'], ['B']]
+    assert restarted.submit('Watchlist', 'append_rows', rows=[['C']]) == 3
+
+
+def test_acknowledged_entries_are_not_replayed(tmp_path):
+    path = tmp_path / 'journal.jsonl'
+    ws = FakeWorksheet('Watchlist', HEADER)
+    first = queue(path)
+    first.register('Watchlist', lambda: ws)
+    first.submit('Watchlist', 'append_rows', rows=[['A']])
+    assert first.flush(timeout=5)
+    first.close()
+
+    restarted = queue(path)
+    restarted.register('Watchlist', lambda: ws)
+    assert restarted.pending() == 0
+
+
+def test_new_entries_after_a_restart_do_not_reuse_acknowledged_seqs(tmp_path):
+    path = tmp_path / 'journal.jsonl'
+    ws = FakeWorksheet('Watchlist', HEADER)
+    first = queue(path)
+    first.register('Portfolio', lambda: None)  # stays down, so the journal is never truncated
+    first.register('Watchlist', lambda: ws)
+    first.submit('Portfolio', 'append_rows', rows=[['P']])
+    for symbol in ['A', 'B', 'C']:
+        first.submit('Watchlist', 'append_rows', rows=[[symbol]])
+    assert wait_for(lambda: first.pending('Watchlist') == 0)
+    first.close()
+
+    second = queue(path)
+    second.register('Portfolio', lambda: None)
+    second.register('Watchlist', lambda: None)
+    assert second.submit('Watchlist', 'append_rows', rows=[['D']]) == 5
+    second.close()
+
+    third = queue(path)
+    third.register('Portfolio', lambda: None)
+    third.register('Watchlist', lambda: None)
+    assert third.pending('Portfolio') == 1
+    assert third.pending('Watchlist') == 1
+
+
+def test_each_queue_on_a_path_journals_separately(tmp_path):
+    path = tmp_path / 'journal.jsonl'
+    ws = FakeWorksheet('Watchlist', HEADER)
+    busy = queue(path)
+    busy.register('Watchlist', lambda: None)
+    busy.submit('Watchlist', 'append_rows', rows=[['A']])
+    idle = queue(path)
+    idle.register('Watchlist', lambda: ws)
+    idle.submit('Watchlist', 'append_rows', rows=[['B']])
+    assert idle.flush(timeout=5)
+    assert busy.journal.path != idle.journal.path
+
+    # The idle queue truncating its own journal leaves the other's pending write alone.
+    busy.close()
+    restarted = queue(path)
+    restarted.register('Watchlist', lambda: ws)
+    assert restarted.journal.path == busy.journal.path
+    assert restarted.flush(timeout=5)
+    assert ws.get_all_values() == [['scrip'], ['B'], ['A']]
+
+
+def test_pending_writes_of_exited_workers_are_adopted(tmp_path):
+    path = tmp_path / 'journal.jsonl'
+    ws = FakeWorksheet('Watchlist', HEADER)
+    running = queue(path)
+    running.register('Watchlist', lambda: ws)
+    running.start()
+    exited = []
+    for symbol in ['A', 'B']:
+        worker = queue(path)
+        worker.register('Watchlist', lambda: None)
+        worker.submit('Watchlist', 'append_rows', rows=[[symbol]])
+        exited.append(worker)
+    for worker in exited:
+        worker.close()
+
+    # A new worker takes the first free journal and adopts what is left in the other one.
+    replacement = queue(path)
+    replacement.register('Watchlist', lambda: ws)
+    assert replacement.journal.path == exited[0].journal.path
+    assert replacement.pending('Watchlist') == 2
+    assert replacement.flush(timeout=5)
+    assert ws.get_all_values() == [['scrip'], ['A'], ['B']]
+    with open(exited[1].journal.path) as f:
+        assert f.read() == ''
+
+
+def test_failing_batch_is_dead_lettered_and_the_queue_moves_on(tmp_path):
+    ws = FakeWorksheet('Watchlist', HEADER)
+    calls = {'n': 0}
+
+    def flaky():
+        calls['n'] += 1
+        if calls['n'] <= 2:
+            raise RuntimeError("APIError: [500]")
+        return ws
+
+    q = queue(tmp_path / 'journal.jsonl', backoff_base=0.01, backoff_max=0.01, max_attempts=2)
+    q.register('Watchlist', flaky)
+    q.submit('Watchlist', 'delete_rows', start=2, end=2)
+    q.submit('Watchlist', 'append_rows', rows=[['A']])
+    assert q.flush(timeout=5)
+
+    status = q.status()
+    assert [entry["op"] for entry in status["dead_letters"]] == ['delete_rows']
+    assert status["failures"] == 2
+    assert ws.get_all_values() == [['scrip'], ['A']]
+
+
+def test_unregister_waits_for_pending_writes(tmp_path):
+    ws = FakeWorksheet('Watchlist', HEADER, [['A']])
+    online = []
+    q = queue(tmp_path / 'journal.jsonl', backoff_base=0.01)
+    q.register('Watchlist', lambda: ws if online else None)
+    q.submit('Watchlist', 'append_rows', rows=[['B']])
+    assert q.unregister('Watchlist') is False
+
+    online.append(True)
+    assert q.flush(timeout=5)
+    assert q.unregister('Watchlist') is True
+    assert 'Watchlist' not in q.status()["pending"] and not q._sources
+    q.close()
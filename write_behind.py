@@ -0,0 +1,436 @@
+# write_behind.py
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+from gspread.utils import rowcol_to_a1
+
+from instrumentation import span
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows, where one process per journal is assumed
+    fcntl = None
+
+MAX_JOURNAL_SLOTS = 64
+
+
+def apply_write(worksheet, op, args):
+    """Performs one mutation on a worksheet. Shared by the direct and write-behind paths."""
+    if op == 'append_rows':
+        worksheet.append_rows(args['rows'], value_input_option=args.get('value_input_option', 'USER_ENTERED'))
+    elif op == 'update_row':
+        worksheet.update(values=[args['values']], range_name=_row_range(args['row'], len(args['values'])))
+    elif op == 'update_rows':
+        worksheet.batch_update([{"range": _row_range(u['row'], len(u['values'])), "values": [u['values']]}
+                                for u in args['updates']])
+    elif op == 'delete_rows':
+        worksheet.delete_rows(args['start'], args['end'])
+    elif op == 'delete_row_runs':
+        # One spreadsheet batch_update; runs are bottom-up so earlier deletions do not shift later ones.
+        worksheet.spreadsheet.batch_update({"requests": [
+            {"deleteDimension": {"range": {"sheetId": worksheet.id, "dimension": "ROWS",
+                                           "startIndex": start - 1, "endIndex": end}}}
+            for start, end in args['runs']]})
+    else:
+        raise ValueError(f"Unknown sheet operation '{op}'.")
+
+
+def _row_range(row_number, width):
+    return f"A{row_number}:{rowcol_to_a1(row_number, width)}"
+
+
+class WriteJournal:
+    """
+    Append-only JSON-lines file of queued sheet mutations.
+
+    Each mutation is written (and fsynced) before the request that made it returns,
+    and an {"ack": seq} line is written once the sheet has accepted it, so pending
+    writes survive a crash or restart. The file is truncated whenever nothing is pending.
+
+    Every process gets a journal of its own: `path` for the first, then path.1,
+    path.2, ... (before the extension), each claimed with an exclusive lock on a
+    side ".lock" file for as long as the process lives. Worker processes sharing a
+    path therefore never truncate each other's entries, and a restarted worker
+    picks up a free journal, and with it the writes its predecessor left pending.
+    """
+
+    def __init__(self, path, max_slots=MAX_JOURNAL_SLOTS):
+        self.base_path = path
+        self.max_slots = max_slots
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        for slot in range(max_slots):
+            self._lock_file = _lock_journal(_slot_path(path, slot))
+            if self._lock_file is not None:
+                self.path = _slot_path(path, slot)
+                break
+        else:
+            raise RuntimeError(f"All {max_slots} write journals under {path} are in use.")
+        self._file = open(self.path, 'a', encoding='utf-8')
+        self._dirty = os.path.getsize(self.path) > 0
+        self.last_seq = 0
+
+    def pending(self):
+        """
+        Entries written but never acknowledged, in the order they were queued. Also sets
+        last_seq to the highest seq seen in the file, acknowledged or not, which new
+        entries must stay above.
+        """
+        entries, self.last_seq = _read_journal(self.path)
+        return entries
+
+    def adopt_orphans(self, next_seq):
+        """
+        Moves the pending entries of journals no live process holds (a worker that
+        exited) into this one, numbered from `next_seq`. Each journal's entries keep
+        their order. They are fsynced here before the old files are cleared. Returns them.
+        """
+        adopted, claimed = [], []
+        for slot in range(self.max_slots):
+            path = _slot_path(self.base_path, slot)
+            if path == self.path or not os.path.exists(path):
+                continue
+            lock = _lock_journal(path)
+            if lock is None:
+                continue
+            claimed.append((path, lock))
+            adopted.extend(_read_journal(path)[0])
+        try:
+            for seq, entry in enumerate(adopted, next_seq):
+                entry["seq"] = seq
+                self._file.write(json.dumps(entry) + "\n")
+            if adopted:
+                self._sync()
+            for path, _ in claimed:
+                open(path, 'w').close()
+        finally:
+            for _, lock in claimed:
+                lock.close()
+        return adopted
+
+    def record(self, entry):
+        self._write(entry)
+
+    def ack(self, seqs):
+        for seq in seqs:
+            self._file.write(json.dumps({"ack": seq}) + "\n")
+        self._sync()
+
+    def truncate(self):
+        if not self._dirty:
+            return
+        self._dirty = False
+        self._file.close()
+        self._file = open(self.path, 'w', encoding='utf-8')
+
+    def close(self):
+        """Closes the file and releases this process's claim on it."""
+        self._file.close()
+        self._lock_file.close()
+
+    def _write(self, entry):
+        self._file.write(json.dumps(entry) + "\n")
+        self._sync()
+
+    def _sync(self):
+        self._dirty = True
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+
+def _slot_path(path, slot):
+    if slot == 0:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.{slot}{ext}"
+
+
+def _lock_journal(path):
+    """The open lock file for the journal at `path`, or None if another process (or queue) holds it."""
+    lock = open(path + '.lock', 'a')
+    if fcntl is None:
+        return lock
+    try:
+        fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock.close()
+        return None
+    return lock
+
+
+def _read_journal(path):
+    """(unacknowledged entries in seq order, highest seq or ack in the file)."""
+    entries, done, last_seq = {}, set(), 0
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                logging.warning(f"Skipping corrupt line in write journal {path}.")
+                continue
+            if 'ack' in entry:
+                done.add(entry['ack'])
+                last_seq = max(last_seq, entry['ack'])
+            else:
+                entries[entry['seq']] = entry
+                last_seq = max(last_seq, entry['seq'])
+    return [entries[seq] for seq in sorted(entries) if seq not in done], last_seq
+
+
+class WriteBehindQueue:
+    """
+    Takes sheet mutations off the request thread.
+
+    Mutations are journaled, queued per worksheet and applied by one worker thread
+    strictly in order per worksheet. Consecutive appends become one append_rows
+    call and consecutive row updates one batch_update call. A failed batch stays at
+    the head of its worksheet's queue and is retried with exponential backoff.
+    """
+
+    def __init__(self, journal_path, flush_interval=1.0, max_batch=500,
+                 backoff_base=1.0, backoff_max=60.0, max_attempts=8):
+        self.journal = WriteJournal(journal_path)
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_attempts = max_attempts
+        self._sources = {}
+        self._error_hooks = {}
+        self._queues = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._idle = threading.Condition(self._lock)
+        self._worker = None
+        self._closed = False
+        self._seq = 0
+        self._attempts = {}
+        self._retry_at = {}
+        self.applied = 0
+        self.api_calls = 0
+        self.failures = 0
+        self.dead_letters = []
+        self.last_error = None
+        self.last_flush = None
+
+    # --- Producer side ---
+
+    def register(self, name, source, on_error=None):
+        """
+        Tells the worker how to get the worksheet called `name` (a zero-argument callable).
+        `on_error`, if given, is called with the exception of every failed batch.
+        """
+        with self._lock:
+            self._sources[name] = source
+            if on_error is not None:
+                self._error_hooks[name] = on_error
+            self._queues.setdefault(name, deque())
+
+    def unregister(self, name):
+        """
+        Forgets the worksheet called `name`, so the queue no longer keeps its source
+        (and whatever that references) alive. Refused while it has pending writes;
+        returns whether it was dropped. A later submit for `name` waits for a new register().
+        """
+        with self._lock:
+            if self._queues.get(name):
+                return False
+            self._sources.pop(name, None)
+            self._error_hooks.pop(name, None)
+            self._queues.pop(name, None)
+            self._attempts.pop(name, None)
+            self._retry_at.pop(name, None)
+            return True
+
+    def submit(self, name, op, **args):
+        """Journals a mutation and queues it. Returns once it is durable, not once it is applied."""
+        self.start()
+        with self._lock:
+            self._seq += 1
+            entry = {"seq": self._seq, "sheet": name, "op": op, "args": args,
+                     "queued_at": time.time()}
+            self.journal.record(entry)
+            self._queues.setdefault(name, deque()).append(entry)
+            self._wakeup.notify()
+        return entry["seq"]
+
+    def pending(self, name=None):
+        """Number of queued (or in-flight) mutations, for one worksheet or all of them."""
+        self.start()
+        with self._lock:
+            if name is not None:
+                return len(self._queues.get(name, ()))
+            return sum(len(q) for q in self._queues.values())
+
+    def flush(self, timeout=30):
+        """Asks the worker to apply everything now and waits up to `timeout` seconds. Returns True if drained."""
+        self.start()
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            self._retry_at.clear()
+            self._wakeup.notify()
+            while any(self._queues.values()):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+        return True
+
+    def status(self):
+        self.start()
+        with self._lock:
+            return {
+                "enabled": True,
+                "journal": self.journal.path,
+                "pending": {name: len(q) for name, q in self._queues.items()},
+                "applied": self.applied,
+                "api_calls": self.api_calls,
+                "failures": self.failures,
+                "dead_letters": list(self.dead_letters),
+                "last_error": self.last_error,
+                "last_flush": self.last_flush,
+                "retrying": {name: round(at - time.monotonic(), 1) for name, at in self._retry_at.items()},
+            }
+
+    # --- Worker ---
+
+    def start(self):
+        """Replays the journal and starts the worker thread. Safe to call repeatedly."""
+        with self._lock:
+            if self._worker is not None:
+                return
+            # Acknowledged seqs stay in the file until it is truncated; new entries must not reuse them.
+            pending = self.journal.pending()
+            self._seq = max(self._seq, self.journal.last_seq)
+            pending += self.journal.adopt_orphans(self._seq + 1)
+            for entry in pending:
+                self._queues.setdefault(entry["sheet"], deque()).append(entry)
+                self._seq = max(self._seq, entry["seq"])
+            replayed = sum(len(q) for q in self._queues.values())
+            self._worker = threading.Thread(target=self._run, daemon=True, name="sheets-write-behind")
+            self._worker.start()
+        if replayed:
+            logging.info(f"Replaying {replayed} pending sheet writes from {self.journal.path}.")
+
+    def close(self, timeout=5):
+        """Stops the worker after its current batch and releases the journal. Unapplied writes stay journaled."""
+        with self._lock:
+            self._closed = True
+            self._wakeup.notify()
+            worker = self._worker
+        if worker is not None:
+            worker.join(timeout)
+        self.journal.close()
+
+    def _run(self):
+        while not self._closed:
+            try:
+                with self._lock:
+                    self._wakeup.wait(self.flush_interval)
+                    ready = [name for name, q in self._queues.items()
+                             if q and self._retry_at.get(name, 0) <= time.monotonic()]
+                for name in ready:
+                    if self._closed:
+                        return
+                    self._drain(name)
+                with self._lock:
+                    if not any(self._queues.values()):
+                        self.journal.truncate()
+                        self._idle.notify_all()
+            except Exception as e:
+                logging.error(f"Sheet write-behind worker error: {e}")
+
+    def _drain(self, name):
+        while True:
+            with self._lock:
+                queue = self._queues.get(name)
+                if not queue:
+                    return
+                batch = _next_batch(queue, self.max_batch)
+                source = self._sources.get(name)
+                on_error = self._error_hooks.get(name)
+            try:
+                worksheet = source() if source is not None else None
+                if worksheet is None:
+                    raise ConnectionError(f"Google Sheets '{name}' not connected.")
+                self._apply_batch(worksheet, batch)
+            except Exception as e:
+                self._failed(name, batch, e)
+                if on_error is not None:
+                    try:
+                        on_error(e)
+                    except Exception as hook_error:
+                        logging.error(f"Error hook for '{name}' failed: {hook_error}")
+                return
+            with self._lock:
+                for _ in batch:
+                    queue.popleft()
+                self.journal.ack([entry["seq"] for entry in batch])
+                self.applied += len(batch)
+                self._attempts.pop(name, None)
+                self._retry_at.pop(name, None)
+                self.last_flush = datetime.now(timezone.utc).isoformat()
+
+    def _apply_batch(self, worksheet, batch):
+        with span('sheet_write'):
+            self._apply_batch_calls(worksheet, batch)
+        self.api_calls += 1
+
+    def _apply_batch_calls(self, worksheet, batch):
+        op = batch[0]["op"]
+        if op == 'append_rows':
+            rows = [row for entry in batch for row in entry["args"]["rows"]]
+            apply_write(worksheet, 'append_rows', {
+                "rows": rows, "value_input_option": batch[0]["args"].get("value_input_option", 'USER_ENTERED')})
+        elif op == 'update_row' and len(batch) > 1:
+            worksheet.batch_update([
+                {"range": _row_range(e["args"]["row"], len(e["args"]["values"])), "values": [e["args"]["values"]]}
+                for e in batch])
+        else:
+            apply_write(worksheet, op, batch[0]["args"])
+
+    def _failed(self, name, batch, error):
+        with self._lock:
+            self.failures += 1
+            self.last_error = f"{name}: {error}"
+            attempts = self._attempts.get(name, 0) + 1
+            if attempts >= self.max_attempts:
+                # Give up on this batch so the rest of the worksheet's queue can proceed.
+                logging.error(f"Dropping {len(batch)} sheet writes for '{name}' after {attempts} attempts: {error}")
+                queue = self._queues[name]
+                for _ in batch:
+                    self.dead_letters.append(queue.popleft())
+                self.journal.ack([entry["seq"] for entry in batch])
+                self._attempts.pop(name, None)
+                self._retry_at.pop(name, None)
+                return
+            delay = min(self.backoff_base * (2 ** (attempts - 1)), self.backoff_max)
+            self._attempts[name] = attempts
+            self._retry_at[name] = time.monotonic() + delay
+        logging.warning(f"Sheet write to '{name}' failed (attempt {attempts}), retrying in {delay:.0f}s: {error}")
+
+
+def _next_batch(queue, max_batch):
+    """Longest run at the head of `queue` that can go to the sheet in a single API call."""
+    head = queue[0]
+    if head["op"] in ('delete_rows', 'delete_row_runs', 'update_rows'):
+        return [head]
+    batch = []
+    for entry in queue:
+        if entry["op"] != head["op"] or len(batch) >= max_batch:
+            break
+        if head["op"] == 'append_rows' and \
+                entry["args"].get("value_input_option") != head["args"].get("value_input_option"):
+            break
+        batch.append(entry)
+    return batch